@@ -2,6 +2,8 @@
 ASGI config for ETHSGEBEYA project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serving the site through it (e.g. ``uvicorn ETHSGEBEYA.asgi:application``)
+enables the server-sent counter stream; under WSGI pages poll instead.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
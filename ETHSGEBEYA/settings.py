@@ -152,6 +152,9 @@ USE_L10N = True
 
 USE_TZ = True
 
+# Sellers enter opening hours as local wall-clock times.
+SELLER_TIME_ZONE = os.environ.get('SELLER_TIME_ZONE', 'Africa/Addis_Ababa')
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
@@ -27,6 +27,7 @@ urlpatterns = [
     path('companies/', views.companies, name='companies'),
     path('companies/explore/', views.companies_explore, name='companies_explore'),
     path('warehouse/', include('warehouse.urls')),
+    path('api/', include('warehouse.urls_api')),
     path('sign-in/', auth_views.LoginView.as_view(template_name="form/sign_in.html"), name='sign-in'),
     path('sign-out/', auth_views.LogoutView.as_view(next_page="/"), name='sign-out'),
     path('sign-up/', views.sign_up, name='sign-up'),
@@ -2,7 +2,6 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
 from django.conf import settings
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
@@ -16,10 +15,13 @@ from django.contrib.auth.decorators import login_required
 from .auth_utils import already_authenticated_message
 from .forms import ResendActivationEmailForm
 from django.utils.html import strip_tags
+from django.db import transaction
 import os
+from warehouse import follows, fuzzy, hours, outbox, rankings, stats
 from warehouse.models import SellerProfile
 from django.utils import timezone
-from django.db.models import Count, Avg, Q
+from django.core.paginator import Paginator
+from django.db.models import Count, Avg, Q, Value
 import json
 
 def home(request):
@@ -37,19 +39,20 @@ def sign_up(request):
             if not email or not email.endswith('@gmail.com'):
                 messages.error(request, 'Only @gmail.com email addresses are allowed.')
                 return render(request, 'form/sign_up.html', {'form': form})
-            user = form.save(commit=False)
-            user.is_active = False  # Deactivate account until email confirmed
-            user.save()
-            current_site = get_current_site(request)
-            subject = 'Activate your ETHSGEBEYA account'
-            html_message = render_to_string('registration/account_activation_email.html', {
-                'user': user,
-                'domain': current_site.domain,
-                'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-                'token': default_token_generator.make_token(user),
-            })
-            plain_message = strip_tags(html_message)
-            send_mail(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [user.email], html_message=html_message)
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_active = False  # Deactivate account until email confirmed
+                user.save()
+                current_site = get_current_site(request)
+                subject = 'Activate your ETHSGEBEYA account'
+                html_message = render_to_string('registration/account_activation_email.html', {
+                    'user': user,
+                    'domain': current_site.domain,
+                    'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+                    'token': default_token_generator.make_token(user),
+                })
+                plain_message = strip_tags(html_message)
+                outbox.enqueue(subject, plain_message, [user.email], settings.DEFAULT_FROM_EMAIL, html_body=html_message)
             messages.success(request, 'Account created! Please check your email to activate your account.')
             return redirect('sign-in')
     else:
@@ -116,7 +119,7 @@ def resend_activation_email(request):
                     'token': default_token_generator.make_token(user),
                 })
                 plain_message = strip_tags(html_message)
-                send_mail(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [user.email], html_message=html_message)
+                outbox.enqueue(subject, plain_message, [user.email], settings.DEFAULT_FROM_EMAIL, html_body=html_message)
                 messages.success(request, 'A new activation email has been sent. Please check your inbox.')
                 return redirect('sign-in')
             except User.DoesNotExist:
@@ -162,62 +165,39 @@ def check_env(request):
 def companies(request):
     """Companies page: show followed companies first.
     If user follows none, display empty state with Explore button.
-    Always also provide full list for optional explore section.
     """
-    base_qs = (
-        SellerProfile.objects
-        .annotate(
-            products_count=Count('product', filter=Q(product__is_active=True), distinct=True),
-            followers_count=Count('followers', distinct=True),
-            avg_rating=Avg('product__reviews__rating'),
-        )
-        .order_by('-followers_count', 'company_name')
-    )
-
-    now_time = timezone.localtime().time()
-    all_sellers = list(base_qs)
-    user_id = request.user.id if request.user.is_authenticated else None
-    for s in all_sellers:
-        try:
-            s.is_open_now = bool(s.opening_time and s.closing_time and s.opening_time <= now_time <= s.closing_time)
-        except Exception:
-            s.is_open_now = False
-        # Precompute follow status to avoid unsupported queryset method chaining in template
-        if user_id:
-            s.is_following = s.followers.filter(id=user_id).exists()
-        else:
-            s.is_following = False
-
-    followed_sellers = [s for s in all_sellers if s.is_following]
+    if request.user.is_authenticated:
+        rankings.ensure_fresh()
+        followed_sellers = list(rankings.directory().filter(followers=request.user))
+    else:
+        followed_sellers = []
+    for s in followed_sellers:
+        s.is_following = True
 
     return render(request, 'ethsgebeya/companies.html', {
         'followed_sellers': followed_sellers,
     })
 
 def companies_explore(request):
-    """Separate Explore Companies page showing all sellers."""
-    base_qs = (
-        SellerProfile.objects
-        .annotate(
-            products_count=Count('product', filter=Q(product__is_active=True), distinct=True),
-            followers_count=Count('followers', distinct=True),
-            avg_rating=Avg('product__reviews__rating'),
-        )
-        .order_by('-followers_count', 'company_name')
-    )
-
-    now_time = timezone.localtime().time()
-    all_sellers = list(base_qs)
-    user_id = request.user.id if request.user.is_authenticated else None
-    for s in all_sellers:
-        try:
-            s.is_open_now = bool(s.opening_time and s.closing_time and s.opening_time <= now_time <= s.closing_time)
-        except Exception:
-            s.is_open_now = False
-        s.is_following = s.followers.filter(id=user_id).exists() if user_id else False
+    """Separate Explore Companies page showing all sellers, a page at a time.
+    ``?open=1`` limits the list to sellers open right now.
+    """
+    rankings.ensure_fresh()
+    open_only = request.GET.get('open') == '1'
+    if open_only:
+        sellers = rankings.directory().filter(hours.open_now_q())
+    else:
+        sellers = rankings.RankedDirectory()
+
+    page = Paginator(sellers, getattr(settings, 'COMPANIES_PAGE_SIZE', 24)).get_page(request.GET.get('page'))
+    followed_ids = follows.followed_seller_ids(request.user, page)
+    for s in page:
+        s.is_following = s.pk in followed_ids
 
     return render(request, 'ethsgebeya/explore_companies.html', {
-        'all_sellers': all_sellers,
+        'all_sellers': page,
+        'page_obj': page,
+        'open_only': open_only,
     })
     
     
@@ -230,18 +210,16 @@ def follow_seller(request, seller_id):
         try:
             seller = SellerProfile.objects.get(id=seller_id)
             
-            # Check if user is already following
-            if request.user in seller.followers.all():
+            if not follows.follow(request.user, seller):
                 return JsonResponse({
                     'status': 'error', 
                     'message': 'You are already following this seller'
                 })
             
-            seller.followers.add(request.user)
             return JsonResponse({
                 'status': 'success',
                 'message': f'You are now following {seller.company_name}',
-                'followers_count': seller.followers.count()
+                'followers_count': follows.follower_count(seller)
             })
             
         except SellerProfile.DoesNotExist:
@@ -269,18 +247,16 @@ def unfollow_seller(request, seller_id):
         try:
             seller = SellerProfile.objects.get(id=seller_id)
             
-            # Check if user is following
-            if request.user not in seller.followers.all():
+            if not follows.unfollow(request.user, seller):
                 return JsonResponse({
                     'status': 'error', 
                     'message': 'You are not following this seller'
                 })
             
-            seller.followers.remove(request.user)
             return JsonResponse({
                 'status': 'success',
                 'message': f'You have unfollowed {seller.company_name}',
-                'followers_count': seller.followers.count()
+                'followers_count': follows.follower_count(seller)
             })
             
         except SellerProfile.DoesNotExist:
@@ -303,17 +279,13 @@ def seller_profile(request, seller_id):
     """
     View for displaying individual seller profile
     """
-    seller = get_object_or_404(SellerProfile, id=seller_id)
-    
-    # Check if user is following this seller
-    is_following = False
-    if request.user.is_authenticated:
-        is_following = request.user in seller.followers.all()
+    seller = get_object_or_404(SellerProfile.objects.select_related('stats'), id=seller_id)
     
     context = {
         'seller': seller,
-        'is_following': is_following,
-        'followers_count': seller.followers.count(),
+        'stats': stats.for_seller(seller),
+        'is_following': follows.is_following(request.user, seller),
+        'followers_count': seller.follower_count,
     }
     return render(request, 'seller_profile.html', context)
 
@@ -322,12 +294,12 @@ def following_companies(request):
     """
     View for displaying companies that the user is following
     """
-    sellers = SellerProfile.objects.filter(followers=request.user).order_by('-id')
+    sellers = SellerProfile.objects.filter(followers=request.user).annotate(is_following=Value(True)).order_by('-id')
     
     # Get search query
     search_query = request.GET.get('search', '')
     if search_query:
-        sellers = sellers.filter(company_name__icontains=search_query)
+        sellers = fuzzy.search_queryset(sellers, 'seller', search_query, 'company_name')
     
     # Get filter by business type
     business_type = request.GET.get('business_type', '')
@@ -354,7 +326,7 @@ def seller_categories(request, category_slug=None):
     # Get search query
     search_query = request.GET.get('search', '')
     if search_query:
-        sellers = sellers.filter(company_name__icontains=search_query)
+        sellers = fuzzy.search_queryset(sellers, 'seller', search_query, 'company_name')
     
     # Get filter by business type
     business_type = request.GET.get('business_type', '')
@@ -378,7 +350,7 @@ def verified_sellers(request):
     # Get search query
     search_query = request.GET.get('search', '')
     if search_query:
-        sellers = sellers.filter(company_name__icontains=search_query)
+        sellers = fuzzy.search_queryset(sellers, 'seller', search_query, 'company_name')
     
     # Get filter by business type
     business_type = request.GET.get('business_type', '')
@@ -402,18 +374,13 @@ def toggle_follow_seller(request, seller_id):
         try:
             seller = SellerProfile.objects.get(id=seller_id)
             
-            if request.user in seller.followers.all():
-                seller.followers.remove(request.user)
-                action = 'unfollowed'
-            else:
-                seller.followers.add(request.user)
-                action = 'followed'
+            is_following = follows.toggle(request.user, seller)
             
             return JsonResponse({
                 'status': 'success',
-                'action': action,
-                'followers_count': seller.followers.count(),
-                'is_following': request.user in seller.followers.all()
+                'action': 'followed' if is_following else 'unfollowed',
+                'followers_count': follows.follower_count(seller),
+                'is_following': is_following
             })
             
         except SellerProfile.DoesNotExist:
@@ -431,10 +398,15 @@ def seller_stats(request, seller_id):
     """
     API view to get seller statistics
     """
-    seller = get_object_or_404(SellerProfile, id=seller_id)
+    seller = get_object_or_404(SellerProfile.objects.select_related('stats'), id=seller_id)
+    seller_stats = stats.for_seller(seller)
     
-    stats = {
-        'followers_count': seller.followers.count(),
+    data = {
+        'followers_count': seller.follower_count,
+        'products_count': seller_stats.active_products,
+        'avg_rating': seller_stats.avg_rating,
+        'review_count': seller_stats.review_count,
+        'sold_count': seller_stats.sold_orders,
         'is_verified': seller.is_verified,
         'business_type': seller.get_business_type_display(),
         'company_name': seller.company_name,
@@ -442,7 +414,7 @@ def seller_stats(request, seller_id):
     
     return JsonResponse({
         'status': 'success',
-        'stats': stats
+        'stats': data
     })
 
 # Utility functions
@@ -467,9 +439,8 @@ def get_popular_sellers(limit=10):
     """
     Helper function to get popular sellers by follower count
     """
-    # This is a simplified version - you might want to optimize this
-    sellers = SellerProfile.objects.all()
-    return sorted(sellers, key=lambda s: s.followers.count(), reverse=True)[:limit]
+    rankings.ensure_fresh()
+    return rankings.top(limit)
 
 def get_verified_sellers():
     """
@@ -2,12 +2,21 @@ from django import forms
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from warehouse.models import Product, Order
+from warehouse.models import Product
 from warehouse.decorators import buyer_required
+from warehouse import holds, orders, push
+from warehouse.idempotency import idempotent
 from .forms import CheckoutForm
 
 CART_SESSION_ID = 'cart'
 
+CHECKOUT_FAILURE_MESSAGES = {
+    orders.UNAVAILABLE: "This product is no longer available.",
+    orders.INACTIVE: "This product is no longer available.",
+    orders.OUT_OF_STOCK: "Only {available} left in stock.",
+    orders.INVALID_QUANTITY: "Choose a quantity of at least 1.",
+}
+
 class Cart():
     def __init__(self, request):
         self.session = request.session
@@ -28,6 +37,8 @@ class Cart():
 
     def save(self):
         self.session.modified = True
+        if self.session.session_key:
+            push.publish(push.cart_channel(self.session.session_key), {'cart_count': len(self)})
 
     def remove(self, product):
         product_id = str(product.id)
@@ -37,6 +48,7 @@ class Cart():
 
     def clear(self):
         del self.session[CART_SESSION_ID]
+        self.cart = {}
         self.save()
 
     def __iter__(self):
@@ -60,7 +72,13 @@ class Cart():
 def cart_add(request, product_id):
     cart = Cart(request)
     product = get_object_or_404(Product, id=product_id)
-    cart.add(product=product)
+    quantity = cart.cart.get(str(product.id), {}).get('quantity', 0) + 1
+    try:
+        holds.place(product, holds.owner_token(request.session), quantity)
+    except holds.InsufficientStock as exc:
+        messages.error(request, f"Only {exc.available} available right now.")
+    else:
+        cart.add(product=product)
     return redirect('product_detail', product_id=product_id)
 
 def cart_detail(request):
@@ -69,6 +87,7 @@ def cart_detail(request):
 
 @buyer_required
 @login_required
+@idempotent
 def checkout(request):
     cart = Cart(request)
     cart_items = [item for item in cart if 'product' in item]
@@ -108,31 +127,30 @@ def checkout(request):
         if form.is_valid():
             address = form.cleaned_data['address']
             phone = form.cleaned_data['phone']
-            ordered_any = False
-            for item in cart_items:
-                selected = form.cleaned_data.get(f'select_{item["product"].id}', False)
-                quantity = form.cleaned_data.get(f'quantity_{item["product"].id}', item['quantity'])
-                if selected:
-                    Order.objects.create(
-                        user=request.user,
-                        product=item['product'],
-                        quantity=quantity,
-                        total_price=item['price'] * quantity,
-                        address=address,
-                        phone=phone,
-                    )
-                    ordered_any = True
-                    # Update cart quantity or remove if set to 0
-                    if quantity > 0:
-                        cart.add(item['product'], quantity, override_quantity=True)
-                    else:
-                        cart.remove(item['product'])
-            if ordered_any:
-                cart.clear()
-                messages.success(request, "Order placed successfully! The seller will contact you via the provided phone number.")
-                return redirect('settings_orders_page')
-            else:
+            lines = [
+                (item['product'].id, form.cleaned_data.get(f'quantity_{item["product"].id}', item['quantity']))
+                for item in cart_items
+                if form.cleaned_data.get(f'select_{item["product"].id}', False)
+            ]
+            if not lines:
                 messages.error(request, "Please select at least one product to order.")
+            else:
+                try:
+                    orders.place_orders(
+                        request.user, lines, address=address, phone=phone,
+                        hold_owner=holds.owner_token(request.session, create=False),
+                    )
+                except orders.CheckoutError as exc:
+                    for item in filtered_items:
+                        failure = exc.failures.get(item['product'].id)
+                        if failure:
+                            item['error'] = CHECKOUT_FAILURE_MESSAGES[failure[0]].format(available=failure[1])
+                    messages.error(request, "Some items could not be ordered, so no orders were placed. Please review them below.")
+                else:
+                    holds.release(holds.owner_token(request.session, create=False))
+                    cart.clear()
+                    messages.success(request, "Order placed successfully! The seller will contact you via the provided phone number.")
+                    return redirect('settings_orders_page')
     else:
         form = DynamicCheckoutForm()
     # Use filtered_items instead of cart_items in the template context
@@ -143,6 +161,7 @@ def cart_remove(request, product_id):
     cart = Cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
+    holds.release(holds.owner_token(request.session, create=False), [product.id])
     messages.success(request, "Product removed from your cart.")
     # Redirect to orders and wishlist page instead of cart detail
     return redirect('settings_orders_page')
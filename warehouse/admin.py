@@ -14,8 +14,11 @@ admin.site.register(models.Image)
 admin.site.register(models.ProductImage)
 admin.site.register(models.AnalyticsReport)
 admin.site.register(models.Order)
+admin.site.register(models.OrderLine)
 admin.site.register(models.CustomerInteraction)
 admin.site.register(models.Review)
 admin.site.register(models.UserProfile)
 admin.site.register(Wishlist)
+admin.site.register(models.ProductCard)
+admin.site.register(models.OpeningHours)
 
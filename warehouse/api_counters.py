@@ -1,6 +1,14 @@
-from django.http import JsonResponse
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from warehouse.models import Order, Wishlist
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from warehouse import counters as order_counters, push
+from warehouse.models import Wishlist
 from warehouse.models import CustomerInteraction
 from cart.views import Cart
 
@@ -8,7 +16,7 @@ from cart.views import Cart
 def seller_order_notifications(request):
     # Count new/unread orders for the seller
     seller = request.user.sellerprofile
-    count = Order.objects.filter(product__seller=seller, status='P').count()  # 'P' = Pending
+    count = order_counters.counts(order_counters.SELLER, seller.pk).get('P', 0)  # 'P' = Pending
     return JsonResponse({'count': count})
 
 @login_required
@@ -20,5 +28,99 @@ def buyer_cart_count(request):
 @login_required
 def buyer_order_notifications(request):
     # Count orders for this buyer that are waiting for confirmation
-    count = Order.objects.filter(user=request.user, status='W').count()  # 'W' = Waiting for confirmation
+    count = order_counters.counts(order_counters.BUYER, request.user.pk).get('W', 0)  # 'W' = Waiting for confirmation
     return JsonResponse({'count': count})
+
+
+def _subject(request):
+    """``(SELLER, seller_id)`` for sellers (``None`` without a seller profile), else ``(BUYER, user_id)``."""
+    profile = getattr(request.user, 'profile', None)
+    if profile is not None and profile.role == 'seller':
+        seller = getattr(request.user, 'sellerprofile', None)
+        return order_counters.SELLER, seller.pk if seller else None
+    return order_counters.BUYER, request.user.pk
+
+
+
+
+def _order_values(kind, pk):
+    if kind == order_counters.SELLER:
+        return order_counters.for_seller(pk) if pk else {'new_orders': 0, 'total_sales': 0}
+    return order_counters.for_buyer(pk)
+
+
+def _counter_values(request):
+    kind, pk = _subject(request)
+    values = {'role': kind, **_order_values(kind, pk)}
+    if kind == order_counters.BUYER:
+        values['cart_count'] = len(Cart(request))
+    return values
+
+
+def _counters_etag(request):
+    # Taken from the counter rows themselves, which every worker reads alike; kept for the body.
+    request._counter_values = _counter_values(request)
+    return hashlib.sha1(repr(sorted(request._counter_values.items())).encode('utf-8')).hexdigest()
+
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_counters_etag)
+def counters(request):
+    # Every badge for the user's role; a matching If-None-Match is answered 304 before this runs.
+    return JsonResponse(request._counter_values)
+
+
+def _stream_start(request):
+    """What a stream needs from the ORM and the session, read once; None for anonymous users."""
+    if not request.user.is_authenticated:
+        return None
+    kind, pk = _subject(request)
+    channels = [push.owner_channel(kind, pk)] if pk else []
+    if kind == order_counters.BUYER and request.session.session_key:
+        channels.append(push.cart_channel(request.session.session_key))
+    return kind, pk, channels, _counter_values(request)
+
+
+async def _counter_stream(kind, pk, channels, values):
+    loop = asyncio.get_running_loop()
+    # Servers may not tell the app about a disconnect while it streams, so every stream ends
+    # after PUSH_STREAM_SECONDS and the browser reconnects after `retry`.
+    deadline = loop.time() + push.stream_seconds()
+    async with push.backend().subscribe(channels) as queue:
+        yield push.event('counters', values, retry=push.retry_ms())
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                messages = [await asyncio.wait_for(queue.get(), min(push.keepalive_seconds(), remaining))]
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            while not queue.empty():
+                messages.append(queue.get_nowait())
+            latest = dict(values)
+            for message in messages:
+                latest.update(message)
+            if any('cart_count' not in message for message in messages):
+                latest.update(await sync_to_async(_order_values)(kind, pk))
+            if latest != values:
+                values = latest
+                yield push.event('counters', values)
+
+
+async def counter_events(request):
+    """The counters as server-sent events, pushed as they change.
+
+    Needs an ASGI server (``ETHSGEBEYA.asgi``). Under WSGI a stream would pin a
+    worker thread, so the answer is ``204``, which tells ``EventSource`` to stop
+    reconnecting and the page to poll ``counters`` instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    start = await sync_to_async(_stream_start)(request)
+    if start is None:
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+    response = StreamingHttpResponse(_counter_stream(*start), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from holding events back
+    return response
@@ -1,9 +1,107 @@
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from warehouse.models import Order
+from django.urls import reverse
+from django.views.decorators.http import require_GET
+from warehouse import clusters, geo, holds, hours, lifecycle, suggest as suggest_index
+from warehouse.models import Order, ProductCard, SellerProfile
+from warehouse.pagination import InvalidCursor, KeysetPaginator, page_size_from_request
 
 def seller_pending_orders_count(request):
     if not request.user.is_authenticated or not hasattr(request.user, 'sellerprofile'):
         return JsonResponse({'count': 0})
-    count = Order.objects.filter(product__seller=request.user.sellerprofile, status='P').count()
+    count = Order.objects.filter(seller=request.user.sellerprofile, status='P').count()
     return JsonResponse({'count': count})
+
+@login_required
+@require_GET
+def seller_fulfilment_metrics(request):
+    # All-time p50/p95 seconds from order to completion request and from there to buyer confirmation.
+    seller = getattr(request.user, 'sellerprofile', None)
+    if seller is None:
+        return JsonResponse({'error': 'Not a seller'}, status=403)
+    return JsonResponse(lifecycle.summary(seller))
+
+@require_GET
+def suggest(request):
+    # Typeahead for the header search box; served from memory, no queries per keystroke.
+    q = request.GET.get('q', '')[:100]
+    try:
+        limit = max(1, min(int(request.GET.get('limit', suggest_index.DEFAULT_LIMIT)), suggest_index.MAX_LIMIT))
+    except ValueError:
+        limit = suggest_index.DEFAULT_LIMIT
+    response = JsonResponse({'q': q, 'results': suggest_index.suggest(q, limit)})
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+def _nearby_page(request, queryset, serialize):
+    """Distance-ordered keyset page of ``queryset`` (already annotated with ``distance_km``)."""
+    paginator = KeysetPaginator(queryset, ordering=('distance_km', 'pk'), page_size=page_size_from_request(request))
+    try:
+        page = paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'results': [dict(serialize(obj), distance_km=round(obj.distance_km, 3)) for obj in page],
+        'next': page.next_url(request),
+        'previous': page.previous_url(request),
+    })
+
+@require_GET
+def nearby_sellers(request):
+    # ?lat=&lng=&radius=km; only sellers open right now unless open=0.
+    try:
+        latitude, longitude, radius = geo.parse_origin(request.GET)
+    except geo.InvalidLocation as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    sellers = SellerProfile.objects.all()
+    if request.GET.get('open', '1') != '0':
+        sellers = sellers.filter(hours.open_now_q())
+    sellers = geo.within(sellers, latitude, longitude, radius)
+    return _nearby_page(request, sellers, lambda seller: {
+        'id': seller.pk,
+        'company_name': seller.company_name,
+        'business_type': seller.business_type,
+        'is_verified': seller.is_verified,
+        'latitude': seller.latitude,
+        'longitude': seller.longitude,
+        'url': reverse('seller_profile', args=[seller.pk]),
+    })
+
+@require_GET
+def nearby_products(request):
+    # ?lat=&lng=&radius=km; active products of sellers within the radius, nearest first.
+    try:
+        latitude, longitude, radius = geo.parse_origin(request.GET)
+    except geo.InvalidLocation as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    holds.sweep_if_due()
+    products = ProductCard.objects.filter(is_active=True)
+    if request.GET.get('in_stock') in ('1', 'true', 'on'):
+        products = products.filter(in_stock=True)
+    products = geo.within(products, latitude, longitude, radius, prefix='seller__')
+    return _nearby_page(request, products, lambda card: {
+        'id': str(card.pk),
+        'title': card.title,
+        'price': str(card.price),
+        'image': card.image_url,
+        'seller': card.seller_name,
+        'in_stock': card.in_stock,
+        'available_quantity': max(card.available_quantity, 0),
+        'url': reverse('product_detail', args=[card.pk]),
+    })
+
+@require_GET
+def seller_clusters(request):
+    # ?bbox=west,south,east,north&zoom=z; at most clusters.GRID**2 markers per map tile.
+    try:
+        zoom, tiles = clusters.parse_viewport(request.GET)
+    except clusters.InvalidViewport as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    markers = clusters.clusters_for(zoom, tiles)
+    for marker in markers:
+        if 'id' in marker:
+            marker['url'] = reverse('seller_profile', args=[marker['id']])
+    response = JsonResponse({'zoom': zoom, 'clusters': markers})
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
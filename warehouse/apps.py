@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class WarehouseConfig(AppConfig):
     name = 'warehouse'
+
+    def ready(self):
+        # Receivers that keep derived tables (search index, read models) in sync,
+        # and the tasks runworker can run.
+        from warehouse import cards, clusters, counters, facets, follows, fuzzy, hours, lifecycle, rankings, search, stats, suggest, tasks  # noqa: F401
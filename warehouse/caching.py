@@ -0,0 +1,60 @@
+"""Versioned cache namespaces.
+
+Readers build keys that embed the namespace's current version; writers
+invalidate every key in a namespace at once by bumping that version, so no
+key enumeration is ever needed.
+
+The versions live in the database (``CacheVersion``), not in the cache: the
+default cache is a per-process ``LocMemCache``, and a bump must reach every
+worker. Reading one costs a primary-key lookup, and a bump made inside a
+transaction takes effect when it commits.
+"""
+import hashlib
+import time
+
+from django.db.models import F
+
+from warehouse.models import CacheVersion
+
+
+def _fresh_version():
+    # Time based so a lost version row never resurrects stale entries.
+    return int(time.time() * 1000)
+
+
+def _create(namespace):
+    CacheVersion.objects.bulk_create([CacheVersion(namespace=namespace, version=_fresh_version())], ignore_conflicts=True)
+
+
+def get_version(namespace):
+    versions = CacheVersion.objects.filter(namespace=namespace).values_list('version', flat=True)
+    version = versions.first()
+    if version is None:
+        _create(namespace)
+        version = versions.first()
+    return version
+
+
+def bump_version(namespace):
+    if not CacheVersion.objects.filter(namespace=namespace).update(version=F('version') + 1):
+        _create(namespace)
+
+
+def get_versions(namespaces):
+    """``{namespace: version}`` in one query, for namespaces that only ever go through ``bump_versions``.
+
+    A namespace that was never bumped is at version 0 and has no row, so
+    fine-grained namespaces (one per map tile, say) cost nothing until used.
+    """
+    versions = dict(CacheVersion.objects.filter(namespace__in=namespaces).values_list('namespace', 'version'))
+    return {namespace: versions.get(namespace, 0) for namespace in namespaces}
+
+
+def bump_versions(namespaces):
+    CacheVersion.objects.bulk_create([CacheVersion(namespace=namespace, version=0) for namespace in namespaces], ignore_conflicts=True)
+    CacheVersion.objects.filter(namespace__in=namespaces).update(version=F('version') + 1)
+
+
+def make_key(namespace, *parts):
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return f'{namespace}:{get_version(namespace)}:{digest}'
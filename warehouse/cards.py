@@ -0,0 +1,132 @@
+"""Maintenance of the ProductCard read model.
+
+Each receiver refreshes only the columns its source model feeds, for the one
+product affected, so listing pages never aggregate reviews or touch images
+per card.
+"""
+from django.db import transaction
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.text import Truncator
+
+from warehouse import holds
+from warehouse.models import Product, ProductCard, ProductImage, Review, SellerProfile
+
+
+def _summary(description):
+    return Truncator(description or '').chars(255)
+
+
+def _core_fields(product, seller_name, held):
+    return {
+        'seller_id': product.seller_id,
+        'category_id': product.category_id,
+        'title': product.title,
+        'summary': _summary(product.description),
+        'price': product.price,
+        'seller_name': seller_name,
+        'brand': product.brand,
+        'pricing_type': product.pricing_type,
+        'free_delivery': product.free_delivery,
+        'in_stock': product.in_stock,
+        'available_quantity': product.stock_quantity - held,
+        'is_active': product.is_active,
+        'created_at': product.created_at,
+    }
+
+
+def sync_product(product):
+    """Create or refresh the card columns copied from the Product row."""
+    held = holds.held_quantities([product.pk]).get(product.pk, 0)
+    fields = _core_fields(product, product.seller.company_name, held)
+    updated = ProductCard.objects.filter(pk=product.pk).update(**fields)
+    if not updated:
+        card = ProductCard(product_id=product.pk, **fields)
+        card.image = _primary_image(product.pk)
+        card.avg_rating, card.review_count = _review_stats(product.pk)
+        card.save(force_insert=True)
+
+
+def _primary_image(product_id):
+    name = (
+        ProductImage.objects.filter(product_id=product_id)
+        .order_by('id').values_list('image', flat=True).first()
+    )
+    return name or ''
+
+
+def _review_stats(product_id):
+    stats = Review.objects.filter(product_id=product_id).aggregate(avg=Avg('rating'), count=Count('id'))
+    return stats['avg'], stats['count']
+
+
+def refresh_reviews(product_id):
+    avg, count = _review_stats(product_id)
+    ProductCard.objects.filter(pk=product_id).update(avg_rating=avg, review_count=count)
+
+
+def refresh_image(product_id):
+    ProductCard.objects.filter(pk=product_id).update(image=_primary_image(product_id))
+
+
+def rebuild(batch_size=1000):
+    """Recreate every card from source tables in batches. Returns the count."""
+    reviews = Review.objects.filter(product=OuterRef('pk')).order_by().values('product')
+    products = (
+        Product.objects.order_by('pk')
+        .select_related('seller')
+        .annotate(
+            card_avg_rating=Subquery(reviews.annotate(avg=Avg('rating')).values('avg')),
+            card_review_count=Subquery(reviews.annotate(count=Count('id')).values('count')),
+            card_held=holds.held_expression(),
+            card_image=Subquery(
+                ProductImage.objects.filter(product=OuterRef('pk')).order_by('id').values('image')[:1]
+            ),
+        )
+    )
+    total = 0
+    with transaction.atomic():
+        ProductCard.objects.all().delete()
+        batch = []
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(ProductCard(
+                product_id=product.pk,
+                image=product.card_image or '',
+                avg_rating=product.card_avg_rating,
+                review_count=product.card_review_count or 0,
+                **_core_fields(product, product.seller.company_name, product.card_held),
+            ))
+            if len(batch) >= batch_size:
+                ProductCard.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            ProductCard.objects.bulk_create(batch)
+            total += len(batch)
+    return total
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    sync_product(instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    refresh_reviews(instance.product_id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def image_changed(sender, instance, **kwargs):
+    refresh_image(instance.product_id)
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, created, **kwargs):
+    if not created:
+        ProductCard.objects.filter(seller=instance).exclude(seller_name=instance.company_name).update(
+            seller_name=instance.company_name
+        )
@@ -0,0 +1,135 @@
+"""Server-side marker clustering for the seller map.
+
+The map is cut into the same XYZ tiles Leaflet requests. Each tile is split
+into a ``GRID`` x ``GRID`` grid and sellers are grouped per cell with one
+aggregate query, so a tile never yields more than ``GRID ** 2`` markers no
+matter how many sellers it holds. Tiles are cached individually under a
+per-tile version kept in the database (``warehouse.caching``); when a seller
+is added, moves, is renamed or deleted, only the tiles containing its old and
+new position are bumped, at every zoom level. The bump reaches every worker,
+so ``CLUSTER_CACHE_TIMEOUT`` only bounds memory, not staleness.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, IntegerField, Min
+from django.db.models.functions import Floor
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse import caching
+from warehouse.models import SellerProfile
+
+GRID = 8
+MAX_ZOOM = 20
+MAX_TILES = 64
+MAX_LATITUDE = 85.05112878  # Web Mercator limit
+
+
+class InvalidViewport(ValueError):
+    pass
+
+
+def cache_timeout():
+    return getattr(settings, 'CLUSTER_CACHE_TIMEOUT', 3600)
+
+
+def tile_for(latitude, longitude, zoom):
+    n = 2 ** zoom
+    latitude = min(max(latitude, -MAX_LATITUDE), MAX_LATITUDE)
+    x = int((longitude + 180.0) / 360.0 * n)
+    lat = math.radians(latitude)
+    y = int((1.0 - math.asinh(math.tan(lat)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """``(south, west, north, east)`` of a tile in degrees."""
+    n = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return latitude(y + 1), x / n * 360.0 - 180.0, latitude(y), (x + 1) / n * 360.0 - 180.0
+
+
+def parse_viewport(params):
+    """``(zoom, tiles)`` for ``bbox=west,south,east,north`` and ``zoom``."""
+    try:
+        west, south, east, north = (float(v) for v in params['bbox'].split(','))
+        zoom = int(params['zoom'])
+    except (KeyError, ValueError):
+        raise InvalidViewport('bbox=west,south,east,north and zoom are required')
+    if not (0 <= zoom <= MAX_ZOOM and west <= east and south <= north):
+        raise InvalidViewport('zoom out of range or bbox inverted')
+    min_x, min_y = tile_for(north, west, zoom)
+    max_x, max_y = tile_for(south, east, zoom)
+    if (max_x - min_x + 1) * (max_y - min_y + 1) > MAX_TILES:
+        raise InvalidViewport('bbox covers too many tiles at this zoom')
+    return zoom, [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+
+
+def tile_key(zoom, x, y):
+    return f'clusters:{zoom}:{x}:{y}'
+
+
+def compute_tile(zoom, x, y):
+    south, west, north, east = tile_bounds(x, y, zoom)
+    cells = (
+        SellerProfile.objects.filter(
+            latitude__gte=south, latitude__lt=north, longitude__gte=west, longitude__lt=east,
+        )
+        .order_by()
+        .annotate(
+            cell_x=Floor((F('longitude') - west) * (GRID / (east - west)), output_field=IntegerField()),
+            cell_y=Floor((F('latitude') - south) * (GRID / (north - south)), output_field=IntegerField()),
+        )
+        .values('cell_x', 'cell_y')
+        .annotate(count=Count('pk'), lat=Avg('latitude'), lng=Avg('longitude'), seller_id=Min('pk'))
+    )
+    clusters = []
+    singles = {}
+    for cell in cells:
+        cluster = {'lat': cell['lat'], 'lng': cell['lng'], 'count': cell['count']}
+        if cell['count'] == 1:
+            singles[cell['seller_id']] = cluster
+        clusters.append(cluster)
+    for pk, name in SellerProfile.objects.filter(pk__in=singles).values_list('pk', 'company_name'):
+        singles[pk].update(id=pk, name=name)
+    return clusters
+
+
+def clusters_for(zoom, tiles):
+    namespaces = {tile_key(zoom, x, y): (x, y) for x, y in tiles}
+    versions = caching.get_versions(list(namespaces))
+    keys = {f'{namespace}:{versions[namespace]}': tile for namespace, tile in namespaces.items()}
+    cached = cache.get_many(list(keys))
+    missing = {}
+    for key, (x, y) in keys.items():
+        if key not in cached:
+            missing[key] = compute_tile(zoom, x, y)
+    if missing:
+        cache.set_many(missing, cache_timeout())
+    cached.update(missing)
+    return [cluster for key in keys for cluster in cached[key]]
+
+
+def invalidate_point(latitude, longitude):
+    if latitude is None or longitude is None:
+        return
+    caching.bump_versions([
+        tile_key(zoom, *tile_for(latitude, longitude, zoom)) for zoom in range(MAX_ZOOM + 1)
+    ])
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, created, **kwargs):
+    if created or instance.has_changed('latitude', 'longitude', 'company_name'):
+        invalidate_point(instance.loaded_value('latitude'), instance.loaded_value('longitude'))
+        invalidate_point(instance.latitude, instance.longitude)
+
+
+@receiver(post_delete, sender=SellerProfile)
+def seller_deleted(sender, instance, **kwargs):
+    invalidate_point(instance.latitude, instance.longitude)
@@ -0,0 +1,126 @@
+"""Per-owner order counters behind the badge polls and the counters ETag.
+
+Badge polls never count the orders table. ``OrderCounter`` keeps one row
+per (buyer or seller, status), moved with ``UPDATE ... SET count = count +
+delta`` whenever an order is created, changes status or seller, or is
+deleted, so a poll reads a handful of rows found by their unique key
+however many orders the owner has. ``save()`` and ``delete()`` are covered
+by the receivers below; checkout's ``bulk_create`` and the bulk seller
+transitions call ``orders_moved`` themselves. ``manage.py
+reconcile_order_counters`` repairs drift from changes made behind the
+ORM's back.
+
+``api/counters/`` answers with every counter for the user's role and an
+ETag derived from those counter values, so a poll whose ``If-None-Match``
+still matches gets ``304`` after reading only the owner's counter rows, and
+every worker agrees on the ETag the moment a change commits. Each change is
+also published after commit on the owner's ``warehouse.push`` channel for
+open counter streams.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse import push
+from warehouse.models import Order, OrderCounter
+
+BUYER = 'buyer'
+SELLER = 'seller'
+# The order field that names each kind of owner.
+OWNER_FIELDS = {BUYER: 'user_id', SELLER: 'seller_id'}
+
+
+def _changed(owners):
+    for kind, pk in owners:
+        push.publish(push.owner_channel(kind, pk))
+
+
+def _apply(deltas):
+    """Add ``{(kind, owner_id, status): delta}``; one UPDATE per distinct (kind, status, delta).
+
+    Keys with no owner or no status (an instance saved without its loaded
+    values) are skipped; ``reconcile`` corrects what they would have moved.
+    """
+    deltas = {
+        (kind, owner_id, status): delta for (kind, owner_id, status), delta in deltas.items()
+        if delta and owner_id is not None and status is not None
+    }
+    if not deltas:
+        return
+    OrderCounter.objects.bulk_create(
+        [OrderCounter(kind=kind, owner_id=owner_id, status=status) for kind, owner_id, status in deltas],
+        ignore_conflicts=True,
+    )
+    groups = {}
+    for (kind, owner_id, status), delta in deltas.items():
+        groups.setdefault((kind, status, delta), []).append(owner_id)
+    for (kind, status, delta), owner_ids in groups.items():
+        OrderCounter.objects.filter(kind=kind, status=status, owner_id__in=owner_ids).update(count=F('count') + delta)
+    owners = {(kind, owner_id) for kind, owner_id, _ in deltas}
+    transaction.on_commit(lambda: _changed(owners))
+
+
+def orders_moved(orders, from_status, to_status):
+    """Count ``orders`` out of ``from_status`` and into ``to_status``; ``''`` for creation or deletion."""
+    deltas = Counter()
+    for order in orders:
+        for kind, field in OWNER_FIELDS.items():
+            if from_status:
+                deltas[kind, getattr(order, field), from_status] -= 1
+            if to_status:
+                deltas[kind, getattr(order, field), to_status] += 1
+    _apply(deltas)
+
+
+def counts(kind, owner_id):
+    """``{status: count}`` of one owner's orders, from its counter rows."""
+    return dict(OrderCounter.objects.filter(kind=kind, owner_id=owner_id, count__gt=0).values_list('status', 'count'))
+
+
+def for_seller(seller_id):
+    by_status = counts(SELLER, seller_id)
+    return {'new_orders': by_status.get('P', 0), 'total_sales': by_status.get('W', 0) + by_status.get('C', 0)}
+
+
+def for_buyer(user_id):
+    return {'waiting_orders': counts(BUYER, user_id).get('W', 0)}
+
+
+def reconcile():
+    """Recount every owner's orders and correct the rows that drifted. Returns how many did."""
+    with transaction.atomic():
+        actual = Counter()
+        for kind, field in OWNER_FIELDS.items():
+            totals = Order.objects.order_by().values(field, 'status').annotate(n=Count('pk')).values_list(field, 'status', 'n')
+            for owner_id, status, n in totals:
+                actual[kind, owner_id, status] = n
+        stored = {
+            (kind, owner_id, status): count
+            for kind, owner_id, status, count in OrderCounter.objects.values_list('kind', 'owner_id', 'status', 'count')
+        }
+        drift = {key: actual[key] - stored.get(key, 0) for key in actual.keys() | stored.keys()}
+        _apply(drift)
+    return sum(1 for delta in drift.values() if delta)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        orders_moved([instance], '', instance.status)
+    elif instance.has_changed('status', 'seller_id'):
+        old_status = instance.loaded_value('status')
+        deltas = Counter({
+            (BUYER, instance.user_id, old_status): -1,
+            (SELLER, instance.loaded_value('seller_id'), old_status): -1,
+        })
+        deltas[BUYER, instance.user_id, instance.status] += 1
+        deltas[SELLER, instance.seller_id, instance.status] += 1
+        _apply(deltas)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    orders_moved([instance], instance.status, '')
@@ -0,0 +1,153 @@
+"""Facet counts for the product catalog.
+
+All facets for a query come from one grouped aggregate over ProductCard: the
+rows are grouped by every faceted column at once and rolled up in Python.
+Results are cached per normalized query and invalidated wholesale whenever a
+product or category changes, or checkout or a cancellation moves stock
+(``warehouse.orders``). The namespace version is kept in the database
+(``warehouse.caching``), so an invalidation reaches every worker even though
+each one caches results in its own memory.
+"""
+from collections import Counter, OrderedDict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse import caching
+from warehouse.models import Category, Product
+
+NAMESPACE = 'facets'
+DEFAULT_PRICE_BUCKETS = (0, 100, 500, 1000, 5000)
+FILTER_FIELDS = ('q', 'category', 'min_price', 'max_price', 'in_stock', 'free_delivery', 'pricing_type', 'brand')
+
+
+def price_edges():
+    return tuple(getattr(settings, 'FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS))
+
+
+def price_buckets():
+    """``[(index, low, high), ...]``; the last bucket has no upper bound."""
+    edges = price_edges()
+    return [
+        (i, Decimal(low), Decimal(edges[i + 1]) if i + 1 < len(edges) else None)
+        for i, low in enumerate(edges)
+    ]
+
+
+def normalize(cleaned_data):
+    """A stable, hashable form of the filters that shape a result set."""
+    normalized = []
+    for name in FILTER_FIELDS:
+        value = cleaned_data.get(name)
+        if value in (None, '', False):
+            continue
+        if isinstance(value, Category):
+            value = value.pk
+        elif isinstance(value, str):
+            value = ' '.join(value.lower().split())
+        normalized.append((name, str(value)))
+    return tuple(normalized)
+
+
+def _bucket_expression():
+    whens = [
+        When(price__lt=high, then=Value(index))
+        for index, _, high in price_buckets() if high is not None
+    ]
+    return Case(*whens, default=Value(len(price_edges()) - 1), output_field=IntegerField())
+
+
+def compute(queryset):
+    """Count ``queryset`` (ProductCard rows) by every facet in one query."""
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=_bucket_expression())
+        .values('category_id', 'brand', 'pricing_type', 'in_stock', 'free_delivery', 'price_bucket')
+        .annotate(n=Count('pk'))
+    )
+    categories, brands, pricing, buckets = Counter(), Counter(), Counter(), Counter()
+    in_stock = free_delivery = total = 0
+    for row in rows:
+        n = row['n']
+        total += n
+        if row['category_id'] is not None:
+            categories[row['category_id']] += n
+        if row['brand']:
+            brands[row['brand']] += n
+        pricing[row['pricing_type']] += n
+        buckets[row['price_bucket']] += n
+        in_stock += n if row['in_stock'] else 0
+        free_delivery += n if row['free_delivery'] else 0
+
+    names = dict(Category.objects.filter(pk__in=categories).values_list('pk', 'name'))
+    pricing_labels = dict(Product.PRICING_TYPES)
+    return {
+        'total': total,
+        'category': [
+            {'value': pk, 'label': names.get(pk, ''), 'count': count}
+            for pk, count in categories.most_common()
+        ],
+        'brand': [{'value': brand, 'label': brand, 'count': count} for brand, count in brands.most_common(20)],
+        'pricing_type': [
+            {'value': value, 'label': pricing_labels.get(value, value), 'count': count}
+            for value, count in pricing.most_common()
+        ],
+        'price': [
+            {
+                'min': str(low),
+                'max': str(high) if high is not None else '',
+                'label': f'{low:,.0f}–{high:,.0f}' if high is not None else f'{low:,.0f}+',
+                'count': buckets[index],
+            }
+            for index, low, high in price_buckets() if buckets[index]
+        ],
+        'in_stock': in_stock,
+        'free_delivery': free_delivery,
+    }
+
+
+def facet_counts(queryset, cleaned_data):
+    """Cached :func:`compute` keyed by the normalized filters."""
+    key = caching.make_key(NAMESPACE, normalize(cleaned_data))
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute(queryset)
+        cache.set(key, facets, getattr(settings, 'FACET_CACHE_TIMEOUT', 300))
+    return facets
+
+
+def with_links(facets, request):
+    """Copy of ``facets`` where every option carries the URL that applies it."""
+    def link(**changes):
+        params = request.GET.copy()
+        for name in ('cursor', 'format'):
+            params.pop(name, None)
+        for name, value in changes.items():
+            if value in (None, ''):
+                params.pop(name, None)
+            else:
+                params[name] = value
+        return f'{request.path}?{params.urlencode()}'
+
+    linked = OrderedDict(total=facets['total'])
+    for name in ('category', 'brand', 'pricing_type'):
+        linked[name] = [dict(option, url=link(**{name: option['value']})) for option in facets[name]]
+    linked['price'] = [
+        dict(option, url=link(min_price=option['min'], max_price=option['max'])) for option in facets['price']
+    ]
+    linked['in_stock'] = {'count': facets['in_stock'], 'url': link(in_stock='true')}
+    linked['free_delivery'] = {'count': facets['free_delivery'], 'url': link(free_delivery='true')}
+    linked['clear_url'] = link(**{name: None for name in FILTER_FIELDS if name != 'q'})
+    return linked
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate(sender, **kwargs):
+    caching.bump_version(NAMESPACE)
@@ -0,0 +1,128 @@
+"""Seller follow graph.
+
+Follow edges are rows of the ``SellerProfile.followers`` through table and
+every change goes through that table directly: a follow is an insert that
+the unique ``(sellerprofile, user)`` constraint makes idempotent, an
+unfollow is a delete whose row count says whether anything happened. Only
+the request that actually inserted or deleted the edge adjusts
+``SellerProfile.follower_count``, with an ``F()`` update in the same
+transaction, so concurrent clicks can neither double count nor leave the
+count out of step with the edges.
+
+"Which of these sellers does this user follow" is one query on the edge
+table's ``user_id`` index, restricted to the sellers on the page. It is
+not cached: the default cache is per process, and a follow in one worker
+would stay invisible to the others.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+
+from warehouse.models import SellerProfile
+
+Follow = SellerProfile.followers.through
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def followed_seller_ids(user, seller_ids):
+    """The subset of ``seller_ids`` that ``user`` follows (empty for anonymous users)."""
+    seller_ids = {_pk(seller) for seller in seller_ids}
+    if not seller_ids or not getattr(user, 'is_authenticated', False):
+        return set()
+    return set(
+        Follow.objects.filter(user_id=user.pk, sellerprofile_id__in=seller_ids).values_list('sellerprofile_id', flat=True)
+    )
+
+
+def is_following(user, seller):
+    return bool(followed_seller_ids(user, [seller]))
+
+
+def follower_count(seller):
+    """Current count from the database, not a possibly stale instance attribute."""
+    return SellerProfile.objects.filter(pk=_pk(seller)).values_list('follower_count', flat=True).first() or 0
+
+
+def _adjust_count(seller_id, delta):
+    SellerProfile.objects.filter(pk=seller_id).update(follower_count=F('follower_count') + delta)
+
+
+def follow(user, seller):
+    """Make ``user`` follow ``seller``. Returns False if they already did."""
+    seller_id = _pk(seller)
+    try:
+        with transaction.atomic():
+            Follow.objects.create(sellerprofile_id=seller_id, user_id=user.pk)
+            _adjust_count(seller_id, 1)
+    except IntegrityError:
+        return False  # an earlier or concurrent request already created the edge
+    return True
+
+
+def unfollow(user, seller):
+    """Make ``user`` stop following ``seller``. Returns False if they did not follow it."""
+    seller_id = _pk(seller)
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(sellerprofile_id=seller_id, user_id=user.pk).delete()
+        if deleted:
+            _adjust_count(seller_id, -deleted)
+    return bool(deleted)
+
+
+def toggle(user, seller):
+    """Flip the follow edge; returns whether ``user`` follows ``seller`` afterwards.
+
+    Unfollow is tried first because its delete is atomic; only if there was
+    nothing to delete do we follow. Two simultaneous toggles from a follower
+    therefore leave exactly one unfollow applied, and from a non-follower
+    exactly one follow.
+    """
+    if unfollow(user, seller):
+        return False
+    follow(user, seller)
+    return True
+
+
+def recount(seller_ids=None):
+    """Recompute ``follower_count`` from the edges, for all sellers or the given ids."""
+    edges = (
+        Follow.objects.filter(sellerprofile=OuterRef('pk'))
+        .order_by()
+        .values('sellerprofile')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    sellers = SellerProfile.objects.all()
+    if seller_ids is not None:
+        sellers = sellers.filter(pk__in=seller_ids)
+    return sellers.update(follower_count=Coalesce(Subquery(edges), 0))
+
+
+# Edges changed through the related managers (admin, shell, older code) bypass
+# the service above; keep the counts right for them too.
+
+@receiver(m2m_changed, sender=Follow)
+def followers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        if reverse:
+            instance._cleared_follow_ids = list(Follow.objects.filter(user=instance).values_list('sellerprofile_id', flat=True))
+        else:
+            instance._cleared_follow_ids = list(Follow.objects.filter(sellerprofile=instance).values_list('user_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_follow_ids', [])
+    recount(pk_set if reverse else [instance.pk])
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    # The cascade removes the user's edges without m2m_changed.
+    SellerProfile.objects.filter(followers=instance).update(follower_count=F('follower_count') - 1)
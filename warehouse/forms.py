@@ -107,8 +107,8 @@ class BasicSellerForm(forms.ModelForm):
         closing_time = self.cleaned_data.get('closing_time')
         
         if opening_time and closing_time:
-            if opening_time >= closing_time:
-                raise forms.ValidationError("Opening time must be before closing time.")
+            if opening_time == closing_time:
+                raise forms.ValidationError("Opening and closing time cannot be the same.")
         
         return opening_time
 
@@ -117,9 +117,10 @@ class BasicSellerForm(forms.ModelForm):
         opening_time = self.cleaned_data.get('opening_time')
         closing_time = self.cleaned_data.get('closing_time')
         
+        # A closing time before the opening time means open past midnight.
         if opening_time and closing_time:
-            if closing_time <= opening_time:
-                raise forms.ValidationError("Closing time must be after opening time.")
+            if closing_time == opening_time:
+                raise forms.ValidationError("Opening and closing time cannot be the same.")
         
         return closing_time
 
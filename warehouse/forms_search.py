@@ -1,5 +1,5 @@
 from django import forms
-from .models import Category
+from .models import Category, Product
 
 class ProductSearchForm(forms.Form):
     q = forms.CharField(
@@ -20,3 +20,13 @@ class ProductSearchForm(forms.Form):
             'aria-label': 'Filter by category',
         })
     )
+    min_price = forms.DecimalField(required=False, min_value=0, decimal_places=2, widget=forms.HiddenInput)
+    max_price = forms.DecimalField(required=False, min_value=0, decimal_places=2, widget=forms.HiddenInput)
+    in_stock = forms.BooleanField(required=False, widget=forms.HiddenInput)
+    free_delivery = forms.BooleanField(required=False, widget=forms.HiddenInput)
+    pricing_type = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Any')] + Product.PRICING_TYPES,
+        widget=forms.HiddenInput,
+    )
+    brand = forms.CharField(required=False, max_length=255, widget=forms.HiddenInput)
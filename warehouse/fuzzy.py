@@ -0,0 +1,272 @@
+"""Typo-tolerant search over product titles and company names.
+
+Text goes through one normalization pipeline for both scripts: NFKC and
+case folding, Ge'ez syllables transliterated to Latin, diacritics stripped,
+and a few spelling variants folded together (``q``/``k``, doubled letters).
+The result is split into padded trigrams which are stored as postings in
+``FuzzyTrigram``; ``FuzzyGramStat`` keeps how many documents contain each
+gram.
+
+A query only ever reads a bounded amount of data: at most
+``POSTINGS_BUDGET`` postings, spent on its rarest known grams first, then the
+texts of the best ``CANDIDATE_LIMIT`` candidates, which are scored in
+Python. Latency therefore does not grow with the catalog; see
+``manage.py benchmark_fuzzy_search``.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse.models import FuzzyDocument, FuzzyGramStat, FuzzyTrigram, Product, SellerProfile
+
+PROBE_GRAMS = 8
+POSTINGS_BUDGET = 4000
+CANDIDATE_LIMIT = 200
+
+# Consonant of each Ethiopic row (eight code points per row from U+1200),
+# romanized the way sellers usually spell it in Latin script.
+GEEZ_CONSONANTS = [
+    'h', 'l', 'h', 'm', 's', 'r', 's', 'sh',
+    'k', 'kw', 'kh', 'khw', 'b', 'v', 't', 'ch',
+    'h', 'hw', 'n', 'ny', '', 'k', 'kw', 'h',
+    'hw', 'w', '', 'z', 'zh', 'y', 'd', 'd',
+    'j', 'g', 'gw', 'ng', 't', 'ch', 'p', 'ts',
+    'ts', 'f', 'p',
+]
+# First to eighth order. The sixth order usually has no audible vowel.
+GEEZ_VOWELS = ['e', 'u', 'i', 'a', 'e', '', 'o', 'wa']
+# Rows without a consonant (glottal and pharyngeal A) need a vowel in every order.
+GEEZ_BARE_VOWELS = ['a', 'u', 'i', 'a', 'e', 'i', 'o', 'wa']
+GEEZ_START = 0x1200
+GEEZ_END = GEEZ_START + 8 * len(GEEZ_CONSONANTS)
+GEEZ_SEPARATORS = '፠፡።፣፤፥፦፧፨'
+
+NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+DOUBLED_RE = re.compile(r'(.)\1+')
+
+
+def _transliterate(text):
+    out = []
+    for char in text:
+        code = ord(char)
+        if GEEZ_START <= code < GEEZ_END:
+            row, order = divmod(code - GEEZ_START, 8)
+            consonant = GEEZ_CONSONANTS[row]
+            out.append(consonant + (GEEZ_VOWELS if consonant else GEEZ_BARE_VOWELS)[order])
+        elif char in GEEZ_SEPARATORS:
+            out.append(' ')
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def _strip_accents(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def normalize(text):
+    """Fold ``text`` to the space-separated form that trigrams are taken from."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = _strip_accents(_transliterate(text))
+    text = NON_WORD_RE.sub(' ', text).replace('q', 'k')
+    return ' '.join(DOUBLED_RE.sub(r'\1', word) for word in text.split())
+
+
+def trigrams(normalized):
+    """Padded trigrams of every word, as pg_trgm does: ``'  ab '`` -> ``'  a', ' ab', 'ab '``."""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query_grams, document_grams):
+    """Blend of how much of the query the document covers and plain Jaccard overlap.
+
+    Coverage lets a short query match a long title; the Jaccard term keeps
+    close, equally long matches ahead of long titles that merely contain it.
+    """
+    if not query_grams or not document_grams:
+        return 0.0
+    shared = len(query_grams & document_grams)
+    coverage = shared / len(query_grams)
+    jaccard = shared / len(query_grams | document_grams)
+    return 0.75 * coverage + 0.25 * jaccard
+
+
+def threshold():
+    return getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.45)
+
+
+# -- index maintenance -------------------------------------------------------
+
+def _adjust_df(kind, grams, delta):
+    if not grams:
+        return
+    FuzzyGramStat.objects.filter(kind=kind, gram__in=grams).update(df=F('df') + delta)
+    if delta > 0:
+        existing = set(FuzzyGramStat.objects.filter(kind=kind, gram__in=grams).values_list('gram', flat=True))
+        FuzzyGramStat.objects.bulk_create(
+            [FuzzyGramStat(kind=kind, gram=gram, df=delta) for gram in grams if gram not in existing],
+            ignore_conflicts=True,
+        )
+
+
+def index_object(kind, object_id, text):
+    """Insert or refresh one document; a no-op when its normalized text is unchanged."""
+    normalized = normalize(text)
+    object_id = str(object_id)
+    document = FuzzyDocument.objects.filter(kind=kind, object_id=object_id).first()
+    if document is not None and document.text == normalized:
+        return
+    with transaction.atomic():
+        old = trigrams(document.text) if document else set()
+        new = trigrams(normalized)
+        if document is None:
+            document = FuzzyDocument.objects.create(kind=kind, object_id=object_id, text=normalized)
+        else:
+            document.text = normalized
+            document.save(update_fields=['text'])
+            FuzzyTrigram.objects.filter(document=document, gram__in=old - new).delete()
+        FuzzyTrigram.objects.bulk_create(
+            [FuzzyTrigram(document=document, kind=kind, gram=gram) for gram in new - old]
+        )
+        _adjust_df(kind, old - new, -1)
+        _adjust_df(kind, new - old, 1)
+
+
+def remove_object(kind, object_id):
+    document = FuzzyDocument.objects.filter(kind=kind, object_id=str(object_id)).first()
+    if document is None:
+        return
+    with transaction.atomic():
+        _adjust_df(kind, trigrams(document.text), -1)
+        document.delete()
+
+
+def bulk_index(kind, rows, batch_size=1000, models=(FuzzyDocument, FuzzyTrigram)):
+    """Append ``(object_id, text)`` rows without touching gram stats.
+
+    Returns ``(count, df)`` where ``df`` counts documents per gram for the
+    caller to store. The model classes can be swapped for historical models
+    in migrations.
+    """
+    Document, Trigram = models
+    df = Counter()
+    count = 0
+    documents = []
+
+    def flush():
+        created = Document.objects.bulk_create(documents)
+        postings = []
+        for document in created:
+            grams = trigrams(document.text)
+            df.update(grams)
+            postings.extend(Trigram(document_id=document.pk, kind=kind, gram=gram) for gram in grams)
+        Trigram.objects.bulk_create(postings, batch_size=batch_size * 8)
+        documents.clear()
+        return len(created)
+
+    for object_id, text in rows:
+        documents.append(Document(kind=kind, object_id=str(object_id), text=normalize(text)))
+        if len(documents) >= batch_size:
+            count += flush()
+    if documents:
+        count += flush()
+    return count, df
+
+
+def store_stats(kind, df, model=FuzzyGramStat):
+    model.objects.filter(kind=kind).delete()
+    model.objects.bulk_create([model(kind=kind, gram=gram, df=n) for gram, n in df.items()], batch_size=1000)
+
+
+def sources():
+    return {
+        'product': Product.objects.order_by().values_list('pk', 'title'),
+        'seller': SellerProfile.objects.order_by().values_list('pk', 'company_name'),
+    }
+
+
+def rebuild(batch_size=1000):
+    """Recreate every fuzzy document and gram stat. Returns the number of documents."""
+    total = 0
+    with transaction.atomic():
+        FuzzyDocument.objects.filter(kind__in=[kind for kind, _ in FuzzyDocument.KINDS]).delete()
+        for kind, rows in sources().items():
+            count, df = bulk_index(kind, rows.iterator(chunk_size=batch_size), batch_size)
+            store_stats(kind, df)
+            total += count
+    return total
+
+
+# -- querying ------------------------------------------------------------------
+
+def ranked_ids(kind, q, limit=50):
+    """Return ``[(object_id, score), ...]`` for ``kind`` documents similar to ``q``."""
+    query_grams = trigrams(normalize(q))
+    if not query_grams:
+        return []
+    df = dict(FuzzyGramStat.objects.filter(kind=kind, gram__in=query_grams, df__gt=0).values_list('gram', 'df'))
+    hits = Counter()
+    budget = POSTINGS_BUDGET
+    for gram in sorted(df, key=df.get)[:PROBE_GRAMS]:
+        postings = list(
+            FuzzyTrigram.objects.filter(kind=kind, gram=gram).values_list('document_id', flat=True)[:budget]
+        )
+        hits.update(postings)
+        budget -= len(postings)
+        if budget <= 0:
+            break
+    candidates = [document_id for document_id, _ in hits.most_common(CANDIDATE_LIMIT)]
+    scored = []
+    for object_id, text in FuzzyDocument.objects.filter(pk__in=candidates).values_list('object_id', 'text'):
+        score = similarity(query_grams, trigrams(text))
+        if score >= threshold():
+            scored.append((object_id, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:limit]
+
+
+def search_queryset(queryset, kind, q, field):
+    """Filter ``queryset`` to rows whose ``field`` contains ``q`` or fuzzily matches it.
+
+    Rows are annotated with ``fuzzy_score`` and ordered by it, best first;
+    plain substring matches the index missed score 0.
+    """
+    pk_field = queryset.model._meta.pk
+    hits = [(pk_field.to_python(object_id), score) for object_id, score in ranked_ids(kind, q)]
+    score = Case(
+        *[When(pk=pk, then=Value(s)) for pk, s in hits],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    matches = Q(**{f'{field}__icontains': q}) | Q(pk__in=[pk for pk, _ in hits])
+    return queryset.filter(matches).annotate(fuzzy_score=score).order_by('-fuzzy_score', *queryset.query.order_by)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    index_object('product', instance.pk, instance.title)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    remove_object('product', instance.pk)
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, **kwargs):
+    index_object('seller', instance.pk, instance.company_name)
+
+
+@receiver(post_delete, sender=SellerProfile)
+def seller_deleted(sender, instance, **kwargs):
+    remove_object('seller', instance.pk)
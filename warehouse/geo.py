@@ -0,0 +1,141 @@
+"""Distance search over seller coordinates.
+
+Sellers carry a geohash of their coordinates (kept by ``SellerProfile.save``).
+A radius query picks the longest geohash prefix whose cells are at least as
+large as the radius, so the 3x3 block of cells around the origin covers the
+whole circle. Those nine prefixes become indexed range scans, a
+latitude/longitude bounding box trims the corners, and only the survivors
+get an exact haversine distance computed in SQL, which also drives the
+``(distance, id)`` keyset ordering.
+"""
+import math
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+DEFAULT_RADIUS_KM = 10
+
+
+class InvalidLocation(ValueError):
+    pass
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (longitude, lng_range) if even else (latitude, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """``(height, width)`` of a geohash cell in degrees."""
+    bits = 5 * precision
+    lng_bits = (bits + 1) // 2
+    return 180.0 / 2 ** (bits - lng_bits), 360.0 / 2 ** lng_bits
+
+
+def max_radius_km():
+    return getattr(settings, 'GEO_MAX_RADIUS_KM', 100)
+
+
+def parse_origin(params):
+    """Validated ``(lat, lng, radius_km)`` from request parameters."""
+    try:
+        latitude = float(params['lat'])
+        longitude = float(params['lng'])
+        radius = float(params.get('radius', DEFAULT_RADIUS_KM))
+    except (KeyError, TypeError, ValueError):
+        raise InvalidLocation('lat and lng are required numbers')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not math.isfinite(radius) or radius <= 0:
+        raise InvalidLocation('lat/lng out of range or radius not positive')
+    return latitude, longitude, min(radius, max_radius_km())
+
+
+def _km_per_degree_lng(latitude):
+    return KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6)
+
+
+def covering_prefixes(latitude, longitude, radius_km):
+    """Geohash prefixes of the 3x3 cells around the origin, each wider than ``radius_km``."""
+    precision = 0
+    for candidate in range(PRECISION, 0, -1):
+        height, width = cell_size(candidate)
+        if height * KM_PER_DEGREE >= radius_km and width * _km_per_degree_lng(latitude) >= radius_km:
+            precision = candidate
+            break
+    if precision == 0:
+        return []  # the circle is wider than a top-level cell: no useful prefix
+    height, width = cell_size(precision)
+    prefixes = set()
+    for dy in (-1, 0, 1):
+        lat = min(max(latitude + dy * height, -90.0), 90.0)
+        for dx in (-1, 0, 1):
+            lng = (longitude + dx * width + 180.0) % 360.0 - 180.0
+            prefixes.add(encode(lat, lng, precision))
+    return sorted(prefixes)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / _km_per_degree_lng(latitude)
+    return latitude - dlat, latitude + dlat, longitude - dlng, longitude + dlng
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_expression(latitude, longitude, prefix=''):
+    """SQL haversine distance in km from the origin to ``<prefix>latitude/longitude``."""
+    lat, lng = F(f'{prefix}latitude'), F(f'{prefix}longitude')
+    a = (
+        Power(Sin((Radians(lat) - math.radians(latitude)) / 2), 2)
+        + math.cos(math.radians(latitude)) * Cos(Radians(lat))
+        * Power(Sin((Radians(lng) - math.radians(longitude)) / 2), 2)
+    )
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), 1.0, output_field=FloatField()), output_field=FloatField())
+
+
+def within(queryset, latitude, longitude, radius_km, prefix=''):
+    """Rows of ``queryset`` within ``radius_km``, annotated with ``distance_km``.
+
+    ``prefix`` is the lookup path to the seller, e.g. ``'seller__'`` for products.
+    """
+    prefixes = covering_prefixes(latitude, longitude, radius_km)
+    if prefixes:
+        cells = Q()
+        for cell in prefixes:
+            # A range rather than LIKE so a plain b-tree index serves it on every backend.
+            cells |= Q(**{f'{prefix}geohash__gte': cell, f'{prefix}geohash__lt': cell + '~'})
+        queryset = queryset.filter(cells)
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    queryset = queryset.filter(**{
+        f'{prefix}latitude__gte': min_lat,
+        f'{prefix}latitude__lte': max_lat,
+    })
+    if -180 <= min_lng and max_lng <= 180:
+        queryset = queryset.filter(**{f'{prefix}longitude__gte': min_lng, f'{prefix}longitude__lte': max_lng})
+    return queryset.annotate(distance_km=distance_expression(latitude, longitude, prefix)).filter(
+        distance_km__lte=radius_km
+    )
@@ -0,0 +1,142 @@
+"""Cart inventory holds.
+
+Putting a product in a cart sets aside that quantity for
+``CART_HOLD_SECONDS``. Other shoppers see stock minus every active hold,
+computed from the ``(product, expires_at, quantity)`` index, and checkout
+consumes the buyer's own holds in the same transaction that takes the
+stock. Expired holds stop counting immediately; ``manage.py
+expire_stock_holds`` deletes them in batches and gives the quantity back to
+the listing cards, which store the available quantity so product grids
+never aggregate holds. Until that command is scheduled (``CART_HOLD_SWEEPER
+= True`` once it is), product grid requests run the same sweep themselves,
+at most every ``CART_HOLD_SWEEP_SECONDS`` per process.
+
+A hold belongs to a token kept in the cart's session rather than to a user,
+so it survives signing in halfway through shopping.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from warehouse.models import Product, ProductCard, StockHold
+
+HOLD_SESSION_KEY = 'cart_hold_token'
+SWEPT_KEY = 'stock_holds:swept'
+
+
+class InsufficientStock(Exception):
+    def __init__(self, available):
+        super().__init__(f'only {available} available')
+        self.available = available
+
+
+def hold_seconds():
+    return getattr(settings, 'CART_HOLD_SECONDS', 15 * 60)
+
+
+def sweep_interval():
+    return getattr(settings, 'CART_HOLD_SWEEP_SECONDS', 60)
+
+
+def owner_token(session, create=True):
+    """The hold token of the cart in ``session`` (created on first use unless ``create`` is False)."""
+    token = session.get(HOLD_SESSION_KEY)
+    if token is None and create:
+        token = session[HOLD_SESSION_KEY] = uuid.uuid4().hex
+    return token
+
+
+def active(now=None):
+    return StockHold.objects.filter(expires_at__gt=now or timezone.now())
+
+
+def held_expression(exclude_owner=None, product_ref='pk'):
+    """Quantity held by active holds (other than ``exclude_owner``'s) on ``OuterRef(product_ref)``."""
+    holds = active().filter(product=OuterRef(product_ref))
+    if exclude_owner is not None:
+        holds = holds.exclude(owner=exclude_owner)
+    total = holds.order_by().values('product').annotate(total=Sum('quantity')).values('total')
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def held_quantities(product_ids, exclude_owner=None):
+    holds = active().filter(product_id__in=product_ids)
+    if exclude_owner is not None:
+        holds = holds.exclude(owner=exclude_owner)
+    return dict(holds.order_by().values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+def available(product_ids, owner=None):
+    """``{product_id: stock not held by anyone but owner}``."""
+    return dict(
+        Product.objects.filter(pk__in=product_ids)
+        .annotate(available=F('stock_quantity') - held_expression(owner))
+        .values_list('pk', 'available')
+    )
+
+
+def refresh_cards(product_ids):
+    """Recompute the listing cards' available quantity and stock flag for ``product_ids``."""
+    ProductCard.objects.filter(pk__in=list(product_ids)).update(
+        available_quantity=Subquery(Product.objects.filter(pk=OuterRef('pk')).values('stock_quantity')[:1])
+        - held_expression(product_ref='pk'),
+        in_stock=Subquery(Product.objects.filter(pk=OuterRef('pk')).values('in_stock')[:1]),
+    )
+
+
+def place(product, owner, quantity):
+    """Hold ``quantity`` of ``product`` for ``owner``, replacing any previous hold and restarting its timer.
+
+    Raises ``InsufficientStock`` when other carts and the stock leave less than that.
+    """
+    with transaction.atomic():
+        # Locking the product row serializes concurrent holds on the same product.
+        stock = Product.objects.select_for_update().filter(pk=product.pk).values_list('stock_quantity', flat=True).first()
+        free = (stock or 0) - held_quantities([product.pk], exclude_owner=owner).get(product.pk, 0)
+        if quantity > free:
+            raise InsufficientStock(max(free, 0))
+        StockHold.objects.update_or_create(
+            product_id=product.pk, owner=owner,
+            defaults={'quantity': quantity, 'expires_at': timezone.now() + timedelta(seconds=hold_seconds())},
+        )
+        refresh_cards([product.pk])
+
+
+def release(owner, product_ids=None):
+    """Drop ``owner``'s holds, on ``product_ids`` only if given."""
+    if not owner:
+        return
+    holds = StockHold.objects.filter(owner=owner)
+    if product_ids is not None:
+        holds = holds.filter(product_id__in=list(product_ids))
+    released = list(holds.values_list('product_id', flat=True))
+    if released:
+        holds.delete()
+        refresh_cards(released)
+
+
+def expire(batch_size=1000, now=None):
+    """Delete expired holds in batches and return their stock to the cards. Returns the count."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        batch = list(StockHold.objects.filter(expires_at__lte=now).values_list('pk', 'product_id')[:batch_size])
+        if not batch:
+            return total
+        with transaction.atomic():
+            StockHold.objects.filter(pk__in=[pk for pk, _ in batch]).delete()
+            refresh_cards({product_id for _, product_id in batch})
+        total += len(batch)
+
+
+def sweep_if_due():
+    """``expire`` from a request when nothing else runs it, at most once per interval per process."""
+    if getattr(settings, 'CART_HOLD_SWEEPER', False) or not cache.add(SWEPT_KEY, True, sweep_interval()):
+        return
+    expire()
@@ -0,0 +1,73 @@
+"""Opening-hours queries for sellers.
+
+A seller's week is a set of ``OpeningHours`` intervals in minutes since
+Monday 00:00, local wall-clock time in ``SELLER_TIME_ZONE``. "Open now" is a
+range filter on those columns, so it composes with any seller queryset and
+with pagination instead of requiring every seller to be loaded.
+
+The single opening/closing time pair on SellerProfile (what the settings
+page edits) is kept as the "every day" shortcut: changing it rewrites the
+seller's weekly schedule.
+"""
+import zoneinfo
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from warehouse.models import OpeningHours, SellerProfile
+
+
+def local_now(at=None):
+    at = at or timezone.now()
+    return at.astimezone(zoneinfo.ZoneInfo(getattr(settings, 'SELLER_TIME_ZONE', settings.TIME_ZONE)))
+
+
+def minute_of_week(at=None):
+    local = local_now(at)
+    return local.weekday() * OpeningHours.MINUTES_PER_DAY + local.hour * 60 + local.minute
+
+
+def _covering(minute):
+    # Sunday-night intervals end past the end of the week; match them a week later.
+    later = minute + OpeningHours.MINUTES_PER_WEEK
+    return Q(start_minute__lte=minute, end_minute__gt=minute) | Q(start_minute__lte=later, end_minute__gt=later)
+
+
+def open_hours(at=None):
+    """OpeningHours rows covering ``at`` (default: now)."""
+    return OpeningHours.objects.filter(_covering(minute_of_week(at)))
+
+
+def open_now_q(at=None, prefix=''):
+    """Q matching sellers open at ``at``. ``prefix`` is the path to the seller, e.g. ``'seller__'``."""
+    return Q(**{f'{prefix}pk__in': open_hours(at).values('seller_id')})
+
+
+def is_open_now(at=None):
+    """Boolean expression for annotating a SellerProfile queryset."""
+    return Exists(open_hours(at).filter(seller=OuterRef('pk')))
+
+
+def set_daily_hours(seller, opens_at, closes_at):
+    """Replace ``seller``'s schedule with the same hours every day (none if they are equal)."""
+    OpeningHours.objects.filter(seller=seller).delete()
+    if opens_at == closes_at:
+        return
+    rows = []
+    for weekday, _ in OpeningHours.WEEKDAYS:
+        start, end = OpeningHours.interval(weekday, opens_at, closes_at)
+        rows.append(OpeningHours(
+            seller=seller, weekday=weekday, opens_at=opens_at, closes_at=closes_at,
+            start_minute=start, end_minute=end,
+        ))
+    OpeningHours.objects.bulk_create(rows)
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, created, **kwargs):
+    if created or instance.has_changed('opening_time', 'closing_time'):
+        to_time = SellerProfile._meta.get_field('opening_time').to_python
+        set_daily_hours(instance, to_time(instance.opening_time), to_time(instance.closing_time))
@@ -0,0 +1,165 @@
+"""Idempotency-Key support for POST endpoints that clients retry.
+
+A client that may resend a POST puts the same ``Idempotency-Key`` header on
+every attempt. The first attempt claims the key by inserting an
+``IdempotencyKey`` row; the primary key makes that insert the arbiter
+between concurrent duplicates, so exactly one of them runs the view. Its
+response is stored on the row and in the cache, and later attempts get that
+response replayed (marked ``Idempotent-Replayed: true``) without the view
+running again. A duplicate that arrives while the first attempt is still
+running gets ``409``; reusing a key for a different request gets ``422``.
+
+Keys are scoped to the user, or the session for anonymous callers, and are
+kept for ``IDEMPOTENCY_KEY_TTL`` seconds. Expired rows are ignored and
+replaced on reuse; ``manage.py purge_idempotency_keys`` deletes them in
+batches. Server errors are not stored, so the client can retry them.
+"""
+import hashlib
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from warehouse.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def lock_seconds():
+    """How long a claimed key may stay unfinished before it is treated as abandoned."""
+    return getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', 60)
+
+
+def _digest(*parts):
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode())
+        sha.update(b'\0')
+    return sha.hexdigest()
+
+
+def _scope(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    if request.session.session_key is None:
+        request.session.save()
+    return f'session:{request.session.session_key}'
+
+
+def _cache_key(key):
+    return f'idempotency:{key}'
+
+
+def _error(message, status):
+    return JsonResponse({'success': False, 'error': message}, status=status)
+
+
+def _replay(stored):
+    _, status_code, content_type, location, content = stored
+    response = HttpResponse(bytes(content), status=status_code, content_type=content_type or None)
+    if location:
+        response['Location'] = location
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _as_stored(row):
+    return (row.fingerprint, row.status_code, row.content_type, row.location, bytes(row.content))
+
+
+def _remember(key, stored, expires_at):
+    timeout = (expires_at - timezone.now()).total_seconds()
+    if timeout > 0:
+        cache.set(_cache_key(key), stored, timeout)
+
+
+def _claim(key, fingerprint):
+    """Insert the row for ``key``. Returns ``(row, claimed)``; if not claimed, ``row`` is the one that won."""
+    existing = None
+    for _ in range(3):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    key=key, fingerprint=fingerprint, expires_at=now + timedelta(seconds=ttl()),
+                ), True
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(pk=key).first()
+        if existing is None:
+            continue  # purged between our insert and our read
+        abandoned = existing.status_code is None and existing.created_at < now - timedelta(seconds=lock_seconds())
+        if existing.expires_at > now and not abandoned:
+            return existing, False
+        # Only delete the row we looked at; a fresh claim by someone else must survive.
+        IdempotencyKey.objects.filter(pk=key, created_at=existing.created_at).delete()
+    return existing, False
+
+
+def idempotent(view_func):
+    """Replay the stored response for POSTs that repeat an ``Idempotency-Key``."""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if request.method != 'POST' or not client_key:
+            return view_func(request, *args, **kwargs)
+        if len(client_key) > MAX_KEY_LENGTH:
+            return _error(f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.', 400)
+        key = _digest(_scope(request), client_key)
+        fingerprint = _digest(request.method, request.path, request.body)
+
+        stored = cache.get(_cache_key(key))
+        if stored is None:
+            row, claimed = _claim(key, fingerprint)
+            if not claimed:
+                if row is None or row.status_code is None:
+                    response = _error(f'A request with this {HEADER} is still being processed.', 409)
+                    response['Retry-After'] = '1'
+                    return response
+                stored = _as_stored(row)
+                _remember(key, stored, row.expires_at)
+        if stored is not None:
+            if stored[0] != fingerprint:
+                return _error(f'This {HEADER} was already used for a different request.', 422)
+            return _replay(stored)
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            IdempotencyKey.objects.filter(pk=key, created_at=row.created_at).delete()
+            raise
+        if response.status_code >= 500 or response.streaming:
+            IdempotencyKey.objects.filter(pk=key, created_at=row.created_at).delete()
+            return response
+        row.status_code = response.status_code
+        row.content_type = response.get('Content-Type', '')
+        row.location = response.get('Location', '')
+        row.content = response.content
+        IdempotencyKey.objects.filter(pk=key, created_at=row.created_at).update(
+            status_code=row.status_code, content_type=row.content_type, location=row.location, content=row.content,
+        )
+        _remember(key, _as_stored(row), row.expires_at)
+        return response
+    return _wrapped_view
+
+
+def purge(batch_size=1000, now=None):
+    """Delete expired keys in batches. Returns the count."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        keys = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list('pk', flat=True)[:batch_size])
+        if not keys:
+            return total
+        IdempotencyKey.objects.filter(pk__in=keys).delete()
+        total += len(keys)
@@ -0,0 +1,153 @@
+"""Database-backed background jobs.
+
+A view with slow work to do calls ``enqueue`` and returns: the work becomes
+a ``Job`` row, written in the caller's transaction, naming a function
+registered with ``@task`` and its JSON arguments. ``manage.py runworker``
+claims due jobs, highest ``priority`` first and then earliest ``run_at``,
+and runs them on a thread or process pool. A job that raises is retried
+after ``JOBS_RETRY_BASE_SECONDS`` doubling with each attempt (capped at
+``JOBS_RETRY_MAX_SECONDS``) until it has used its ``max_attempts``, and is
+then marked failed with the error kept on the row.
+
+Claimed jobs are leased for ``JOBS_LEASE_SECONDS``; the jobs of a worker
+that died are put back once their lease runs out, and that counts as an
+attempt. Backends with ``SELECT ... FOR UPDATE SKIP LOCKED`` claim with it,
+so workers never wait on each other's rows. SQLite has no row locks: there
+the claim is a conditional ``UPDATE`` that stamps still-pending candidates
+with the worker's token, and the worker only takes the rows carrying it.
+
+Set ``JOBS_WORKER = True`` once ``runworker`` is actually deployed; until
+then, callers that can do their work in-process check ``has_worker`` and do
+so instead of queueing jobs that nothing would run.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from warehouse.models import Job
+
+_tasks = {}
+
+
+def lease_seconds():
+    return getattr(settings, 'JOBS_LEASE_SECONDS', 10 * 60)
+
+
+def has_worker():
+    return getattr(settings, 'JOBS_WORKER', False)
+
+
+def default_max_attempts():
+    return getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+
+
+def backoff(attempts):
+    """Seconds to wait after the ``attempts``-th failure."""
+    base = getattr(settings, 'JOBS_RETRY_BASE_SECONDS', 30)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'JOBS_RETRY_MAX_SECONDS', 60 * 60))
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register ``func`` for the worker under ``name`` (``module.function`` by default)."""
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__name__}'
+        func.max_attempts = max_attempts
+        _tasks[func.task_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(task, *args, priority=0, run_at=None, **kwargs):
+    """Queue ``task(*args, **kwargs)`` and return the ``Job``.
+
+    ``task`` is a registered function or its name; the arguments must be
+    JSON-serialisable. ``priority`` and ``run_at`` belong to the job and are
+    not passed on.
+    """
+    name = getattr(task, 'task_name', task)
+    if name not in _tasks:
+        raise ValueError(f'Unknown task {name!r}')
+    return Job.objects.create(
+        task=name, args=list(args), kwargs=kwargs, priority=priority, run_at=run_at or timezone.now(),
+        max_attempts=_tasks[name].max_attempts or default_max_attempts(),
+    )
+
+
+def _recover(now):
+    expired = Job.objects.filter(status='R', locked_until__lte=now)
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='F', last_error='Worker lease expired.', locked_until=None, finished_at=now,
+    )
+    expired.update(status='P', locked_by='', locked_until=None, run_at=now)
+
+
+def claim(limit, now=None):
+    """Lease up to ``limit`` due jobs to this caller and return them, in run order."""
+    now = now or timezone.now()
+    _recover(now)
+    token = uuid.uuid4().hex
+    due = Job.objects.filter(status='P', run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+    lease = {
+        'status': 'R', 'locked_by': token, 'attempts': F('attempts') + 1,
+        'locked_until': now + timedelta(seconds=lease_seconds()),
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Job.objects.filter(pk__in=pks).update(**lease)
+    else:
+        pks = list(due.values_list('pk', flat=True)[:limit])
+        # The status condition makes this a compare-and-set: another worker's claim of a row wins it.
+        Job.objects.filter(pk__in=pks, status='P').update(**lease)
+    return list(Job.objects.filter(pk__in=pks, locked_by=token).order_by('-priority', 'run_at', 'pk'))
+
+
+def _finish(job, **fields):
+    # A worker whose lease ran out no longer owns the row; its late result is dropped.
+    Job.objects.filter(pk=job.pk, status='R', locked_by=job.locked_by).update(locked_until=None, **fields)
+
+
+def run(job, now=None):
+    """Run one claimed job and record the outcome. Returns True if the task succeeded."""
+    func = _tasks.get(job.task)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        func(*job.args, **job.kwargs)
+    except Exception as error:
+        now = now or timezone.now()
+        last_error = f'{type(error).__name__}: {error}'[:2000]
+        if job.attempts >= job.max_attempts:
+            _finish(job, status='F', last_error=last_error, finished_at=now)
+        else:
+            _finish(job, status='P', last_error=last_error, run_at=now + timedelta(seconds=backoff(job.attempts)))
+        return False
+    _finish(job, status='D', last_error='', finished_at=now or timezone.now())
+    return True
+
+
+def execute(job):
+    """Pool entry point: ``run`` on this thread's or process's own connection."""
+    close_old_connections()
+    try:
+        return run(job)
+    finally:
+        close_old_connections()
+
+
+def work(batch_size=100, now=None):
+    """Claim and run one batch of due jobs in this thread. Returns ``(succeeded, failed)``."""
+    results = [run(job, now) for job in claim(batch_size, now)]
+    return results.count(True), results.count(False)
+
+
+def purge_finished(days):
+    """Delete jobs that finished, successfully or not, more than ``days`` ago. Returns the count."""
+    deleted, _ = Job.objects.filter(
+        status__in=('D', 'F'), finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
@@ -0,0 +1,153 @@
+"""Order lifecycle log and per-seller latency histograms.
+
+Every order gets an ``OrderEvent`` when it is created and on each status
+change, whichever path made it: checkout's ``bulk_create``, bulk seller
+transitions (both call ``record`` directly) or a plain ``save()`` (the
+receiver below). Events are only ever inserted.
+
+Two latencies are measured as the events are written: ``fulfil`` (order
+placed until the seller requests completion, P→W) and ``confirm`` (that
+request until the buyer confirms, W→C). Each observation increments one
+``LatencyBucket`` row of the seller's histogram; buckets grow
+geometrically by ``BUCKET_RATIO``, so a seller's whole history fits in a
+few dozen rows and a percentile is read from those rows instead of the
+seller's orders, within ``BUCKET_RATIO`` of the true value.
+``manage.py rebuild_latency_histograms`` recomputes them from the log.
+"""
+import math
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from warehouse.models import LatencyBucket, Order, OrderEvent
+
+FULFIL = 'fulfil'
+CONFIRM = 'confirm'
+# (from_status, to_status) -> metric; the clock starts at the order's creation or at its W event.
+METRICS = {('P', 'W'): FULFIL, ('W', 'C'): CONFIRM}
+BUCKET_RATIO = 1.2
+DEFAULT_QUANTILES = (0.5, 0.95)
+
+
+def bucket_for(seconds):
+    """Bucket 0 holds anything under a second; bucket ``b`` holds ``[RATIO**(b-1), RATIO**b)`` seconds."""
+    if seconds < 1:
+        return 0
+    return int(math.log(seconds, BUCKET_RATIO)) + 1
+
+
+def bucket_value(bucket):
+    """Representative duration in seconds: the geometric middle of the bucket."""
+    return 0.5 if bucket == 0 else BUCKET_RATIO ** (bucket - 0.5)
+
+
+def _started_at(metric, orders):
+    if metric == FULFIL:
+        return {order.pk: order.created_at for order in orders}
+    return dict(
+        OrderEvent.objects.filter(order__in=[order.pk for order in orders], to_status='W')
+        .order_by('order_id', 'created_at')
+        .values_list('order_id', 'created_at')
+    )
+
+
+def observe(seller_id, metric, durations):
+    """Add ``durations`` (seconds) to a seller's histogram; one UPDATE per distinct bucket."""
+    counts = Counter(bucket_for(seconds) for seconds in durations)
+    if not counts:
+        return
+    LatencyBucket.objects.bulk_create(
+        [LatencyBucket(seller_id=seller_id, metric=metric, bucket=bucket) for bucket in counts],
+        ignore_conflicts=True,
+    )
+    for bucket, n in counts.items():
+        LatencyBucket.objects.filter(seller_id=seller_id, metric=metric, bucket=bucket).update(count=F('count') + n)
+
+
+def record(orders, from_status, to_status, at=None):
+    """Log that ``orders`` moved ``from_status`` → ``to_status`` (``''`` → ``'P'`` for creation)."""
+    if not orders:
+        return
+    at = at or timezone.now()
+    with transaction.atomic():
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order_id=order.pk, seller_id=order.seller_id, from_status=from_status, to_status=to_status, created_at=at)
+            for order in orders
+        ])
+        metric = METRICS.get((from_status, to_status))
+        if metric is None:
+            return
+        started = _started_at(metric, orders)
+        durations = {}
+        for order in orders:
+            if order.pk in started:
+                durations.setdefault(order.seller_id, []).append((at - started[order.pk]).total_seconds())
+        for seller_id, seconds in durations.items():
+            observe(seller_id, metric, seconds)
+
+
+def percentiles(seller, metric, quantiles=DEFAULT_QUANTILES):
+    """``(count, {quantile: seconds})`` from the seller's histogram; seconds are None with no data."""
+    rows = list(
+        LatencyBucket.objects.filter(seller=seller, metric=metric, count__gt=0)
+        .order_by('bucket').values_list('bucket', 'count')
+    )
+    total = sum(count for _, count in rows)
+    values = {}
+    for quantile in quantiles:
+        rank, seen, values[quantile] = quantile * total, 0, None
+        for bucket, count in rows:
+            seen += count
+            if seen >= rank:
+                values[quantile] = bucket_value(bucket)
+                break
+    return total, values
+
+
+def summary(seller):
+    """``{metric: {'count', 'p50', 'p95'}}`` with durations in seconds, for pages and JSON."""
+    result = {}
+    for metric in (FULFIL, CONFIRM):
+        count, values = percentiles(seller, metric)
+        result[metric] = {
+            'count': count,
+            'p50': round(values[0.5]) if values[0.5] is not None else None,
+            'p95': round(values[0.95]) if values[0.95] is not None else None,
+        }
+    return result
+
+
+def rebuild(batch_size=2000):
+    """Recompute every histogram from the event log. Returns the number of observations."""
+    observations = Counter()
+    waiting_since = {}
+    events = (
+        OrderEvent.objects.order_by('order_id', 'created_at', 'pk')
+        .values_list('order_id', 'seller_id', 'from_status', 'to_status', 'created_at', 'order__created_at')
+    )
+    for order_id, seller_id, from_status, to_status, at, order_created in events.iterator(chunk_size=batch_size):
+        metric = METRICS.get((from_status, to_status))
+        if metric == FULFIL:
+            observations[seller_id, metric, bucket_for((at - order_created).total_seconds())] += 1
+            waiting_since[order_id] = at
+        elif metric == CONFIRM and order_id in waiting_since:
+            observations[seller_id, metric, bucket_for((at - waiting_since.pop(order_id)).total_seconds())] += 1
+    with transaction.atomic():
+        LatencyBucket.objects.all().delete()
+        LatencyBucket.objects.bulk_create(
+            [LatencyBucket(seller_id=s, metric=m, bucket=b, count=n) for (s, m, b), n in observations.items()],
+            batch_size=batch_size,
+        )
+    return sum(observations.values())
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        record([instance], '', instance.status, at=instance.created_at)
+    elif instance.has_changed('status'):
+        record([instance], instance.loaded_value('status'), instance.status)
@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from warehouse import orders
+from warehouse.models import Category, Order, OrderLine, Product, SellerProfile
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare checkout of a large cart line by line against orders.place_orders. '
+        'Query counts matter more than local timings: each query is a round trip to a remote database. '
+        'Runs inside a transaction that is rolled back, so real data is untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=50)
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            buyer = User.objects.create(username='benchmark-checkout-buyer')
+            seller = SellerProfile.objects.create(
+                user=User.objects.create(username='benchmark-checkout-seller'), company_name='Benchmark',
+                description='', contact_number='', address='',
+            )
+            category = Category.objects.create(name='Benchmark checkout', slug='benchmark-checkout')
+            products = [
+                Product.objects.create(
+                    seller=seller, category=category, title=f'Benchmark item {n}', price=10,
+                    stock_quantity=options['lines'] * options['runs'] * 4,
+                )
+                for n in range(options['lines'])
+            ]
+            lines = [(product.pk, 2) for product in products]
+
+            def one_by_one():
+                # The same work done a line at a time: take the stock, then insert an order for the line.
+                for product in products:
+                    Product.objects.filter(pk=product.pk, stock_quantity__gte=2).update(stock_quantity=F('stock_quantity') - 2)
+                    order = Order.objects.create(user=buyer, seller=seller, total_price=product.price * 2)
+                    OrderLine.objects.create(order=order, product=product, quantity=2, unit_price=product.price, total_price=product.price * 2)
+
+            def bulk():
+                orders.place_orders(buyer, lines)
+
+            self.stdout.write(f"{'method':>12} {'queries':>8} {'p50 ms':>8} {'max ms':>8}")
+            for name, run in (('one by one', one_by_one), ('bulk', bulk)):
+                timings = []
+                for _ in range(options['runs']):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        run()
+                        timings.append((time.perf_counter() - started) * 1000)
+                self.stdout.write(
+                    f'{name:>12} {len(queries):>8} {statistics.median(timings):>8.2f} {max(timings):>8.2f}'
+                )
+            transaction.set_rollback(True)
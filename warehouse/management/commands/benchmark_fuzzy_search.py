@@ -0,0 +1,95 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from warehouse import fuzzy
+
+KIND = 'benchmark'
+CONSONANTS = 'bcdfghjklmnprstvwyz'
+VOWELS = 'aeiou'
+LATIN = 'abcdefghijklmnopqrstuvwxyz'
+
+
+class Vocabulary:
+    """Title words the way a real catalog uses them.
+
+    The number of distinct words grows sublinearly with the number of words
+    written (Heaps' law) and a few words are far more common than the rest,
+    so the rarest grams of a title stay rare as the catalog grows.
+    """
+
+    def __init__(self, rng, k=40, beta=0.6):
+        self.rng, self.k, self.beta = rng, k, beta
+        self.words, self.written = [], 0
+
+    def _new_word(self):
+        return ''.join(
+            self.rng.choice(CONSONANTS) + self.rng.choice(VOWELS) for _ in range(self.rng.randint(2, 4))
+        )
+
+    def word(self):
+        self.written += 1
+        if len(self.words) < self.k * self.written ** self.beta:
+            self.words.append(self._new_word())
+            return self.words[-1]
+        return self.words[int(len(self.words) * self.rng.random() ** 3)]
+
+    def title(self):
+        return ' '.join(self.word() for _ in range(3))
+
+
+def _typo(rng, text):
+    i = rng.randrange(len(text))
+    edit = rng.choice(('drop', 'swap', 'replace'))
+    if edit == 'drop':
+        return text[:i] + text[i + 1:]
+    if edit == 'swap' and i + 1 < len(text):
+        return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+    return text[:i] + rng.choice(LATIN) + text[i + 1:]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure fuzzy search latency while a synthetic catalog grows through the given sizes. '
+        'Runs inside a transaction that is rolled back, so real data is untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = Vocabulary(rng)
+        self.stdout.write(f"{'documents':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'recall@10':>10}")
+        with transaction.atomic():
+            df = {}
+            titles = {}
+            for size in sorted(options['sizes']):
+                start = len(titles)
+                rows = [(n, vocabulary.title()) for n in range(start, size)]
+                titles.update(rows)
+                _, batch_df = fuzzy.bulk_index(KIND, rows, batch_size=5000)
+                for gram, n in batch_df.items():
+                    df[gram] = df.get(gram, 0) + n
+                fuzzy.store_stats(KIND, df)
+                self._measure(rng, size, titles, options['queries'])
+            transaction.set_rollback(True)
+
+    def _measure(self, rng, size, titles, queries):
+        timings, found = [], 0
+        for object_id in rng.sample(range(size), min(queries, size)):
+            q = _typo(rng, titles[object_id])
+            started = time.perf_counter()
+            hits = fuzzy.ranked_ids(KIND, q, limit=10)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += str(object_id) in {hit for hit, _ in hits}
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f'{size:>10} {statistics.median(timings):>8.2f} {p95:>8.2f} {timings[-1]:>8.2f} '
+            f'{found / len(timings):>10.0%}'
+        )
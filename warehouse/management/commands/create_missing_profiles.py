@@ -1,15 +1,17 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from warehouse.models import UserProfile
+from warehouse import jobs, tasks
 
 class Command(BaseCommand):
     help = 'Create missing UserProfile objects for all users.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--enqueue', action='store_true', help='Queue the backfill for runworker instead of running it here.')
+
     def handle(self, *args, **options):
-        User = get_user_model()
-        created_count = 0
-        for user in User.objects.all():
-            profile, created = UserProfile.objects.get_or_create(user=user)
-            if created:
-                created_count += 1
+        if options['enqueue']:
+            job = jobs.enqueue(tasks.backfill_profiles, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Queued profile backfill as job #{job.pk}.'))
+            return
+        created_count = tasks.backfill_profiles(batch_size=options['batch_size'])
         self.stdout.write(self.style.SUCCESS(f'Created {created_count} missing UserProfile(s).'))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from warehouse import outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox, one SMTP connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep draining, polling every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=5.0)
+        parser.add_argument('--purge-days', type=int, default=None, help='Also delete emails sent more than this many days ago.')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(f"Purged {outbox.purge_sent(options['purge_days'])} sent email(s).")
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = outbox.drain(batch_size=options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < options['batch_size']:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} email(s), {total_failed} failed attempt(s).'))
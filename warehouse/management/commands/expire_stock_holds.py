@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import holds
+
+
+class Command(BaseCommand):
+    help = 'Delete expired cart stock holds and return their quantity to the product cards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = holds.expire(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Expired {count} hold(s).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import idempotency
+
+
+class Command(BaseCommand):
+    help = 'Delete stored Idempotency-Key responses that have expired.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = idempotency.purge(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} key(s).'))
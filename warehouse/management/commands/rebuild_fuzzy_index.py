@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import fuzzy
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fuzzy trigram index over product titles and company names.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = fuzzy.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} fuzzy search document(s).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import lifecycle
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-seller order latency histograms from the order event log.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = lifecycle.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt histograms from {count} observation(s).'))
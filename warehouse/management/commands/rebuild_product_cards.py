@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import cards
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ProductCard listing read model from products, reviews and images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = cards.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} product card(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from warehouse import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from the Product table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING('Full-text search is not supported on this database backend.'))
+            return
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} product(s).'))
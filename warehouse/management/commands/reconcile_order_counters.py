@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from warehouse import counters
+
+
+class Command(BaseCommand):
+    help = 'Recount orders per buyer, seller and status and fix the counters that drifted.'
+
+    def handle(self, *args, **options):
+        count = counters.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Corrected {count} order counter(s).'))
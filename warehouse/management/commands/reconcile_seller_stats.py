@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from warehouse import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute every seller stats row from products, reviews and orders.'
+
+    def handle(self, *args, **options):
+        count = stats.reconcile()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled stats for {count} seller(s).'))
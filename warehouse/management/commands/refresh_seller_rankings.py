@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from warehouse import rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the seller leaderboard snapshot used by the company directory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rankings.refresh(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Ranked {count} seller(s).'))
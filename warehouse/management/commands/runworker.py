@@ -0,0 +1,55 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from warehouse import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs on a pool of threads or processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4, help='Jobs run at the same time.')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls when idle.')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of polling.')
+        parser.add_argument('--purge-days', type=int, default=None, help='First delete jobs finished more than this many days ago.')
+
+    def _executor(self, pool, concurrency):
+        if pool == 'process':
+            # Spawned, not forked: children open their own connections instead of sharing ours.
+            return ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup)
+        return ThreadPoolExecutor(concurrency, thread_name_prefix='runworker')
+
+    def handle(self, *args, **options):
+        if options['purge_days'] is not None:
+            self.stdout.write(f"Purged {jobs.purge_finished(options['purge_days'])} finished job(s).")
+        concurrency = max(1, options['concurrency'])
+        succeeded = failed = 0
+        running = set()
+        with self._executor(options['pool'], concurrency) as executor:
+            try:
+                while True:
+                    if len(running) < concurrency:
+                        running.update(executor.submit(jobs.execute, job) for job in jobs.claim(concurrency - len(running)))
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['interval'])
+                        continue
+                    done, running = wait(running, timeout=options['interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            ok = future.result()
+                        except Exception as error:
+                            self.stderr.write(f'Job bookkeeping failed: {error}')
+                            ok = False
+                        if ok:
+                            succeeded += 1
+                        else:
+                            failed += 1
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping; waiting for running jobs.')
+        self.stdout.write(self.style.SUCCESS(f'Ran {succeeded} job(s), {failed} failed.'))
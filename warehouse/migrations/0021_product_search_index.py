@@ -0,0 +1,24 @@
+# Generated by Django 4.2.24 on 2026-10-16 09:00
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from warehouse import search
+    search.create_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    from warehouse import search
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0020_sellerprofile_is_verified'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.24 on 2026-10-16 22:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_cards(apps, schema_editor):
+    Product = apps.get_model('warehouse', 'Product')
+    ProductCard = apps.get_model('warehouse', 'ProductCard')
+    ProductImage = apps.get_model('warehouse', 'ProductImage')
+    Review = apps.get_model('warehouse', 'Review')
+    reviews = Review.objects.filter(product=models.OuterRef('pk')).order_by().values('product')
+    products = Product.objects.order_by('pk').select_related('seller').annotate(
+        card_avg_rating=models.Subquery(reviews.annotate(avg=models.Avg('rating')).values('avg')),
+        card_review_count=models.Subquery(reviews.annotate(count=models.Count('id')).values('count')),
+        card_image=models.Subquery(
+            ProductImage.objects.filter(product=models.OuterRef('pk')).order_by('id').values('image')[:1]
+        ),
+    )
+    batch = []
+    for product in products.iterator(chunk_size=1000):
+        batch.append(ProductCard(
+            product_id=product.pk,
+            seller_id=product.seller_id,
+            category_id=product.category_id,
+            title=product.title,
+            summary=(product.description or '')[:255],
+            price=product.price,
+            image=product.card_image or '',
+            avg_rating=product.card_avg_rating,
+            review_count=product.card_review_count or 0,
+            seller_name=product.seller.company_name,
+            in_stock=product.in_stock,
+            is_active=product.is_active,
+            created_at=product.created_at,
+        ))
+        if len(batch) >= 1000:
+            ProductCard.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProductCard.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0021_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCard',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='warehouse.product')),
+                ('title', models.CharField(max_length=255)),
+                ('summary', models.CharField(blank=True, max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('image', models.CharField(blank=True, help_text='Storage path of the primary image', max_length=255)),
+                ('avg_rating', models.FloatField(blank=True, null=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('seller_name', models.CharField(blank=True, max_length=255)),
+                ('in_stock', models.BooleanField(default=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_cards', to='warehouse.category')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_cards', to='warehouse.sellerprofile')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['is_active', 'in_stock', '-created_at'], name='card_listing_idx'), models.Index(fields=['category', 'is_active', '-created_at'], name='card_category_idx'), models.Index(fields=['seller', 'is_active', '-created_at'], name='card_seller_idx')],
+            },
+        ),
+        migrations.RunPython(populate_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.24 on 2026-10-16 22:53
+
+from django.db import migrations, models
+
+
+def copy_facet_fields(apps, schema_editor):
+    Product = apps.get_model('warehouse', 'Product')
+    ProductCard = apps.get_model('warehouse', 'ProductCard')
+    source = Product.objects.filter(pk=models.OuterRef('pk'))
+    ProductCard.objects.update(
+        brand=models.Subquery(source.values('brand')[:1]),
+        pricing_type=models.Subquery(source.values('pricing_type')[:1]),
+        free_delivery=models.Subquery(source.values('free_delivery')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0022_productcard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='brand',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='free_delivery',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='productcard',
+            name='pricing_type',
+            field=models.CharField(choices=[('fixed', 'Fixed Price'), ('hourly', 'Hourly Rate'), ('custom', 'Custom Quote')], default='fixed', max_length=10),
+        ),
+        migrations.RunPython(copy_facet_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.24 on 2026-10-16 22:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_index(apps, schema_editor):
+    from warehouse import fuzzy
+
+    Document = apps.get_model('warehouse', 'FuzzyDocument')
+    Trigram = apps.get_model('warehouse', 'FuzzyTrigram')
+    GramStat = apps.get_model('warehouse', 'FuzzyGramStat')
+    sources = {
+        'product': apps.get_model('warehouse', 'Product').objects.order_by().values_list('pk', 'title'),
+        'seller': apps.get_model('warehouse', 'SellerProfile').objects.order_by().values_list('pk', 'company_name'),
+    }
+    for kind, rows in sources.items():
+        _, df = fuzzy.bulk_index(kind, rows.iterator(chunk_size=1000), models=(Document, Trigram))
+        fuzzy.store_stats(kind, df, model=GramStat)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0023_productcard_facet_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FuzzyDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('seller', 'Seller')], max_length=10)),
+                ('object_id', models.CharField(max_length=36)),
+                ('text', models.TextField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FuzzyGramStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('gram', models.CharField(max_length=3)),
+                ('df', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FuzzyTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10)),
+                ('gram', models.CharField(max_length=3)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='warehouse.fuzzydocument')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fuzzygramstat',
+            constraint=models.UniqueConstraint(fields=('kind', 'gram'), name='fuzzy_gram_stat_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='fuzzydocument',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='fuzzy_document_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='fuzzytrigram',
+            index=models.Index(fields=['kind', 'gram', 'document'], name='fuzzy_posting_idx'),
+        ),
+        migrations.RunPython(populate_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0024_fuzzy_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_listing_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_category_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='productcard',
+            name='card_seller_idx',
+        ),
+        migrations.AddIndex(
+            model_name='customerinteraction',
+            index=models.Index(fields=['product', 'timestamp'], name='interaction_product_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['product', 'status'], name='order_product_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'P')), fields=['product'], name='order_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('in_stock', True), ('is_active', True)), fields=['-created_at'], name='product_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['seller', '-created_at'], name='product_seller_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-product'], name='card_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', '-created_at', '-product'], name='card_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productcard',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['seller', '-created_at', '-product'], name='card_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-created_at'], name='review_product_recent_idx'),
+        ),
+    ]
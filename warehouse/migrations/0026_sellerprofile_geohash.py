@@ -0,0 +1,35 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+def backfill_geohash(apps, schema_editor):
+    from warehouse import geo
+
+    SellerProfile = apps.get_model('warehouse', 'SellerProfile')
+    sellers = SellerProfile.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    batch = []
+    for seller in sellers.only('pk', 'latitude', 'longitude').iterator(chunk_size=1000):
+        seller.geohash = geo.encode(seller.latitude, seller.longitude)
+        batch.append(seller)
+        if len(batch) >= 1000:
+            SellerProfile.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        SellerProfile.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0025_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
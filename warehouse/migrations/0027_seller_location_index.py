@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0026_sellerprofile_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sellerprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='seller_location_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_daily_hours(apps, schema_editor):
+    SellerProfile = apps.get_model('warehouse', 'SellerProfile')
+    OpeningHours = apps.get_model('warehouse', 'OpeningHours')
+    rows = []
+    for pk, opens_at, closes_at in SellerProfile.objects.values_list('pk', 'opening_time', 'closing_time').iterator():
+        if opens_at == closes_at:
+            continue  # the 12:00-12:00 default: hours were never set
+        for weekday in range(7):
+            start = weekday * 1440 + opens_at.hour * 60 + opens_at.minute
+            end = weekday * 1440 + closes_at.hour * 60 + closes_at.minute
+            if end <= start:
+                end += 1440
+            rows.append(OpeningHours(
+                seller_id=pk, weekday=weekday, opens_at=opens_at, closes_at=closes_at,
+                start_minute=start, end_minute=end,
+            ))
+        if len(rows) >= 7000:
+            OpeningHours.objects.bulk_create(rows)
+            rows = []
+    OpeningHours.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0027_seller_location_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningHours',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('opens_at', models.TimeField()),
+                ('closes_at', models.TimeField(help_text='At or before the opening time means open past midnight')),
+                ('start_minute', models.PositiveIntegerField(editable=False)),
+                ('end_minute', models.PositiveIntegerField(editable=False)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_hours', to='warehouse.sellerprofile')),
+            ],
+            options={
+                'verbose_name_plural': 'opening hours',
+                'ordering': ['seller', 'weekday', 'opens_at'],
+                'indexes': [models.Index(fields=['start_minute', 'end_minute'], name='hours_interval_idx')],
+            },
+        ),
+        migrations.RunPython(copy_daily_hours, migrations.RunPython.noop),
+    ]
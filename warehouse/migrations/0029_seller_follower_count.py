@@ -0,0 +1,38 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:23
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_follower_count(apps, schema_editor):
+    SellerProfile = apps.get_model('warehouse', 'SellerProfile')
+    Follow = SellerProfile.followers.through
+    edges = (
+        Follow.objects.filter(sellerprofile=OuterRef('pk'))
+        .order_by()
+        .values('sellerprofile')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    SellerProfile.objects.update(follower_count=Coalesce(Subquery(edges), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0028_opening_hours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sellerprofile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_follower_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sellerprofile',
+            index=models.Index(fields=['-follower_count', 'company_name', 'id'], name='seller_popularity_idx'),
+        ),
+    ]
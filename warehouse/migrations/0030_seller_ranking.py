@@ -0,0 +1,51 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_rankings(apps, schema_editor):
+    # Placeholder rows, dated long ago so that rankings.ensure_fresh() rebuilds them on the first
+    # directory request (or queues the rebuild, with a worker deployed).
+    import datetime
+
+    SellerProfile = apps.get_model('warehouse', 'SellerProfile')
+    SellerRanking = apps.get_model('warehouse', 'SellerRanking')
+    stale = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+    SellerRanking.objects.bulk_create(
+        [
+            SellerRanking(seller_id=pk, rank=rank, followers=followers, refreshed_at=stale)
+            for rank, (pk, followers) in enumerate(
+                SellerProfile.objects.order_by('-follower_count', 'pk').values_list('pk', 'follower_count'), start=1
+            )
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0029_seller_follower_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerRanking',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='warehouse.sellerprofile')),
+                ('rank', models.PositiveIntegerField(db_index=True)),
+                ('score', models.FloatField(default=0)),
+                ('followers', models.PositiveIntegerField(default=0)),
+                ('active_products', models.PositiveIntegerField(default=0)),
+                ('avg_rating', models.FloatField(blank=True, null=True)),
+                ('review_count', models.PositiveIntegerField(default=0)),
+                ('sales', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.RunPython(seed_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill_stats(apps, schema_editor):
+    SellerProfile = apps.get_model('warehouse', 'SellerProfile')
+    SellerStats = apps.get_model('warehouse', 'SellerStats')
+    Product = apps.get_model('warehouse', 'Product')
+    Review = apps.get_model('warehouse', 'Review')
+    Order = apps.get_model('warehouse', 'Order')
+    SellerStats.objects.bulk_create(
+        [SellerStats(seller_id=pk) for pk in SellerProfile.objects.values_list('pk', flat=True)], batch_size=1000,
+    )
+
+    def totals(queryset, seller_path, **aggregates):
+        return queryset.filter(**{seller_path: OuterRef('seller_id')}).order_by().values(seller_path).annotate(**aggregates)
+
+    products = totals(Product.objects.filter(is_active=True), 'seller_id', n=Count('pk'))
+    reviews = totals(Review.objects.all(), 'product__seller_id', n=Count('pk'), total=Sum('rating'))
+    sold = totals(Order.objects.filter(status__in=['W', 'C']), 'product__seller_id', n=Count('pk'))
+    SellerStats.objects.update(
+        active_products=Coalesce(Subquery(products.values('n')), Value(0)),
+        review_count=Coalesce(Subquery(reviews.values('n')), Value(0)),
+        rating_total=Coalesce(Subquery(reviews.values('total')), Value(0)),
+        sold_orders=Coalesce(Subquery(sold.values('n')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0030_seller_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SellerStats',
+            fields=[
+                ('seller', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='warehouse.sellerprofile')),
+                ('active_products', models.IntegerField(default=0)),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_total', models.IntegerField(default=0)),
+                ('sold_orders', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'seller stats',
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
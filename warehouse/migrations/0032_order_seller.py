@@ -0,0 +1,60 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+BATCH_SIZE = 2000
+
+
+def backfill_order_seller(apps, schema_editor):
+    Order = apps.get_model('warehouse', 'Order')
+    Product = apps.get_model('warehouse', 'Product')
+    seller = Subquery(Product.objects.filter(pk=OuterRef('product_id')).values('seller_id')[:1])
+    last_pk = 0
+    while True:
+        # Walk the primary key so each batch is a short range update, committed on its own.
+        pks = list(
+            Order.objects.filter(pk__gt=last_pk, seller__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        Order.objects.filter(pk__gte=pks[0], pk__lte=pks[-1], seller__isnull=True).update(seller_id=seller)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('warehouse', '0031_seller_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='seller',
+            field=models.ForeignKey(null=True, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='warehouse.sellerprofile'),
+        ),
+        migrations.RunPython(backfill_order_seller, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='order',
+            name='seller',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='warehouse.sellerprofile'),
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', 'status'], name='order_seller_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'P')), fields=['seller'], name='order_seller_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['seller', '-created_at'], name='order_seller_recent_idx'),
+        ),
+    ]
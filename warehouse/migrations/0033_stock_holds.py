@@ -0,0 +1,46 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:35
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_available_quantity(apps, schema_editor):
+    Product = apps.get_model('warehouse', 'Product')
+    ProductCard = apps.get_model('warehouse', 'ProductCard')
+    ProductCard.objects.update(
+        available_quantity=Subquery(Product.objects.filter(pk=OuterRef('pk')).values('stock_quantity')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0032_order_seller'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productcard',
+            name='available_quantity',
+            field=models.IntegerField(default=0, help_text='Stock minus quantities held in carts'),
+        ),
+        migrations.RunPython(backfill_available_quantity, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner', models.CharField(help_text="Hold token stored in the cart's session", max_length=64)),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='warehouse.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', 'expires_at', 'quantity'], name='hold_product_active_idx'), models.Index(fields=['expires_at'], name='hold_expiry_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockhold',
+            constraint=models.UniqueConstraint(fields=('product', 'owner'), name='stock_hold_unique'),
+        ),
+    ]
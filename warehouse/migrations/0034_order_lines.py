@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 2000
+
+
+def copy_order_lines(apps, schema_editor):
+    # Every existing order becomes a header with the single line it used to carry.
+    Order = apps.get_model('warehouse', 'Order')
+    OrderLine = apps.get_model('warehouse', 'OrderLine')
+    last_pk = 0
+    while True:
+        # Walk the primary key so each batch is a short insert, committed on its own.
+        rows = list(
+            Order.objects.filter(pk__gt=last_pk)
+            .order_by('pk').values_list('pk', 'product_id', 'quantity', 'total_price')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        OrderLine.objects.bulk_create([
+            OrderLine(
+                order_id=pk, product_id=product_id, quantity=quantity, total_price=total_price,
+                unit_price=(total_price / (quantity or 1)).quantize(Decimal('0.01')),
+            )
+            for pk, product_id, quantity, total_price in rows
+        ])
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('warehouse', '0033_stock_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='warehouse.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_lines', to='warehouse.product')),
+            ],
+        ),
+        migrations.RunPython(copy_order_lines, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_product_status_idx',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='product',
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='quantity',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='seller',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='warehouse.sellerprofile'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='total_price',
+            field=models.DecimalField(decimal_places=2, help_text='Sum of the lines', max_digits=10),
+        ),
+    ]
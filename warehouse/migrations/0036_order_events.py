@@ -0,0 +1,43 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0035_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatencyBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('fulfil', 'Order to completion request'), ('confirm', 'Completion request to buyer confirmation')], max_length=10)),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='latency_buckets', to='warehouse.sellerprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('P', 'Pending'), ('W', 'Waiting for Buyer Confirmation'), ('C', 'Completed'), ('X', 'Cancelled')], help_text='Empty for creation', max_length=1)),
+                ('to_status', models.CharField(choices=[('P', 'Pending'), ('W', 'Waiting for Buyer Confirmation'), ('C', 'Completed'), ('X', 'Cancelled')], max_length=1)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='warehouse.order')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_events', to='warehouse.sellerprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'to_status'], name='order_event_order_idx'), models.Index(fields=['seller', '-created_at'], name='order_event_seller_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='latencybucket',
+            constraint=models.UniqueConstraint(fields=('seller', 'metric', 'bucket'), name='latency_bucket_unique'),
+        ),
+    ]
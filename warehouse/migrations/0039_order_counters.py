@@ -0,0 +1,41 @@
+# Generated by Django 4.2.24 on 2026-10-16 23:54
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_orders(apps, schema_editor):
+    # One GROUP BY per kind of owner; the result is a few rows per buyer and seller.
+    Order = apps.get_model('warehouse', 'Order')
+    OrderCounter = apps.get_model('warehouse', 'OrderCounter')
+    for kind, field in (('buyer', 'user_id'), ('seller', 'seller_id')):
+        totals = Order.objects.order_by().values(field, 'status').annotate(n=Count('pk')).values_list(field, 'status', 'n')
+        OrderCounter.objects.bulk_create(
+            (OrderCounter(kind=kind, owner_id=owner_id, status=status, count=n) for owner_id, status, n in totals.iterator()),
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0038_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('buyer', 'Buyer'), ('seller', 'Seller')], max_length=6)),
+                ('owner_id', models.BigIntegerField(help_text="The buyer's user id or the seller profile's id")),
+                ('status', models.CharField(choices=[('P', 'Pending'), ('W', 'Waiting for Buyer Confirmation'), ('C', 'Completed'), ('X', 'Cancelled')], max_length=1)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ordercounter',
+            constraint=models.UniqueConstraint(fields=('kind', 'owner_id', 'status'), name='order_counter_unique'),
+        ),
+        migrations.RunPython(count_orders, migrations.RunPython.noop),
+    ]
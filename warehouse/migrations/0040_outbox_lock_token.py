@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-17 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('warehouse', '0039_order_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxemail',
+            name='locked_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
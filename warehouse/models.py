@@ -9,11 +9,49 @@ from django.conf import settings
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.validators import MinValueValidator
+from warehouse import geo
 
 
-class SellerProfile(models.Model):
+class LoadedValuesMixin:
+    """Remember the database values of ``tracked_fields`` so receivers can tell what changed."""
+    tracked_fields = ()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
 
+    def _remember_loaded_values(self):
+        self._loaded_values = {name: self.__dict__.get(name) for name in self.tracked_fields}
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # After post_save, so receivers still see the previous values.
+        self._remember_loaded_values()
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        # Deferred-field loads refresh single fields; only those values are new.
+        refreshed = [
+            name for name in self.tracked_fields
+            if fields is None or name in fields or name.removesuffix('_id') in fields
+        ]
+        self._loaded_values = {**getattr(self, '_loaded_values', {}), **{name: self.__dict__.get(name) for name in refreshed}}
+
+    def loaded_value(self, name):
+        """Value of ``name`` as last read from or written to the database (None for new rows)."""
+        return getattr(self, '_loaded_values', {}).get(name)
+
+    def has_changed(self, *names):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return True
+        return any(loaded.get(name) != getattr(self, name) for name in names or self.tracked_fields)
+
+
+class SellerProfile(LoadedValuesMixin, models.Model):
+    tracked_fields = ('latitude', 'longitude', 'company_name', 'opening_time', 'closing_time')
 
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='sellerprofile')
     company_name = models.CharField(max_length=255)
@@ -24,9 +62,13 @@ class SellerProfile(models.Model):
     opening_time = models.TimeField(verbose_name='Opening Time', default='12:00')
     closing_time = models.TimeField(verbose_name='Closing Time', default='12:00')
     followers = models.ManyToManyField(User, related_name='following_sellers', blank=True)
+    # Maintained by warehouse.follows alongside the follower edges
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
     # Optional map coordinates (WGS84)
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    # Derived from latitude/longitude in save(); see warehouse.geo
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
 
     business_type = models.CharField(
         max_length=50,
@@ -40,9 +82,81 @@ class SellerProfile(models.Model):
     
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='seller_location_idx'),
+            models.Index(fields=['-follower_count', 'company_name', 'id'], name='seller_popularity_idx'),
+        ]
+
     def __str__(self):
         return self.company_name
 
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geo.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        elif update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # follower_count only changes through F() updates; never write back a stale copy.
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'follower_count'
+            ]
+        super().save(*args, **kwargs)
+
+
+class OpeningHours(models.Model):
+    """One opening interval of a seller's weekly schedule.
+
+    ``start_minute``/``end_minute`` are minutes since Monday 00:00 local time,
+    precomputed in save() so "open now" is an indexed range filter. A
+    closing time at or before the opening time means open past midnight, in
+    which case ``end_minute`` runs into the next day (and past the end of the
+    week for Sunday nights).
+    """
+    MINUTES_PER_DAY = 24 * 60
+    MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+    WEEKDAYS = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='opening_hours')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAYS)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField(help_text="At or before the opening time means open past midnight")
+    start_minute = models.PositiveIntegerField(editable=False)
+    end_minute = models.PositiveIntegerField(editable=False)
+
+    class Meta:
+        ordering = ['seller', 'weekday', 'opens_at']
+        verbose_name_plural = 'opening hours'
+        indexes = [
+            models.Index(fields=['start_minute', 'end_minute'], name='hours_interval_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.seller} {self.get_weekday_display()} {self.opens_at:%H:%M}-{self.closes_at:%H:%M}"
+
+    @classmethod
+    def interval(cls, weekday, opens_at, closes_at):
+        start = weekday * cls.MINUTES_PER_DAY + opens_at.hour * 60 + opens_at.minute
+        end = weekday * cls.MINUTES_PER_DAY + closes_at.hour * 60 + closes_at.minute
+        if end <= start:
+            end += cls.MINUTES_PER_DAY
+        return start, end
+
+    def save(self, *args, **kwargs):
+        self.start_minute, self.end_minute = self.interval(self.weekday, self.opens_at, self.closes_at)
+        super().save(*args, **kwargs)
+
 
 class Category(models.Model): 
     name = models.CharField(max_length=255)
@@ -57,7 +171,9 @@ class Category(models.Model):
             self.slug = slugify(self.name)
         super().save(*args, **kwargs)
 
-class Product(models.Model):
+class Product(LoadedValuesMixin, models.Model):
+    tracked_fields = ('is_active', 'seller_id')
+
     PRICING_TYPES = [
         ('fixed', 'Fixed Price'),
         ('hourly', 'Hourly Rate'),
@@ -111,6 +227,14 @@ class Product(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Partial: boolean filters compile to bare column tests that only a matching
+            # index condition (not a leading key column) lets the planner use.
+            models.Index(
+                fields=['-created_at'], condition=models.Q(is_active=True, in_stock=True), name='product_listing_idx',
+            ),
+            models.Index(fields=['seller', '-created_at'], name='product_seller_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -166,7 +290,10 @@ class AnalyticsReport(models.Model):
         return f"Analytics for {self.seller.company_name}"
 
 
-class Order(models.Model):
+class Order(LoadedValuesMixin, models.Model):
+    """What one checkout bought from one seller; the products are its ``lines``."""
+    tracked_fields = ('status', 'seller_id')
+
     STATUS_CHOICES = (
         ('P', 'Pending'),
         ('W', 'Waiting for Buyer Confirmation'),
@@ -174,14 +301,77 @@ class Order(models.Model):
         ('X', 'Cancelled'),
     )
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders_as_user')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='orders_as_product')
-    quantity = models.PositiveIntegerField(default=1)
-    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='orders')
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Sum of the lines")
     status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P')
     created_at = models.DateTimeField(auto_now_add=True)
     address = models.TextField(blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['seller', 'status'], name='order_seller_status_idx'),
+            # Pending orders are what the seller notification poll counts every few seconds.
+            models.Index(fields=['seller'], condition=models.Q(status='P'), name='order_seller_pending_idx'),
+            models.Index(fields=['seller', '-created_at'], name='order_seller_recent_idx'),
+            models.Index(fields=['user', 'status'], name='order_user_status_idx'),
+            models.Index(fields=['user', '-created_at'], name='order_user_recent_idx'),
+        ]
+
+    @property
+    def quantity(self):
+        return sum(line.quantity for line in self.lines.all())
+
+    def summary(self):
+        """``"Title (xN), ..."`` for pages and emails; prefetch ``lines__product`` when listing orders."""
+        return ', '.join(f'{line.product.title} (x{line.quantity})' for line in self.lines.all())
+
+
+class OrderEvent(models.Model):
+    """Append-only record of an order's creation and status changes; see ``warehouse.lifecycle``."""
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='order_events')
+    from_status = models.CharField(max_length=1, choices=Order.STATUS_CHOICES, blank=True, help_text="Empty for creation")
+    to_status = models.CharField(max_length=1, choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'to_status'], name='order_event_order_idx'),
+            models.Index(fields=['seller', '-created_at'], name='order_event_seller_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_status or '-'} -> {self.to_status}"
+
+
+class LatencyBucket(models.Model):
+    """One bucket of a seller's order latency histogram; see ``warehouse.lifecycle``."""
+    METRIC_CHOICES = (
+        ('fulfil', 'Order to completion request'),
+        ('confirm', 'Completion request to buyer confirmation'),
+    )
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='latency_buckets')
+    metric = models.CharField(max_length=10, choices=METRIC_CHOICES)
+    bucket = models.PositiveSmallIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['seller', 'metric', 'bucket'], name='latency_bucket_unique'),
+        ]
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_lines')
+    quantity = models.PositiveIntegerField(default=1)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} in order {self.order_id}"
+
 class CustomerInteraction(models.Model):
     TYPE_CHOICES = (
         ('V', 'Product View'),
@@ -193,7 +383,14 @@ class CustomerInteraction(models.Model):
     interaction_type = models.CharField(max_length=1, choices=TYPE_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
 
-class Review(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'timestamp'], name='interaction_product_time_idx'),
+        ]
+
+class Review(LoadedValuesMixin, models.Model):
+    tracked_fields = ('rating', 'product_id')
+
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     rating = models.PositiveSmallIntegerField(choices=[(i, str(i)) for i in range(1, 6)])
@@ -203,10 +400,293 @@ class Review(models.Model):
     class Meta:
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['product', '-created_at'], name='review_product_recent_idx'),
+        ]
 
     def __str__(self):
         return f"Review for {self.product.title} by {self.user.username}"
 
+
+class ProductCard(models.Model):
+    """Denormalized listing row for a Product.
+
+    Kept current by ``warehouse.cards`` so product grids render from a single
+    indexed query; ``manage.py rebuild_product_cards`` repairs any drift.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='card')
+    seller = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='product_cards')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='product_cards')
+    title = models.CharField(max_length=255)
+    summary = models.CharField(max_length=255, blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    image = models.CharField(max_length=255, blank=True, help_text="Storage path of the primary image")
+    avg_rating = models.FloatField(blank=True, null=True)
+    review_count = models.PositiveIntegerField(default=0)
+    seller_name = models.CharField(max_length=255, blank=True)
+    brand = models.CharField(max_length=255, blank=True)
+    pricing_type = models.CharField(max_length=10, choices=Product.PRICING_TYPES, default='fixed')
+    free_delivery = models.BooleanField(default=False)
+    in_stock = models.BooleanField(default=True)
+    available_quantity = models.IntegerField(default=0, help_text="Stock minus quantities held in carts")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-product'], condition=models.Q(is_active=True), name='card_listing_idx'),
+            models.Index(
+                fields=['category', '-created_at', '-product'], condition=models.Q(is_active=True), name='card_category_idx',
+            ),
+            models.Index(
+                fields=['seller', '-created_at', '-product'], condition=models.Q(is_active=True), name='card_seller_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Card for {self.title}"
+
+    @property
+    def id(self):
+        return self.product_id
+
+    @property
+    def image_url(self):
+        if not self.image:
+            return ''
+        return ProductImage._meta.get_field('image').storage.url(self.image)
+
+
+class CacheVersion(models.Model):
+    """The current version of one cache namespace, shared by every worker; see ``warehouse.caching``."""
+    namespace = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.namespace} v{self.version}"
+
+
+class StockHold(models.Model):
+    """Stock set aside for one cart until ``expires_at``; see ``warehouse.holds``."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='holds')
+    owner = models.CharField(max_length=64, help_text="Hold token stored in the cart's session")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'owner'], name='stock_hold_unique'),
+        ]
+        indexes = [
+            # Covers "sum of active holds per product" without touching the table.
+            models.Index(fields=['product', 'expires_at', 'quantity'], name='hold_product_active_idx'),
+            models.Index(fields=['expires_at'], name='hold_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for {self.owner}"
+
+
+class IdempotencyKey(models.Model):
+    """Outcome of the first request sent with a client's ``Idempotency-Key``; see ``warehouse.idempotency``."""
+    key = models.CharField(max_length=64, primary_key=True, help_text="SHA-256 of the caller's scope and key")
+    fingerprint = models.CharField(max_length=64, help_text="SHA-256 of the method, path and body")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Empty while the first request runs")
+    content_type = models.CharField(max_length=100, blank=True)
+    location = models.CharField(max_length=500, blank=True)
+    content = models.BinaryField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class OutboxEmail(models.Model):
+    """An email waiting to be sent, written in the sender's transaction; see ``warehouse.outbox``."""
+    STATUS_CHOICES = (
+        ('P', 'Pending'),
+        ('S', 'Sent'),
+        ('F', 'Failed'),
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=32, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "what is due" scan only ever looks at pending rows.
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='P'), name='outbox_due_idx'),
+            models.Index(fields=['status', 'sent_at'], name='outbox_sent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.get_status_display()})"
+
+
+class OrderCounter(models.Model):
+    """How many orders one buyer or seller has in one status; see ``warehouse.counters``."""
+    KIND_CHOICES = (
+        ('buyer', 'Buyer'),
+        ('seller', 'Seller'),
+    )
+    kind = models.CharField(max_length=6, choices=KIND_CHOICES)
+    owner_id = models.BigIntegerField(help_text="The buyer's user id or the seller profile's id")
+    status = models.CharField(max_length=1, choices=Order.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'owner_id', 'status'], name='order_counter_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.owner_id} {self.status}: {self.count}"
+
+
+class Job(models.Model):
+    """A call of a registered task for ``manage.py runworker``; see ``warehouse.jobs``."""
+    STATUS_CHOICES = (
+        ('P', 'Pending'),
+        ('R', 'Running'),
+        ('D', 'Done'),
+        ('F', 'Failed'),
+    )
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first")
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default='P')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming reads pending rows in exactly this order.
+            models.Index(fields=['-priority', 'run_at'], condition=models.Q(status='P'), name='job_due_idx'),
+            models.Index(fields=['locked_until'], condition=models.Q(status='R'), name='job_lease_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.get_status_display()})"
+
+
+class FuzzyDocument(models.Model):
+    """Normalized text of a product title or company name for fuzzy search.
+
+    Maintained by ``warehouse.fuzzy``; ``manage.py rebuild_fuzzy_index``
+    recreates it together with its trigrams.
+    """
+    KINDS = (
+        ('product', 'Product'),
+        ('seller', 'Seller'),
+    )
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.CharField(max_length=36)
+    text = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='fuzzy_document_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.object_id}"
+
+
+class FuzzyTrigram(models.Model):
+    """One posting: ``document`` contains ``gram``. ``kind`` is copied from the document."""
+    document = models.ForeignKey(FuzzyDocument, on_delete=models.CASCADE, related_name='trigrams')
+    kind = models.CharField(max_length=10)
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'gram', 'document'], name='fuzzy_posting_idx'),
+        ]
+
+
+class FuzzyGramStat(models.Model):
+    """Number of documents of ``kind`` containing ``gram``, used to probe the rarest grams first."""
+    kind = models.CharField(max_length=10)
+    gram = models.CharField(max_length=3)
+    df = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'gram'], name='fuzzy_gram_stat_unique'),
+        ]
+
+class SellerStats(models.Model):
+    """Running totals shown on seller pages, one row per seller.
+
+    Kept current with ``F()`` increments by ``warehouse.stats``; ``manage.py
+    reconcile_seller_stats`` recomputes them from the source tables. The
+    follower total lives on ``SellerProfile.follower_count``.
+    """
+    seller = models.OneToOneField(SellerProfile, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    active_products = models.IntegerField(default=0)
+    review_count = models.IntegerField(default=0)
+    rating_total = models.IntegerField(default=0)
+    sold_orders = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'seller stats'
+
+    def __str__(self):
+        return f"Stats for {self.seller_id}"
+
+    @property
+    def avg_rating(self):
+        return self.rating_total / self.review_count if self.review_count else None
+
+
+class SellerRanking(models.Model):
+    """Periodic snapshot of a seller's directory position and headline numbers.
+
+    Rebuilt as a whole by ``warehouse.rankings`` (``manage.py
+    refresh_seller_rankings`` on demand); ranks are dense from 1 so a
+    directory page is a range of ranks.
+    """
+    seller = models.OneToOneField(SellerProfile, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    rank = models.PositiveIntegerField(db_index=True)
+    score = models.FloatField(default=0)
+    followers = models.PositiveIntegerField(default=0)
+    active_products = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(blank=True, null=True)
+    review_count = models.PositiveIntegerField(default=0)
+    sales = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.seller_id}"
+
+
 class UserProfile(models.Model):
     ROLE_CHOICES = (
         ('buyer', 'Buyer'),
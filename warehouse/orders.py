@@ -0,0 +1,231 @@
+"""Checkout and seller-side status changes.
+
+``place_orders`` is all-or-nothing. Every line is checked against one
+Product fetch, then one transaction takes the stock with conditional
+``UPDATE`` statements (a line only matches while its product is active and
+has enough stock), inserts one order per seller and then all their lines
+with two ``bulk_create`` calls, and refreshes the affected listing cards.
+If any line loses a race for stock the whole transaction is rolled back and
+the caller gets every failing line at once. ``manage.py
+benchmark_checkout`` compares it with line-by-line checkout.
+
+Stock held in other shoppers' carts (``warehouse.holds``) is not available;
+the buyer's own holds on the ordered products are consumed. Stock moves by
+queryset ``update()``, which sends no signals, so taking and returning it
+drop the cached catalog facets themselves once the transaction commits.
+
+``transition`` moves any number of a seller's pending orders on with a
+conditional ``UPDATE``; only the rows it matched are reported and counted as
+moved. ``notify_buyers`` then queues a single email per buyer covering all
+of their orders.
+"""
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from warehouse import caching, counters, facets, holds, lifecycle, outbox, stats
+from warehouse.models import Order, OrderLine, Product, StockHold
+
+UNAVAILABLE = 'unavailable'
+INACTIVE = 'inactive'
+OUT_OF_STOCK = 'out_of_stock'
+INVALID_QUANTITY = 'invalid_quantity'
+
+COMPLETE = 'complete'
+CANCEL = 'cancel'
+# Seller actions: the status an order must be in, and the one it moves to.
+TRANSITIONS = {COMPLETE: ('P', 'W'), CANCEL: ('P', 'X')}
+MAX_TRANSITION_ORDERS = 500
+# Held by the rows a transition's UPDATE matched until the same transaction moves them on.
+CLAIMED = '~'
+
+MOVED = 'moved'
+NOT_FOUND = 'not_found'
+WRONG_STATUS = 'wrong_status'
+
+
+class CheckoutError(Exception):
+    """Raised with ``failures``: ``{product_id: (reason, available_quantity)}``. Nothing was written."""
+
+    def __init__(self, failures):
+        super().__init__(f'{len(failures)} line(s) cannot be ordered')
+        self.failures = failures
+
+
+def _merge(lines):
+    quantities = {}
+    for product_id, quantity in lines:
+        product_id = Product._meta.pk.to_python(product_id)
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _check(quantities, products):
+    failures = {}
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            failures[product_id] = (UNAVAILABLE, 0)
+        elif quantity < 1:
+            failures[product_id] = (INVALID_QUANTITY, max(product.stock_quantity - product.held, 0))
+        elif not product.is_active:
+            failures[product_id] = (INACTIVE, 0)
+        elif product.stock_quantity - product.held < quantity:
+            failures[product_id] = (OUT_OF_STOCK, max(product.stock_quantity - product.held, 0))
+    return failures
+
+
+def _products(quantities, hold_owner):
+    return (
+        Product.objects.only('pk', 'seller_id', 'price', 'is_active', 'stock_quantity')
+        .annotate(held=holds.held_expression(hold_owner))
+        .in_bulk(list(quantities))
+    )
+
+
+def _group_by_quantity(quantities):
+    by_quantity = {}
+    for product_id, quantity in quantities.items():
+        by_quantity.setdefault(quantity, []).append(product_id)
+    return by_quantity
+
+
+def _stock_changed():
+    caching.bump_version(facets.NAMESPACE)
+
+
+def _take_stock(quantities, hold_owner):
+    """Decrement stock for every line; returns the number of lines that matched.
+
+    Lines are grouped by quantity, so a cart costs one ``UPDATE`` per distinct
+    quantity (usually one or two) rather than one per line.
+    """
+    matched = 0
+    for quantity, product_ids in _group_by_quantity(quantities).items():
+        matched += Product.objects.alias(held=holds.held_expression(hold_owner)).filter(
+            pk__in=product_ids, is_active=True, stock_quantity__gte=F('held') + quantity,
+        ).update(
+            stock_quantity=F('stock_quantity') - quantity,
+            # SET expressions see the row as it was before the update.
+            in_stock=Case(When(stock_quantity__gt=quantity, then=Value(True)), default=Value(False)),
+        )
+    transaction.on_commit(_stock_changed)
+    return matched
+
+
+def place_orders(user, lines, address='', phone='', hold_owner=None):
+    """Order ``(product_id, quantity)`` lines, priced from the database, as one order per seller.
+
+    Duplicate products are merged. ``hold_owner`` is the cart's hold token.
+    Returns the created orders, or raises ``CheckoutError`` listing every
+    line that cannot be fulfilled.
+    """
+    quantities = _merge(lines)
+    if not quantities:
+        raise CheckoutError({})
+    products = _products(quantities, hold_owner)
+    failures = _check(quantities, products)
+    if failures:
+        raise CheckoutError(failures)
+    with transaction.atomic():
+        if _take_stock(quantities, hold_owner) != len(quantities):
+            # Someone else took or held the stock after our read: report from the current rows.
+            current = _products(quantities, hold_owner)
+            raise CheckoutError(_check(quantities, current) or {pk: (OUT_OF_STOCK, 0) for pk in quantities})
+        by_seller = {}
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            by_seller.setdefault(product.seller_id, []).append(
+                OrderLine(product_id=product_id, quantity=quantity, unit_price=product.price, total_price=product.price * quantity)
+            )
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user,
+                seller_id=seller_id,
+                total_price=sum(line.total_price for line in seller_lines),
+                address=address,
+                phone=phone,
+            )
+            for seller_id, seller_lines in by_seller.items()
+        ])
+        for order, seller_lines in zip(orders, by_seller.values()):
+            for line in seller_lines:
+                line.order = order
+        OrderLine.objects.bulk_create([line for seller_lines in by_seller.values() for line in seller_lines])
+        lifecycle.record(orders, '', 'P')
+        counters.orders_moved(orders, '', 'P')
+        if hold_owner:
+            StockHold.objects.filter(owner=hold_owner, product_id__in=list(quantities)).delete()
+        holds.refresh_cards(quantities)
+    for order in orders:
+        order._remember_loaded_values()
+    return orders
+
+
+def _return_stock(order_ids):
+    quantities = dict(
+        OrderLine.objects.filter(order_id__in=order_ids).order_by()
+        .values('product_id').annotate(n=Sum('quantity')).values_list('product_id', 'n')
+    )
+    for quantity, product_ids in _group_by_quantity(quantities).items():
+        Product.objects.filter(pk__in=product_ids).update(stock_quantity=F('stock_quantity') + quantity, in_stock=True)
+    holds.refresh_cards(quantities)
+    transaction.on_commit(_stock_changed)
+
+
+def transition(seller, order_ids, action):
+    """Apply ``action`` (``COMPLETE`` or ``CANCEL``) to those of ``order_ids`` that ``seller`` can move.
+
+    Returns ``(results, moved)``: ``{order_id: MOVED | NOT_FOUND | WRONG_STATUS}``
+    and the moved orders with their buyers and lines loaded. Cancelling puts
+    the lines' stock back.
+    """
+    from_status, to_status = TRANSITIONS[action]
+    order_ids = set(order_ids)
+    with transaction.atomic():
+        current = dict(
+            Order.objects.select_for_update().filter(pk__in=order_ids, seller=seller).values_list('pk', 'status')
+        )
+        movable = []
+        moved = []
+        # The read above can be stale (select_for_update() is a no-op on SQLite), so the conditional
+        # UPDATE decides: it stamps the rows it matched with CLAIMED, which never outlives this
+        # transaction, and only those rows are moved, reported and counted.
+        if Order.objects.filter(pk__in=list(current), status=from_status).update(status=CLAIMED):
+            claimed = Order.objects.filter(pk__in=list(current), status=CLAIMED)
+            movable = list(claimed.values_list('pk', flat=True))
+            claimed.update(status=to_status)
+            moved = list(Order.objects.filter(pk__in=movable).select_related('user').prefetch_related('lines__product'))
+            # update() sends no post_save, so the rollup, the event log and the order counters are written here.
+            stats.orders_moved(seller.pk, from_status, to_status, len(movable))
+            lifecycle.record(moved, from_status, to_status)
+            counters.orders_moved(moved, from_status, to_status)
+            if action == CANCEL:
+                _return_stock(movable)
+    results = {
+        pk: MOVED if pk in movable else WRONG_STATUS if pk in current else NOT_FOUND
+        for pk in order_ids
+    }
+    return results, moved
+
+
+def notify_buyers(orders, action):
+    """Queue one email per buyer about all of their ``orders`` that ``action`` just moved."""
+    by_buyer = {}
+    for order in orders:
+        by_buyer.setdefault(order.user, []).append(order)
+    messages = []
+    for buyer, buyer_orders in by_buyer.items():
+        if not buyer.email:
+            continue
+        listing = '\n'.join(f'- Order #{order.id}: {order.summary()} - ${order.total_price}' for order in buyer_orders)
+        if action == COMPLETE:
+            subject = 'Order Completion Confirmation Needed'
+            body = (
+                f'Dear {buyer.username},\n\nThe seller has marked these orders as completed:\n\n{listing}\n\n'
+                'Please log in to your account and confirm the order completion.\n\nThank you!'
+            )
+        else:
+            subject = 'Orders Cancelled'
+            body = f'Dear {buyer.username},\n\nThe seller has cancelled these orders:\n\n{listing}\n\nThank you!'
+        messages.append((subject, body, None, [buyer.email]))
+    return outbox.enqueue_many(messages)
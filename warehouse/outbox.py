@@ -0,0 +1,149 @@
+"""Durable email outbox.
+
+Views never talk to the mail server. ``enqueue`` writes an ``OutboxEmail``
+row in the caller's transaction, so an email exists exactly when the change
+it announces was committed, and the request returns without waiting on
+SMTP. ``manage.py drain_outbox`` (run from cron, or with ``--loop`` as a
+worker) sends due rows in batches over one connection per batch. A message
+that fails is retried after ``OUTBOX_RETRY_BASE_SECONDS`` doubling with
+each attempt, capped at ``OUTBOX_RETRY_MAX_SECONDS``, and marked failed
+after ``OUTBOX_MAX_ATTEMPTS``.
+
+Until that command is actually scheduled, leave ``OUTBOX_WORKER`` unset:
+each transaction that queues mail then drains one batch itself once it
+commits, which also picks up any retries that have come due. Set it to
+``True`` when cron or a ``--loop`` worker runs ``drain_outbox``.
+
+Claimed rows are leased for ``LEASE_SECONDS`` before sending, so several
+workers can drain concurrently and a worker that dies mid-batch only delays
+its messages. As in ``warehouse.jobs``, backends with ``SKIP LOCKED`` claim
+with it; elsewhere (SQLite) a conditional ``UPDATE`` stamps the rows that
+are still due with the worker's token and the worker sends only those.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from warehouse.models import OutboxEmail
+
+LEASE_SECONDS = 5 * 60
+
+
+def has_worker():
+    return getattr(settings, 'OUTBOX_WORKER', False)
+
+
+def max_attempts():
+    return getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+
+
+def backoff(attempts):
+    """Seconds to wait after the ``attempts``-th failure."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    return min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 60 * 60))
+
+
+def _row(subject, body, to, from_email=None, html_body=''):
+    to = [address for address in to if address]
+    if not to:
+        return None
+    return OutboxEmail(subject=subject[:255], body=body, html_body=html_body or '', from_email=from_email or '', to=to)
+
+
+def _drain_after_commit():
+    if not has_worker():
+        # Nothing else would send it. robust: a mail server error must not fail the committed request.
+        transaction.on_commit(drain, robust=True)
+
+
+def enqueue(subject, body, to, from_email=None, html_body=''):
+    """Queue one email (``send_mail`` arguments); nothing is queued without a recipient address."""
+    row = _row(subject, body, to, from_email, html_body)
+    if row is not None:
+        row.save()
+        _drain_after_commit()
+    return row
+
+
+def enqueue_many(messages):
+    """Queue ``(subject, body, from_email, to)`` tuples, as taken by ``send_mass_mail``."""
+    rows = [_row(subject, body, to, from_email) for subject, body, from_email, to in messages]
+    rows = OutboxEmail.objects.bulk_create([row for row in rows if row is not None])
+    if rows:
+        _drain_after_commit()
+    return len(rows)
+
+
+def _claim(batch_size, now):
+    """Lease up to ``batch_size`` due rows to this caller and return them."""
+    token = uuid.uuid4().hex
+    due = OutboxEmail.objects.filter(status='P', next_attempt_at__lte=now).order_by('next_attempt_at', 'pk')
+    lease = {'locked_by': token, 'next_attempt_at': now + timedelta(seconds=LEASE_SECONDS)}
+    if transaction.get_connection().features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pks = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+            OutboxEmail.objects.filter(pk__in=pks).update(**lease)
+    else:
+        pks = list(due.values_list('pk', flat=True)[:batch_size])
+        # Only rows that are still due match, so a row another worker leased meanwhile stays theirs.
+        due.filter(pk__in=pks).update(**lease)
+    return list(OutboxEmail.objects.filter(pk__in=pks, locked_by=token).order_by('pk'))
+
+
+def _message(row, connection):
+    message = EmailMultiAlternatives(
+        row.subject, row.body, row.from_email or None, row.to, connection=connection,
+    )
+    if row.html_body:
+        message.attach_alternative(row.html_body, 'text/html')
+    return message
+
+
+def _failed(row, error, now):
+    row.attempts += 1
+    row.last_error = f'{type(error).__name__}: {error}'[:2000]
+    if row.attempts >= max_attempts():
+        row.status = 'F'
+    else:
+        row.next_attempt_at = now + timedelta(seconds=backoff(row.attempts))
+    row.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def drain(batch_size=100, now=None):
+    """Send one batch of due emails over a single connection. Returns ``(sent, failed)``."""
+    now = now or timezone.now()
+    rows = _claim(batch_size, now)
+    if not rows:
+        return 0, 0
+    sent = []
+    failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for row in rows:
+            _failed(row, error, now)
+        return 0, len(rows)
+    try:
+        for row in rows:
+            try:
+                _message(row, connection).send()
+            except Exception as error:
+                _failed(row, error, now)
+                failed += 1
+            else:
+                sent.append(row.pk)
+    finally:
+        connection.close()
+        OutboxEmail.objects.filter(pk__in=sent).update(status='S', sent_at=timezone.now(), last_error='')
+    return len(sent), failed
+
+
+def purge_sent(days):
+    """Delete emails sent more than ``days`` ago. Returns the count."""
+    deleted, _ = OutboxEmail.objects.filter(status='S', sent_at__lt=timezone.now() - timedelta(days=days)).delete()
+    return deleted
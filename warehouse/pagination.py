@@ -0,0 +1,146 @@
+"""Keyset (cursor) pagination for listing pages.
+
+Pages are cut with a ``WHERE (created_at, id) < (last_created_at, last_id)``
+style filter instead of OFFSET, so page 500 costs the same as page 1. Cursors
+are signed, opaque tokens carrying the sort key of the boundary row.
+"""
+import datetime
+import decimal
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+
+CURSOR_SALT = 'warehouse.pagination'
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def page_size_from_request(request, default=None):
+    default = default or getattr(settings, 'PRODUCT_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, getattr(settings, 'MAX_PAGE_SIZE', MAX_PAGE_SIZE)))
+
+
+def _json_value(value):
+    # Keep full microsecond precision; DjangoJSONEncoder truncates to ms.
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, decimal.Decimal)):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, previous_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def url_for(self, request, cursor):
+        params = request.GET.copy()
+        params.pop('format', None)
+        params['cursor'] = cursor
+        return f'{request.path}?{params.urlencode()}'
+
+    def next_url(self, request):
+        return self.url_for(request, self.next_cursor) if self.has_next else None
+
+    def previous_url(self, request):
+        return self.url_for(request, self.previous_cursor) if self.has_previous else None
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` on a unique, non-null ``ordering``.
+
+    The last ordering field must be unique (normally the primary key) so that
+    rows sharing a timestamp are never skipped or repeated.
+    """
+
+    def __init__(self, queryset, ordering=('-created_at', '-id'), page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+        self.fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def encode(self, obj, direction):
+        values = [_json_value(getattr(obj, name)) for name, _ in self.fields]
+        return signing.dumps({'v': values, 'd': direction}, salt=CURSOR_SALT, compress=True)
+
+    def decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values, direction = data['v'], data['d']
+        except (signing.BadSignature, ValueError, KeyError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in ('n', 'p') or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        return [self._to_python(name, value) for (name, _), value in zip(self.fields, values)], direction
+
+    def _to_python(self, name, value):
+        opts = self.queryset.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) are plain JSON scalars.
+            return value
+        return field.to_python(value)
+
+    def _after(self, values, forward):
+        """Q matching rows strictly after ``values`` in the scan direction."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def page(self, cursor=None):
+        forward = True
+        qs = self.queryset
+        if cursor:
+            values, direction = self.decode(cursor)
+            forward = direction == 'n'
+            qs = qs.filter(self._after(values, forward))
+        if forward:
+            qs = qs.order_by(*self.ordering)
+        else:
+            qs = qs.order_by(*[name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering])
+        rows = list(qs[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return KeysetPage([])
+        if forward:
+            next_cursor = self.encode(rows[-1], 'n') if has_more else None
+            previous_cursor = self.encode(rows[0], 'p') if cursor else None
+        else:
+            next_cursor = self.encode(rows[-1], 'n')
+            previous_cursor = self.encode(rows[0], 'p') if has_more else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,144 @@
+"""Publish/subscribe fan-out for the server-sent counter events.
+
+``api/counters/stream/`` (see ``warehouse.api_counters``) keeps one
+subscription per open tab on two channels: the owner's counters (a buyer
+or a seller, published by ``warehouse.counters`` after commit whenever
+their order counts move) and the session's cart (published by
+``Cart.save()`` with the new size). Messages are small dicts; a stream
+that falls behind drops them rather than buffering, since the next one
+carries, or triggers a read of, the current values anyway.
+
+The backend is ``PUSH_BACKEND``. ``LocalPubSub``, the default, only
+reaches subscribers in the publishing process, which is right for one
+ASGI worker. With several workers or hosts use ``RedisPubSub``, which
+relays through Redis ``PUBLISH``/``SUBSCRIBE`` at ``PUSH_REDIS_URL``.
+"""
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 32
+
+
+def keepalive_seconds():
+    return getattr(settings, 'PUSH_KEEPALIVE_SECONDS', 15)
+
+
+def stream_seconds():
+    """How long one stream lives before the browser is told to reconnect."""
+    return getattr(settings, 'PUSH_STREAM_SECONDS', 5 * 60)
+
+
+def retry_ms():
+    return getattr(settings, 'PUSH_RETRY_MS', 5000)
+
+
+def owner_channel(kind, pk):
+    return f'counters:{kind}:{pk}'
+
+
+def cart_channel(session_key):
+    return f'cart:{session_key}'
+
+
+def _offer(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass
+
+
+class LocalPubSub:
+    """Fan-out to the subscribers of this process; ``publish`` may be called from any thread."""
+
+    def __init__(self):
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        for loop, queue in list(self._subscribers.get(channel, ())):
+            try:
+                loop.call_soon_threadsafe(_offer, queue, message)
+            except RuntimeError:
+                pass  # the subscriber's loop has closed; its finally block will unsubscribe
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            for channel in channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(entry)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+
+class RedisPubSub:
+    """Fan-out through Redis, for several ASGI workers; needs the ``redis`` package."""
+
+    def __init__(self, url=None):
+        self.url = url or getattr(settings, 'PUSH_REDIS_URL', 'redis://localhost:6379/0')
+        self._client = None
+
+    def publish(self, channel, message):
+        import redis
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, json.dumps(message))
+
+    @asynccontextmanager
+    async def subscribe(self, channels):
+        import redis.asyncio as aioredis
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(*channels)
+        queue = asyncio.Queue(QUEUE_SIZE)
+
+        async def relay():
+            async for item in pubsub.listen():
+                if item['type'] == 'message':
+                    _offer(queue, json.loads(item['data']))
+
+        task = asyncio.create_task(relay())
+        try:
+            yield queue
+        finally:
+            task.cancel()
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+@lru_cache(maxsize=None)
+def _backend(path):
+    return import_string(path)()
+
+
+def backend():
+    return _backend(getattr(settings, 'PUSH_BACKEND', 'warehouse.push.LocalPubSub'))
+
+
+def publish(channel, message=None):
+    """Send ``message`` to ``channel``'s subscribers. Never raises: pushing is best effort next to polling."""
+    try:
+        backend().publish(channel, message or {})
+    except Exception:
+        logger.warning('Could not publish to %s', channel, exc_info=True)
+
+
+def event(name, data, retry=None):
+    """One ``text/event-stream`` event."""
+    lines = [f'retry: {retry}'] if retry else []
+    lines += [f'event: {name}', f'data: {json.dumps(data)}']
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,163 @@
+"""Seller leaderboard behind the company directory.
+
+Followers, active products, rating and sales are read from the per-seller
+running totals (``SellerProfile.follower_count`` and ``SellerStats``), scored,
+and stored as a ``SellerRanking`` snapshot with dense ranks (a deleted seller's
+gap is closed at once). Directory pages are then rank ranges over that
+compact table. The first request to notice that
+it is older than ``SELLER_RANKING_REFRESH_SECONDS`` queues the
+``refresh_seller_rankings`` job (``warehouse.tasks``) and keeps serving the
+current snapshot when a worker is deployed (``JOBS_WORKER``); without one it
+rebuilds the snapshot itself. ``manage.py refresh_seller_rankings`` rebuilds
+it on demand or from cron. Sellers who sign up in between are appended at
+the bottom.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from warehouse import caching, hours, jobs
+from warehouse.models import Job, SellerProfile, SellerRanking
+
+NAMESPACE = 'seller_rankings'
+FRESH_KEY = 'seller_rankings:fresh'
+QUEUED_KEY = 'seller_rankings:queued'
+REFRESH_TASK = 'warehouse.tasks.refresh_seller_rankings'
+# Ratings are shrunk towards this mean until a seller has a few reviews.
+RATING_PRIOR = 3.5
+RATING_PRIOR_WEIGHT = 5
+
+
+def refresh_interval():
+    return getattr(settings, 'SELLER_RANKING_REFRESH_SECONDS', 900)
+
+
+def score(followers, active_products, avg_rating, review_count, sales):
+    rating = (RATING_PRIOR * RATING_PRIOR_WEIGHT + (avg_rating or 0) * review_count) / (RATING_PRIOR_WEIGHT + review_count)
+    return 2 * math.log1p(followers) + 2 * math.log1p(sales) + math.log1p(active_products) + rating
+
+
+def refresh(batch_size=1000):
+    """Rebuild the whole snapshot. Returns the number of ranked sellers."""
+    now = timezone.now()
+    rows = []
+    sellers = SellerProfile.objects.values_list(
+        'pk', 'company_name', 'follower_count',
+        'stats__active_products', 'stats__review_count', 'stats__rating_total', 'stats__sold_orders',
+    )
+    for pk, name, followers, products, reviews, rating_total, sold in sellers.iterator(chunk_size=batch_size):
+        reviews = max(reviews or 0, 0)
+        row = SellerRanking(
+            seller_id=pk,
+            followers=followers,
+            active_products=max(products or 0, 0),
+            avg_rating=rating_total / reviews if reviews else None,
+            review_count=reviews,
+            sales=max(sold or 0, 0),
+            refreshed_at=now,
+        )
+        row.score = score(row.followers, row.active_products, row.avg_rating, row.review_count, row.sales)
+        rows.append((-row.score, name, pk, row))
+    rows.sort(key=lambda item: item[:3])
+    for rank, (_, _, _, row) in enumerate(rows, start=1):
+        row.rank = rank
+    with transaction.atomic():
+        SellerRanking.objects.all().delete()
+        SellerRanking.objects.bulk_create([row for *_, row in rows], batch_size=batch_size)
+    caching.bump_version(NAMESPACE)
+    cache.set(FRESH_KEY, True, refresh_interval())
+    return len(rows)
+
+
+def ensure_fresh():
+    """Queue a rebuild if the snapshot is stale, or run it here when no worker is deployed."""
+    if cache.get_many([FRESH_KEY, QUEUED_KEY]):
+        return
+    oldest = SellerRanking.objects.aggregate(at=Min('refreshed_at'))['at']
+    age = (timezone.now() - oldest).total_seconds() if oldest else None
+    if age is not None and age < refresh_interval():
+        cache.set(FRESH_KEY, True, refresh_interval() - age)
+        return
+    if not cache.add(QUEUED_KEY, True, refresh_interval()):
+        return
+    if not jobs.has_worker():
+        # Nothing would run the job: rebuild here, one request per process at a time.
+        try:
+            refresh()
+        finally:
+            cache.delete(QUEUED_KEY)
+    # At most one queued rebuild, however many requests see the stale snapshot before it runs.
+    elif not Job.objects.filter(task=REFRESH_TASK, status__in=('P', 'R')).exists():
+        jobs.enqueue(REFRESH_TASK)
+
+
+def directory():
+    """Sellers in rank order with the columns the directory templates show."""
+    return (
+        SellerProfile.objects
+        .annotate(
+            products_count=F('ranking__active_products'),
+            followers_count=F('follower_count'),
+            avg_rating=F('ranking__avg_rating'),
+            is_open_now=hours.is_open_now(),
+        )
+        .order_by(F('ranking__rank').asc(nulls_last=True), 'pk')
+    )
+
+
+class RankedDirectory:
+    """Sequence over the whole directory that ``Paginator`` slices by rank range."""
+
+    def __init__(self, queryset=None):
+        self.queryset = directory() if queryset is None else queryset
+
+    def count(self):
+        key = caching.make_key(NAMESPACE, 'size')
+        size = cache.get(key)
+        if size is None:
+            size = SellerRanking.objects.count()
+            cache.set(key, size, refresh_interval())
+        return size
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('RankedDirectory only supports plain slices')
+        start, stop = index.start or 0, index.stop
+        queryset = self.queryset.filter(ranking__rank__gt=start)
+        if stop is not None:
+            queryset = queryset.filter(ranking__rank__lte=stop)
+        return list(queryset)
+
+
+def top(limit=10):
+    return list(directory().filter(ranking__rank__lte=limit))
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, created, **kwargs):
+    if not created:
+        return
+    last = SellerRanking.objects.aggregate(n=Max('rank'))['n'] or 0
+    SellerRanking.objects.create(
+        seller=instance, rank=last + 1, followers=instance.follower_count,
+        score=score(instance.follower_count, 0, None, 0, 0), refreshed_at=timezone.now(),
+    )
+    caching.bump_version(NAMESPACE)
+
+
+@receiver(pre_delete, sender=SellerProfile)
+def seller_deleted(sender, instance, **kwargs):
+    # Close the gap before the cascade removes the row, so every rank range stays a full page.
+    rank = SellerRanking.objects.filter(seller=instance).values_list('rank', flat=True).first()
+    if rank is not None:
+        SellerRanking.objects.filter(rank__gt=rank).update(rank=F('rank') - 1)
+        caching.bump_version(NAMESPACE)
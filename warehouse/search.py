@@ -0,0 +1,235 @@
+"""Full-text product search.
+
+SQLite databases use an FTS5 virtual table; PostgreSQL keeps a weighted
+tsvector per product in a side table with a GIN index. Both are kept in sync
+from the Product signals below and can be rebuilt in bulk with
+``manage.py rebuild_search_index``.
+"""
+import re
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse import fuzzy
+from warehouse.models import Product
+
+SQLITE_TABLE = 'warehouse_product_fts'
+POSTGRES_TABLE = 'warehouse_product_search'
+
+# Column weights: title above brand above description.
+TITLE_WEIGHT = 10.0
+BRAND_WEIGHT = 5.0
+DESCRIPTION_WEIGHT = 1.0
+
+MAX_TERMS = 8
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def result_limit():
+    return getattr(settings, 'SEARCH_RESULT_LIMIT', 500)
+
+
+def _terms(q):
+    return TERM_RE.findall((q or '').lower())[:MAX_TERMS]
+
+
+def _product_key(product_id):
+    # SQLite stores UUIDs as 32-char hex, PostgreSQL as native uuid.
+    if connection.vendor == 'sqlite':
+        return uuid.UUID(str(product_id)).hex
+    return str(product_id)
+
+
+def create_index(schema_editor):
+    """Create the search table for the current backend and fill it."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+            "product_id UNINDEXED, title, brand, description, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {SQLITE_TABLE} (product_id, title, brand, description) "
+            "SELECT id, title, brand, description FROM warehouse_product"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+            "product_id uuid PRIMARY KEY REFERENCES warehouse_product (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_gin "
+            f"ON {POSTGRES_TABLE} USING GIN (document)"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {POSTGRES_TABLE} (product_id, document) "
+            f"SELECT id, {_pg_document('title', 'brand', 'description')} FROM warehouse_product"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+def _pg_document(title, brand, description):
+    return (
+        f"setweight(to_tsvector('simple', coalesce({title}, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({brand}, '')), 'B') || "
+        f"setweight(to_tsvector('simple', coalesce({description}, '')), 'C')"
+    )
+
+
+def index_product(product):
+    """Insert or refresh a single product's search document."""
+    if not is_supported():
+        return
+    key = _product_key(product.id)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE product_id = %s", [key])
+            cursor.execute(
+                f"INSERT INTO {SQLITE_TABLE} (product_id, title, brand, description) "
+                "VALUES (%s, %s, %s, %s)",
+                [key, product.title, product.brand, product.description],
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {POSTGRES_TABLE} (product_id, document) "
+                f"VALUES (%s, {_pg_document('%s', '%s', '%s')}) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [key, product.title, product.brand, product.description],
+            )
+
+
+def remove_product(product_id):
+    if not is_supported():
+        return
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE product_id = %s", [_product_key(product_id)])
+
+
+def rebuild(batch_size=1000):
+    """Recreate every search document from the Product table. Returns the count."""
+    if not is_supported():
+        return 0
+    table = SQLITE_TABLE if connection.vendor == 'sqlite' else POSTGRES_TABLE
+    total = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        rows = Product.objects.order_by().values_list('id', 'title', 'brand', 'description')
+        batch = []
+        for product_id, title, brand, description in rows.iterator(chunk_size=batch_size):
+            batch.append([_product_key(product_id), title, brand, description])
+            if len(batch) >= batch_size:
+                _insert_batch(cursor, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            _insert_batch(cursor, batch)
+            total += len(batch)
+    return total
+
+
+def _insert_batch(cursor, batch):
+    if connection.vendor == 'sqlite':
+        cursor.executemany(
+            f"INSERT INTO {SQLITE_TABLE} (product_id, title, brand, description) "
+            "VALUES (%s, %s, %s, %s)",
+            batch,
+        )
+    else:
+        cursor.executemany(
+            f"INSERT INTO {POSTGRES_TABLE} (product_id, document) "
+            f"VALUES (%s, {_pg_document('%s', '%s', '%s')})",
+            batch,
+        )
+
+
+def ranked_ids(q, limit=None):
+    """Return ``[(product_id, score), ...]`` best match first.
+
+    Every term is matched as a prefix so partially typed words still hit.
+    """
+    terms = _terms(q)
+    if not terms or not is_supported():
+        return []
+    limit = limit or result_limit()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            match = ' '.join(f'"{term}"*' for term in terms)
+            cursor.execute(
+                f"SELECT product_id, -bm25({SQLITE_TABLE}, 0.0, %s, %s, %s) AS score "
+                f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                "ORDER BY score DESC LIMIT %s",
+                [TITLE_WEIGHT, BRAND_WEIGHT, DESCRIPTION_WEIGHT, match, limit],
+            )
+        else:
+            match = ' & '.join(f'{term}:*' for term in terms)
+            weights = '{0, %s, %s, %s}' % (
+                DESCRIPTION_WEIGHT / TITLE_WEIGHT, BRAND_WEIGHT / TITLE_WEIGHT, 1.0,
+            )
+            cursor.execute(
+                f"SELECT product_id, ts_rank(%s::float4[], document, to_tsquery('simple', %s)) AS score "
+                f"FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('simple', %s) "
+                "ORDER BY score DESC LIMIT %s",
+                [weights, match, match, limit],
+            )
+        return [(uuid.UUID(str(product_id)), float(score)) for product_id, score in cursor.fetchall()]
+
+
+def search_products(queryset, q):
+    """Filter a Product (or ProductCard) queryset to matches for ``q``, ordered by rank.
+
+    When the full-text index finds nothing (usually a misspelling or the
+    other script) the fuzzy trigram index is tried instead. Falls back to a
+    plain ``icontains`` filter on backends without a full-text index. The
+    result always has a ``search_rank`` (0.0 when nothing was ranked), so
+    callers can order by it whatever ``q`` was.
+    """
+    unranked = Value(0.0, output_field=FloatField())
+    if not _terms(q):
+        return queryset.annotate(search_rank=unranked)
+    if not is_supported():
+        matches = Product.objects.filter(Q(title__icontains=q) | Q(description__icontains=q))
+        return queryset.filter(pk__in=matches.values('pk')).annotate(search_rank=unranked)
+    hits = ranked_ids(q) or [
+        (uuid.UUID(product_id), score) for product_id, score in fuzzy.ranked_ids('product', q, result_limit())
+    ]
+    if not hits:
+        return queryset.none().annotate(search_rank=unranked)
+    rank = Case(
+        *[When(pk=product_id, then=Value(score)) for product_id, score in hits],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return (
+        queryset.filter(pk__in=[product_id for product_id, _ in hits])
+        .annotate(search_rank=rank)
+        .order_by('-search_rank', '-created_at')
+    )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    remove_product(instance.pk)
@@ -0,0 +1,121 @@
+"""Maintenance of the SellerStats rollup.
+
+Each receiver turns one Product, Review or Order change into a single
+``UPDATE ... SET col = col + delta`` on the affected seller's row, so
+concurrent writers never lose an increment and no page has to count
+anything. Changes made behind the ORM's back (queryset ``update()``, raw
+SQL) are repaired by ``manage.py reconcile_seller_stats``.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from warehouse.models import Order, Product, Review, SellerProfile, SellerStats
+
+SOLD_STATUSES = ('W', 'C')
+
+
+def _bump(seller, **deltas):
+    """Add ``deltas`` to the row of ``seller`` (an id or a subquery yielding one)."""
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas and seller is not None:
+        SellerStats.objects.filter(seller_id=seller).update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def orders_moved(seller_id, from_status, to_status, count):
+    """Account for ``count`` orders moved by a queryset ``update()``, which sends no signals."""
+    delta = int(to_status in SOLD_STATUSES) - int(from_status in SOLD_STATUSES)
+    _bump(seller_id, sold_orders=delta * count)
+
+
+def _seller_of(product_id):
+    return Subquery(Product.objects.filter(pk=product_id).values('seller_id')[:1])
+
+
+def for_seller(seller):
+    """The stats row of ``seller``, or an unsaved zero row if it has none yet."""
+    try:
+        return seller.stats
+    except SellerStats.DoesNotExist:
+        return SellerStats(seller=seller)
+
+
+def _totals(queryset, seller_path, **aggregates):
+    return (
+        queryset.filter(**{seller_path: OuterRef('seller_id')})
+        .order_by()
+        .values(seller_path)
+        .annotate(**aggregates)
+    )
+
+
+def reconcile():
+    """Recompute every row from the source tables. Returns the number of rows."""
+    with transaction.atomic():
+        SellerStats.objects.bulk_create(
+            [SellerStats(seller_id=pk) for pk in SellerProfile.objects.filter(stats__isnull=True).values_list('pk', flat=True)],
+            batch_size=1000,
+        )
+        products = _totals(Product.objects.filter(is_active=True), 'seller_id', n=Count('pk'))
+        reviews = _totals(Review.objects.all(), 'product__seller_id', n=Count('pk'), total=Sum('rating'))
+        sold = _totals(Order.objects.filter(status__in=SOLD_STATUSES), 'seller_id', n=Count('pk'))
+        return SellerStats.objects.update(
+            active_products=Coalesce(Subquery(products.values('n')), Value(0)),
+            review_count=Coalesce(Subquery(reviews.values('n')), Value(0)),
+            rating_total=Coalesce(Subquery(reviews.values('total')), Value(0)),
+            sold_orders=Coalesce(Subquery(sold.values('n')), Value(0)),
+        )
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, created, **kwargs):
+    if created:
+        SellerStats.objects.get_or_create(seller=instance)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, **kwargs):
+    if created:
+        _bump(instance.seller_id, active_products=int(instance.is_active))
+    elif instance.has_changed('is_active', 'seller_id'):
+        _bump(instance.loaded_value('seller_id'), active_products=-int(bool(instance.loaded_value('is_active'))))
+        _bump(instance.seller_id, active_products=int(instance.is_active))
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    _bump(instance.seller_id, active_products=-int(instance.is_active))
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        _bump(_seller_of(instance.product_id), review_count=1, rating_total=instance.rating)
+    elif instance.has_changed('product_id'):
+        _bump(_seller_of(instance.loaded_value('product_id')), review_count=-1, rating_total=-(instance.loaded_value('rating') or 0))
+        _bump(_seller_of(instance.product_id), review_count=1, rating_total=instance.rating)
+    elif instance.has_changed('rating'):
+        _bump(_seller_of(instance.product_id), rating_total=instance.rating - instance.loaded_value('rating'))
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    # Runs before the product row goes when a product delete cascades here.
+    _bump(_seller_of(instance.product_id), review_count=-1, rating_total=-instance.rating)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if created:
+        _bump(instance.seller_id, sold_orders=int(instance.status in SOLD_STATUSES))
+    elif instance.has_changed('status', 'seller_id'):
+        was_sold = instance.loaded_value('status') in SOLD_STATUSES
+        _bump(instance.loaded_value('seller_id'), sold_orders=-int(was_sold))
+        _bump(instance.seller_id, sold_orders=int(instance.status in SOLD_STATUSES))
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    _bump(instance.seller_id, sold_orders=-int(instance.status in SOLD_STATUSES))
@@ -0,0 +1,242 @@
+"""In-memory typeahead index for the search box.
+
+Every word of every product title, brand, category name and company name is
+kept in one sorted list of ``(word, entry_key)`` pairs, so a prefix lookup is
+a bisect plus a short forward scan and never touches the database. The index
+is built lazily on first use, patched in place by the signals below and
+rebuilt every ``SUGGEST_REBUILD_SECONDS`` so processes also pick up changes
+saved by other workers.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from warehouse.models import Category, OrderLine, Product, ProductCard, SellerProfile
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+Entry = namedtuple('Entry', 'kind id label words popularity')
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+def words(text):
+    return tuple(dict.fromkeys(WORD_RE.findall(normalize(text))))
+
+
+def _scan_limit():
+    return getattr(settings, 'SUGGEST_SCAN_LIMIT', 5000)
+
+
+def _rebuild_seconds():
+    return getattr(settings, 'SUGGEST_REBUILD_SECONDS', 600)
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._words = []
+        self._brand_products = {}
+        self._built_at = None
+
+    # -- building -------------------------------------------------------
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries, self._words, self._brand_products = {}, [], {}
+            self._built_at = None
+
+    def build(self):
+        """Load every suggestible row; a handful of queries in total."""
+        entries = {}
+        brand_products = {}
+        orders = dict(
+            OrderLine.objects.order_by().values('product_id').annotate(n=Count('id')).values_list('product_id', 'n')
+        )
+        cards = ProductCard.objects.filter(is_active=True).values_list('product_id', 'title', 'brand', 'review_count')
+        for product_id, title, brand, review_count in cards.iterator():
+            popularity = orders.get(product_id, 0) + review_count
+            entries[('product', product_id)] = Entry('product', product_id, title, words(title), popularity)
+            if brand:
+                brand_products.setdefault(normalize(brand), {})[product_id] = brand
+        for pk, name, slug, product_count in Category.objects.annotate(n=Count('products')).values_list(
+            'pk', 'name', 'slug', 'n'
+        ):
+            entries[('category', pk)] = Entry('category', slug, name, words(name), product_count)
+        for pk, name, follower_count in SellerProfile.objects.values_list('pk', 'company_name', 'follower_count'):
+            entries[('seller', pk)] = Entry('seller', pk, name, words(name), follower_count)
+        for key, products in brand_products.items():
+            entries[('brand', key)] = self._brand_entry(key, products)
+
+        sorted_words = sorted((word, key) for key, entry in entries.items() for word in entry.words)
+        with self._lock:
+            self._entries, self._words, self._brand_products = entries, sorted_words, brand_products
+            self._built_at = time.monotonic()
+
+    def ensure_built(self):
+        built_at = self._built_at
+        if built_at is not None and time.monotonic() - built_at < _rebuild_seconds():
+            return
+        with self._lock:
+            if self._built_at is built_at:
+                self.build()
+
+    # -- incremental updates ---------------------------------------------
+
+    def _brand_entry(self, key, products):
+        label = next(iter(products.values()))
+        return Entry('brand', label, label, words(label), len(products))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        for word in entry.words:
+            i = bisect_left(self._words, (word, key))
+            if i < len(self._words) and self._words[i] == (word, key):
+                del self._words[i]
+        return entry
+
+    def _add(self, key, entry):
+        self._entries[key] = entry
+        for word in entry.words:
+            insort(self._words, (word, key))
+
+    def put(self, key, kind, id, label, popularity=None):
+        """Insert or relabel an entry, keeping its popularity unless given."""
+        if not self.is_built:
+            return
+        with self._lock:
+            old = self._remove(key)
+            if popularity is None:
+                popularity = old.popularity if old else 0
+            self._add(key, Entry(kind, id, label, words(label), popularity))
+
+    def discard(self, key):
+        if not self.is_built:
+            return
+        with self._lock:
+            self._remove(key)
+
+    def set_product_brand(self, product_id, brand):
+        """Move ``product_id`` under ``brand`` (or under no brand if empty)."""
+        if not self.is_built:
+            return
+        with self._lock:
+            new_key = normalize(brand) if brand else None
+            for key, products in list(self._brand_products.items()):
+                if key != new_key and products.pop(product_id, None) is not None:
+                    self._remove(('brand', key))
+                    if products:
+                        self._add(('brand', key), self._brand_entry(key, products))
+                    else:
+                        del self._brand_products[key]
+            if new_key and product_id not in self._brand_products.get(new_key, {}):
+                products = self._brand_products.setdefault(new_key, {})
+                products[product_id] = brand
+                self._remove(('brand', new_key))
+                self._add(('brand', new_key), self._brand_entry(new_key, products))
+
+    # -- lookup ------------------------------------------------------------
+
+    def lookup(self, q, limit=DEFAULT_LIMIT):
+        """Top ``limit`` entries whose words start with every term of ``q``.
+
+        The last term is looked up by prefix in the sorted word list; earlier
+        terms only filter the candidates that lookup produced.
+        """
+        terms = words(q)
+        if not terms:
+            return []
+        self.ensure_built()
+        *leading, last = terms
+        with self._lock:
+            candidates = {}
+            i = bisect_left(self._words, (last,))
+            end = min(len(self._words), i + _scan_limit())
+            while i < end:
+                word, key = self._words[i]
+                if not word.startswith(last):
+                    break
+                entry = self._entries[key]
+                if all(any(w.startswith(term) for w in entry.words) for term in leading):
+                    candidates[key] = entry
+                i += 1
+        return heapq.nlargest(limit, candidates.values(), key=lambda e: (e.popularity, -len(e.label)))
+
+
+index = SuggestIndex()
+
+
+def entry_url(entry):
+    if entry.kind == 'product':
+        return reverse('product_detail', args=[entry.id])
+    if entry.kind == 'category':
+        return reverse('category_detail', args=[entry.id])
+    if entry.kind == 'seller':
+        return reverse('seller_profile', args=[entry.id])
+    return f"{reverse('product_list')}?{urlencode({'brand': entry.id})}"
+
+
+def suggest(q, limit=DEFAULT_LIMIT):
+    return [
+        {'type': entry.kind, 'label': entry.label, 'url': entry_url(entry)}
+        for entry in index.lookup(q, limit)
+    ]
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, **kwargs):
+    key = ('product', instance.pk)
+    if instance.is_active:
+        index.put(key, 'product', instance.pk, instance.title)
+        index.set_product_brand(instance.pk, instance.brand)
+    else:
+        index.discard(key)
+        index.set_product_brand(instance.pk, None)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    index.discard(('product', instance.pk))
+    index.set_product_brand(instance.pk, None)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, **kwargs):
+    index.put(('category', instance.pk), 'category', instance.slug, instance.name)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    index.discard(('category', instance.pk))
+
+
+@receiver(post_save, sender=SellerProfile)
+def seller_saved(sender, instance, **kwargs):
+    index.put(('seller', instance.pk), 'seller', instance.pk, instance.company_name)
+
+
+@receiver(post_delete, sender=SellerProfile)
+def seller_deleted(sender, instance, **kwargs):
+    index.discard(('seller', instance.pk))
@@ -0,0 +1,30 @@
+"""Background tasks run by ``manage.py runworker``; see ``warehouse.jobs``."""
+from django.contrib.auth import get_user_model
+
+from warehouse import rankings
+from warehouse.jobs import task
+from warehouse.models import UserProfile
+
+
+@task
+def backfill_profiles(batch_size=1000):
+    """Create the ``UserProfile`` of every user that has none. Returns the count."""
+    User = get_user_model()
+    created = 0
+    last_pk = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(pk__gt=last_pk, profile__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return created
+        UserProfile.objects.bulk_create([UserProfile(user_id=pk) for pk in user_ids], ignore_conflicts=True)
+        created += len(user_ids)
+        last_pk = user_ids[-1]
+
+
+@task
+def refresh_seller_rankings(batch_size=1000):
+    """Rebuild the seller leaderboard; queued by ``rankings.ensure_fresh`` when it goes stale."""
+    return rankings.refresh(batch_size=batch_size)
@@ -1,4 +1,8 @@
+import uuid
+from io import StringIO
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
@@ -78,14 +82,15 @@ class NotificationAndButtonTests(TestCase):
         self.assertTrue(any('Order placed successfully' in str(m) for m in messages))
         # Check order exists
         from warehouse.models import Order
-        self.assertTrue(Order.objects.filter(user=self.user, product=self.product).exists())
+        self.assertTrue(Order.objects.filter(user=self.user, lines__product=self.product).exists())
 
     def test_confirm_order_completion_notification(self):
         from warehouse.models import SellerProfile, Order
         seller_profile = SellerProfile.objects.create(user=self.user2, company_name='TestCo', description='desc', contact_number='123', address='addr')
         self.product.seller = seller_profile
         self.product.save()
-        order = Order.objects.create(user=self.user, product=self.product, quantity=1, total_price=10, status='W')
+        order = Order.objects.create(user=self.user, seller=seller_profile, total_price=10, status='W')
+        order.lines.create(product=self.product, quantity=1, unit_price=10, total_price=10)
         self.client.login(username='testuser', password='testpass')
         url = reverse('confirm_order_complete', args=[order.id])
         response = self.client.post(url, follow=True)
@@ -95,3 +100,1528 @@ class NotificationAndButtonTests(TestCase):
         # Check order status updated
         order.refresh_from_db()
         self.assertEqual(order.status, 'C')
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        user = User.objects.create_user(username='searchseller', password='pass')
+        self.seller = SellerProfile.objects.create(user=user, company_name='Addis Goods', description='desc', contact_number='123', address='addr')
+        self.in_title = Product.objects.create(title='Sidamo Coffee Beans', price=10, stock_quantity=5, seller=self.seller)
+        self.in_brand = Product.objects.create(title='Clay Jebena', brand='Coffee House', price=20, stock_quantity=5, seller=self.seller)
+        self.in_description = Product.objects.create(title='Roasting Pan', description='Great for coffee ceremonies', price=30, stock_quantity=5, seller=self.seller)
+        Product.objects.create(title='Cotton Scarf', price=5, stock_quantity=5, seller=self.seller)
+
+    def test_ranks_title_above_brand_above_description(self):
+        from warehouse import search
+        ids = [product_id for product_id, _ in search.ranked_ids('coffee')]
+        self.assertEqual(ids, [self.in_title.id, self.in_brand.id, self.in_description.id])
+
+    def test_prefix_match_and_product_list(self):
+        response = self.client.get(reverse('product_list'), {'q': 'sida'})
+        self.assertEqual([p.id for p in response.context['products']], [self.in_title.id])
+
+    def test_zero_hit_query_lists_nothing(self):
+        response = self.client.get(reverse('product_list'), {'q': 'xyzzyqq'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['products']), [])
+
+    def test_punctuation_only_query_lists_everything(self):
+        response = self.client.get(reverse('product_list'), {'q': '!!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['products']), 4)
+
+    def test_index_follows_save_and_delete(self):
+        from warehouse import search
+        self.in_title.title = 'Harar Beans'
+        self.in_title.save()
+        self.assertNotIn(self.in_title.id, [pid for pid, _ in search.ranked_ids('sidamo')])
+        self.assertIn(self.in_title.id, [pid for pid, _ in search.ranked_ids('harar')])
+        self.in_title.delete()
+        self.assertEqual(search.ranked_ids('harar'), [])
+
+    def test_rebuild_command(self):
+        from django.core.management import call_command
+        from warehouse import search
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.SQLITE_TABLE}')
+        self.assertEqual(search.ranked_ids('coffee'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search.ranked_ids('coffee')), 3)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        user = User.objects.create_user(username='pageseller', password='pass')
+        self.seller = SellerProfile.objects.create(user=user, company_name='Paged', description='desc', contact_number='123', address='addr')
+        self.category = Category.objects.create(name='Paged Cat', slug='paged-cat')
+        self.products = [
+            Product.objects.create(title=f'Item {i}', price=i + 1, stock_quantity=3, seller=self.seller, category=self.category)
+            for i in range(7)
+        ]
+
+    def test_walks_every_product_once_in_created_order(self):
+        from urllib.parse import parse_qs, urlsplit
+        seen = []
+        params = {'page_size': 3}
+        while True:
+            response = self.client.get(reverse('product_list'), params)
+            seen.extend(p.id for p in response.context['products'])
+            next_url = response.context['next_page_url']
+            if not next_url:
+                break
+            params = {'page_size': 3, 'cursor': parse_qs(urlsplit(next_url).query)['cursor'][0]}
+        expected = [p.id for p in sorted(self.products, key=lambda p: (p.created_at, p.id), reverse=True)]
+        self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_prior_page(self):
+        from warehouse.pagination import KeysetPaginator
+        paginator = KeysetPaginator(Product.objects.all(), page_size=3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(paginator.page(second.previous_cursor).items, first.items)
+
+    def test_json_and_partial_formats(self):
+        url = reverse('category_detail', args=[self.category.slug])
+        data = self.client.get(url, {'format': 'json', 'page_size': 5}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIsNotNone(data['next'])
+        response = self.client.get(url, {'format': 'partial', 'page_size': 5})
+        self.assertIn('X-Next-Page', response)
+        self.assertNotContains(response, '<html')
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('seller_profile', args=[self.seller.id]), {'cursor': 'garbage', 'page_size': 2})
+        self.assertEqual(len(response.context['products']), 2)
+
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        self.user = User.objects.create_user(username='cardseller', password='pass')
+        self.seller = SellerProfile.objects.create(user=self.user, company_name='Card Co', description='desc', contact_number='123', address='addr')
+        self.product = Product.objects.create(title='Mesob Basket', description='Woven', price=40, stock_quantity=2, seller=self.seller)
+
+    def test_card_follows_product_reviews_and_seller(self):
+        from warehouse.models import ProductCard, Review
+        Review.objects.create(product=self.product, user=self.user, rating=4)
+        other = User.objects.create_user(username='reviewer', password='pass')
+        review = Review.objects.create(product=self.product, user=other, rating=2)
+        card = ProductCard.objects.get(pk=self.product.pk)
+        self.assertEqual((card.review_count, card.avg_rating), (2, 3.0))
+        review.delete()
+        self.product.price = 45
+        self.product.save()
+        self.seller.company_name = 'Card Company'
+        self.seller.save()
+        card.refresh_from_db()
+        self.assertEqual((card.review_count, card.avg_rating), (1, 4.0))
+        self.assertEqual((card.price, card.seller_name), (45, 'Card Company'))
+
+    def test_listing_query_count_does_not_grow_with_cards(self):
+        for i in range(10):
+            Product.objects.create(title=f'Extra {i}', price=5, stock_quantity=1, seller=self.seller)
+        url = reverse('seller_profile', args=[self.seller.id])
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url, {'page_size': 2})
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url, {'page_size': 11})
+        self.assertEqual(len(small), len(large))
+
+    def test_added_product_card_shows_its_image_right_away(self):
+        import shutil
+        import tempfile
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.test import override_settings
+        from warehouse.models import ProductCard
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.user.profile.role = 'seller'
+        self.user.profile.save()
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='Baskets', slug='baskets')
+        with override_settings(MEDIA_ROOT=media_root):
+            self.client.post(reverse('add_product'), {
+                'title': 'Agelgil', 'price': '30', 'description': 'Leather lunch basket', 'category': category.pk,
+                'stock_quantity': 3, 'pricing_type': 'fixed',
+                'images': [SimpleUploadedFile('agelgil.png', b'png'), SimpleUploadedFile('side.png', b'png')],
+            })
+        card = ProductCard.objects.get(title='Agelgil')
+        self.assertTrue(card.image.startswith('products/agelgil'))
+
+    def test_rebuild_command_repairs_drift(self):
+        from django.core.management import call_command
+        from warehouse.models import ProductCard
+        ProductCard.objects.filter(pk=self.product.pk).update(title='stale', review_count=9)
+        call_command('rebuild_product_cards', stdout=StringIO())
+        card = ProductCard.objects.get(pk=self.product.pk)
+        self.assertEqual((card.title, card.review_count), ('Mesob Basket', 0))
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from warehouse.models import SellerProfile
+        cache.clear()
+        user = User.objects.create_user(username='facetseller', password='pass')
+        seller = SellerProfile.objects.create(user=user, company_name='Facet Co', description='desc', contact_number='123', address='addr')
+        self.food = Category.objects.create(name='Food', slug='food')
+        self.tools = Category.objects.create(name='Tools', slug='tools')
+        Product.objects.create(title='Injera', price=50, stock_quantity=3, free_delivery=True, category=self.food, seller=seller)
+        Product.objects.create(title='Berbere', price=150, stock_quantity=3, brand='Mama', category=self.food, seller=seller)
+        Product.objects.create(title='Hammer', price=700, stock_quantity=0, brand='Mama', category=self.tools, seller=seller, pricing_type='custom')
+
+    def test_counts_every_facet_in_one_query(self):
+        from warehouse import facets
+        from warehouse.models import ProductCard
+        with self.assertNumQueries(2):  # grouped aggregate + category names
+            result = facets.compute(ProductCard.objects.all())
+        self.assertEqual(result['total'], 3)
+        self.assertEqual({o['label']: o['count'] for o in result['category']}, {'Food': 2, 'Tools': 1})
+        self.assertEqual({o['label']: o['count'] for o in result['price']}, {'0–100': 1, '100–500': 1, '500–1,000': 1})
+        self.assertEqual(result['brand'], [{'value': 'Mama', 'label': 'Mama', 'count': 2}])
+        self.assertEqual((result['in_stock'], result['free_delivery']), (2, 1))
+
+    def test_product_list_filters_and_cache_invalidation(self):
+        response = self.client.get(reverse('product_list'), {'category': self.food.pk, 'min_price': 100})
+        self.assertEqual([p.title for p in response.context['products']], ['Berbere'])
+        self.assertEqual(response.context['facets']['total'], 1)
+        Product.objects.create(title='Shiro', price=120, stock_quantity=1, category=self.food, seller=Product.objects.first().seller)
+        response = self.client.get(reverse('product_list'), {'category': self.food.pk, 'min_price': 100})
+        self.assertEqual(response.context['facets']['total'], 2)
+
+    def test_version_is_shared_by_every_worker(self):
+        from django.core.cache import cache
+        from warehouse import caching, facets
+        version = caching.get_version(facets.NAMESPACE)
+        cache.clear()  # what another worker's own cache looks like
+        self.assertEqual(caching.get_version(facets.NAMESPACE), version)
+        caching.bump_version(facets.NAMESPACE)
+        cache.clear()
+        self.assertEqual(caching.get_version(facets.NAMESPACE), version + 1)
+
+    def test_checkout_and_cancel_invalidate_the_stock_facet(self):
+        from warehouse import orders
+        injera = Product.objects.get(title='Injera')
+        self.assertEqual(self.client.get(reverse('product_list')).context['facets']['in_stock']['count'], 2)
+        buyer = User.objects.create_user(username='facetbuyer', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            order = orders.place_orders(buyer, [(injera.pk, 3)])[0]
+        self.assertEqual(self.client.get(reverse('product_list')).context['facets']['in_stock']['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            orders.transition(injera.seller, [order.pk], orders.CANCEL)
+        self.assertEqual(self.client.get(reverse('product_list')).context['facets']['in_stock']['count'], 2)
+
+
+class SuggestTests(TestCase):
+    def setUp(self):
+        from warehouse import suggest
+        from warehouse.models import SellerProfile
+        self.index = suggest.index
+        self.index.clear()
+        self.addCleanup(self.index.clear)
+        user = User.objects.create_user(username='suggestseller', password='pass')
+        self.seller = SellerProfile.objects.create(user=user, company_name='Abyssinia Coffee', description='desc', contact_number='123', address='addr')
+        self.category = Category.objects.create(name='Coffee Beans', slug='coffee-beans')
+        self.popular = Product.objects.create(title='Coffee Grinder', price=10, brand='Abol', category=self.category, seller=self.seller)
+        self.quiet = Product.objects.create(title='Coffee Cup', price=5, category=self.category, seller=self.seller)
+        buyer = User.objects.create_user(username='suggestbuyer', password='pass')
+        from warehouse.models import Order
+        order = Order.objects.create(user=buyer, seller=self.seller, total_price=10, status='P')
+        order.lines.create(product=self.popular, quantity=1, unit_price=10, total_price=10)
+
+    def test_prefix_lookup_ranks_by_popularity_without_queries(self):
+        self.index.build()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('suggest'), {'q': 'cof'})
+        labels = [r['label'] for r in response.json()['results']]
+        self.assertEqual(labels[0], 'Coffee Beans')  # two products in the category
+        self.assertLess(labels.index('Coffee Grinder'), labels.index('Coffee Cup'))
+        self.assertIn('Abyssinia Coffee', labels)
+        self.assertEqual([r['label'] for r in self.client.get(reverse('suggest'), {'q': 'coffee gri'}).json()['results']], ['Coffee Grinder'])
+
+    def test_index_updates_incrementally_on_save_and_delete(self):
+        self.index.build()
+        self.quiet.title = 'Jebena Pot'
+        self.quiet.save()
+        self.seller.company_name = 'Jimma Traders'
+        self.seller.save()
+        with self.assertNumQueries(0):
+            results = self.index.lookup('jeb') + self.index.lookup('jim') + self.index.lookup('abol')
+        self.assertEqual([e.label for e in results], ['Jebena Pot', 'Jimma Traders', 'Abol'])
+        self.assertEqual(self.index.lookup('cup'), [])
+        self.popular.delete()
+        self.assertEqual(self.index.lookup('abol'), [])
+        self.assertEqual(self.index.lookup('grinder'), [])
+
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        user = User.objects.create_user(username='fuzzyseller', password='pass')
+        self.seller = SellerProfile.objects.create(user=user, company_name='Abebe Coffee Roasters', description='desc', contact_number='123', address='addr', is_verified=True)
+        self.injera = Product.objects.create(title='እንጀራ', price=10, seller=self.seller)
+        self.grinder = Product.objects.create(title='Electric Coffee Grinder', price=10, seller=self.seller)
+
+    def test_normalization_folds_scripts_and_spelling(self):
+        from warehouse.fuzzy import normalize
+        self.assertEqual(normalize('እንጀራ'), normalize('Injera'))
+        self.assertEqual(normalize('ጤፍ'), normalize('Teff'))
+        self.assertEqual(normalize('አዲስ አበባ'), normalize('Addis  Abeba!'))
+        self.assertEqual(normalize('Qoqa Café'), 'koka cafe')
+
+    def test_ranked_ids_tolerates_typos_and_script(self):
+        from warehouse import fuzzy
+        self.assertEqual(fuzzy.ranked_ids('product', 'injera')[0][0], str(self.injera.pk))
+        self.assertEqual(fuzzy.ranked_ids('product', 'cofee grindr')[0][0], str(self.grinder.pk))
+        self.assertEqual(fuzzy.ranked_ids('product', 'zzzz'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        from warehouse import fuzzy
+        from warehouse.models import FuzzyGramStat
+        self.grinder.title = 'Jebena'
+        self.grinder.save()
+        self.assertEqual(fuzzy.ranked_ids('product', 'grinder'), [])
+        self.assertEqual(fuzzy.ranked_ids('product', 'jebna')[0][0], str(self.grinder.pk))
+        self.grinder.delete()
+        self.assertEqual(fuzzy.ranked_ids('product', 'jebena'), [])
+        self.assertFalse(FuzzyGramStat.objects.filter(kind='product', gram=' je', df__gt=0).exists())
+        fuzzy.rebuild()
+        self.assertEqual(fuzzy.ranked_ids('product', 'injra')[0][0], str(self.injera.pk))
+
+    def test_product_list_and_seller_directories_fall_back_to_fuzzy_matches(self):
+        response = self.client.get(reverse('product_list'), {'q': 'injra'})
+        self.assertEqual([p.id for p in response.context['products']], [self.injera.pk])
+        from unittest import mock
+        from django.test import RequestFactory
+        from ETHSGEBEYA import views as site_views
+        request = RequestFactory().get('/', {'search': 'abebe cofee'})
+        with mock.patch.object(site_views, 'render') as render:
+            site_views.verified_sellers(request)
+        self.assertEqual(list(render.call_args[0][2]['sellers']), [self.seller])
+
+
+class HotPathIndexTests(TestCase):
+    """Each polled or listing query shape must be answered from its index."""
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Tiny test tables make a sequential scan cheapest; ask for the index plan instead.
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = self.plan(queryset)
+        names = '|'.join(index_names)
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX ({names})\b')
+        else:
+            self.assertRegex(plan, rf'Index (Only )?Scan using ({names})\b')
+
+    def test_hot_queries_use_indexes(self):
+        from warehouse.models import CustomerInteraction, Order, ProductCard, Review
+        some_user = 1
+        some_seller = 1
+        cases = [
+            (Product.objects.filter(is_active=True, in_stock=True).order_by('-created_at')[:24], 'product_listing_idx'),
+            (ProductCard.objects.filter(is_active=True, in_stock=True).order_by('-created_at', '-pk')[:24], 'card_listing_idx'),
+            (ProductCard.objects.filter(is_active=True, category_id=1).order_by('-created_at', '-pk')[:24], 'card_category_idx'),
+            (ProductCard.objects.filter(is_active=True, seller_id=some_seller).order_by('-created_at', '-pk')[:24], 'card_seller_idx'),
+            (Order.objects.filter(seller_id=some_seller, status='P').values('pk'), ('order_seller_pending_idx', 'order_seller_status_idx')),
+            (Order.objects.filter(seller_id=some_seller, status__in=['C', 'W']).values('pk'), 'order_seller_status_idx'),
+            (Order.objects.filter(seller_id=some_seller).order_by('-created_at')[:5], 'order_seller_recent_idx'),
+            (Order.objects.filter(user_id=some_user, status='W').values('pk'), 'order_user_status_idx'),
+            (Order.objects.filter(user_id=some_user).order_by('-created_at')[:5], 'order_user_recent_idx'),
+            (
+                CustomerInteraction.objects.filter(product__seller_id=some_seller, timestamp__gte='2024-01-01')
+                .values('interaction_type'),
+                'interaction_product_time_idx',
+            ),
+            (Review.objects.filter(product_id=uuid.uuid4()).order_by('-created_at')[:5], 'review_product_recent_idx'),
+        ]
+        for queryset, index_names in cases:
+            if isinstance(index_names, str):
+                index_names = (index_names,)
+            with self.subTest(index=index_names[0]):
+                self.assertUsesIndex(queryset, *index_names)
+
+
+class GeoSearchTests(TestCase):
+    ORIGIN = (9.03, 38.74)
+
+    def make_seller(self, name, lat, lng, **kwargs):
+        from warehouse.models import SellerProfile
+        user = User.objects.create(username=name)
+        defaults = {'opening_time': '00:00', 'closing_time': '23:59'}
+        defaults.update(kwargs)
+        return SellerProfile.objects.create(
+            user=user, company_name=name, description='d', contact_number='1', address='a',
+            latitude=lat, longitude=lng, **defaults,
+        )
+
+    def test_geohash_is_maintained_on_save(self):
+        from warehouse import geo
+        self.assertEqual(geo.encode(57.64911, 10.40744), 'u4pruydqq')
+        seller = self.make_seller('mover', *self.ORIGIN)
+        self.assertEqual(seller.geohash, geo.encode(*self.ORIGIN))
+        seller.latitude, seller.longitude = 8.99, 38.79
+        seller.save(update_fields=['latitude', 'longitude'])
+        seller.refresh_from_db()
+        self.assertEqual(seller.geohash, geo.encode(8.99, 38.79))
+
+    def test_prefilter_matches_brute_force(self):
+        import random
+        from warehouse import geo
+        from warehouse.models import SellerProfile
+        rng = random.Random(4)
+        for n in range(120):
+            self.make_seller(f's{n}', self.ORIGIN[0] + rng.uniform(-0.3, 0.3), self.ORIGIN[1] + rng.uniform(-0.3, 0.3))
+        for radius in (0.5, 3, 12, 40):
+            expected = sorted(
+                s.pk for s in SellerProfile.objects.all()
+                if geo.haversine_km(*self.ORIGIN, s.latitude, s.longitude) <= radius
+            )
+            found = geo.within(SellerProfile.objects.all(), *self.ORIGIN, radius)
+            self.assertEqual(sorted(s.pk for s in found), expected, radius)
+
+    def test_nearby_sellers_are_open_distance_sorted_and_paginated(self):
+        near = self.make_seller('near', 9.031, 38.741)
+        mid = self.make_seller('mid', 9.06, 38.76)
+        self.make_seller('far', 9.5, 39.2)
+        self.make_seller('closed', 9.032, 38.742, opening_time='00:00', closing_time='00:01')
+        params = {'lat': self.ORIGIN[0], 'lng': self.ORIGIN[1], 'radius': 10, 'page_size': 1}
+        first = self.client.get(reverse('nearby_sellers'), params).json()
+        self.assertEqual([r['id'] for r in first['results']], [near.pk])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['id'] for r in second['results']], [mid.pk])
+        self.assertIsNone(second['next'])
+        self.assertGreater(second['results'][0]['distance_km'], first['results'][0]['distance_km'])
+        everyone = self.client.get(reverse('nearby_sellers'), dict(params, open=0, page_size=10)).json()
+        self.assertEqual(len(everyone['results']), 3)
+        self.assertEqual(self.client.get(reverse('nearby_sellers'), {'lat': 'x'}).status_code, 400)
+
+    def test_nearby_products_use_seller_location(self):
+        near = self.make_seller('shop', 9.031, 38.741)
+        far = self.make_seller('faraway', 10.5, 40.0)
+        product = Product.objects.create(title='Buna', price=5, stock_quantity=1, seller=near)
+        Product.objects.create(title='Shai', price=5, stock_quantity=1, seller=far)
+        data = self.client.get(reverse('nearby_products'), {'lat': self.ORIGIN[0], 'lng': self.ORIGIN[1], 'radius': 5}).json()
+        self.assertEqual([r['id'] for r in data['results']], [str(product.pk)])
+
+
+class SellerClusterTests(TestCase):
+    def setUp(self):
+        import random
+        from django.core.cache import cache
+        from warehouse.models import SellerProfile
+        cache.clear()
+        rng = random.Random(9)
+        users = User.objects.bulk_create([User(username=f'c{n}') for n in range(300)])
+        for user in users:
+            SellerProfile.objects.create(
+                user=user, company_name=user.username, description='d', contact_number='1', address='a',
+                latitude=9.0 + rng.uniform(0, 0.06), longitude=38.7 + rng.uniform(0, 0.06),
+            )
+        self.lonely = SellerProfile.objects.create(
+            user=User.objects.create(username='lonely'), company_name='Lonely Cafe', description='d',
+            contact_number='1', address='a', latitude=9.2, longitude=38.9,
+        )
+        self.params = {'bbox': '38.6,8.95,38.95,9.25', 'zoom': 11}
+
+    def test_clusters_bound_marker_count_and_keep_totals(self):
+        data = self.client.get('/api/sellers/clusters/', self.params).json()
+        self.assertEqual(sum(c['count'] for c in data['clusters']), 301)
+        self.assertLess(len(data['clusters']), 64)
+        single = [c for c in data['clusters'] if c.get('id') == self.lonely.pk]
+        self.assertEqual(single[0]['name'], 'Lonely Cafe')
+        self.assertEqual(single[0]['url'], reverse('seller_profile', args=[self.lonely.pk]))
+        self.assertEqual(self.client.get('/api/sellers/clusters/', {'zoom': 3}).status_code, 400)
+
+    def test_tiles_are_cached_and_invalidated_when_a_seller_moves(self):
+        from unittest import mock
+        from django.core.cache import cache
+        self.client.get('/api/sellers/clusters/', self.params)
+        with self.assertNumQueries(1):  # the tile versions
+            self.client.get('/api/sellers/clusters/', self.params)
+        self.lonely.latitude, self.lonely.longitude = 9.21, 38.91
+        # Other workers' caches keep their tiles: the move must reach them without deleting anything.
+        with mock.patch.object(cache, 'delete_many'):
+            self.lonely.save()
+        data = self.client.get('/api/sellers/clusters/', self.params).json()
+        moved = [c for c in data['clusters'] if c.get('id') == self.lonely.pk][0]
+        self.assertAlmostEqual(moved['lat'], 9.21)
+        self.lonely.description = 'unchanged position'
+        self.lonely.save()
+        with self.assertNumQueries(1):
+            self.client.get('/api/sellers/clusters/', self.params)
+
+
+class OpeningHoursTests(TestCase):
+    def setUp(self):
+        import datetime
+        import zoneinfo
+        self.tz = zoneinfo.ZoneInfo('Africa/Addis_Ababa')
+        self.monday = datetime.datetime(2024, 1, 1, tzinfo=self.tz)  # a Monday
+        self.day = self.make_seller('day', '08:00', '17:00')
+        self.night = self.make_seller('night', '20:00', '02:00')
+
+    def make_seller(self, name, opens, closes):
+        from warehouse.models import SellerProfile
+        return SellerProfile.objects.create(
+            user=User.objects.create(username=name), company_name=name, description='d',
+            contact_number='1', address='a', opening_time=opens, closing_time=closes,
+        )
+
+    def at(self, days, hour, minute=0):
+        import datetime
+        return self.monday + datetime.timedelta(days=days, hours=hour, minutes=minute)
+
+    def open_names(self, at):
+        from warehouse import hours
+        from warehouse.models import SellerProfile
+        return sorted(SellerProfile.objects.filter(hours.open_now_q(at)).values_list('company_name', flat=True))
+
+    def test_daily_hours_including_overnight(self):
+        self.assertEqual(self.day.opening_hours.count(), 7)
+        self.assertEqual(self.open_names(self.at(2, 9)), ['day'])
+        self.assertEqual(self.open_names(self.at(2, 17)), [])
+        self.assertEqual(self.open_names(self.at(2, 23)), ['night'])
+        self.assertEqual(self.open_names(self.at(3, 1, 30)), ['night'])
+        # Sunday 20:00 until Monday 02:00 wraps around the end of the week.
+        self.assertEqual(self.open_names(self.at(0, 1)), ['night'])
+
+    def test_time_zone_and_schedule_follow_profile_changes(self):
+        import datetime
+        utc_nine = datetime.datetime(2024, 1, 3, 6, 0, tzinfo=datetime.timezone.utc)  # 09:00 in Addis Ababa
+        self.assertEqual(self.open_names(utc_nine), ['day'])
+        self.day.opening_time = datetime.time(10, 0)
+        self.day.save()
+        self.assertEqual(self.open_names(utc_nine), [])
+        self.day.opening_time = self.day.closing_time
+        self.day.save()
+        self.assertFalse(self.day.opening_hours.exists())
+
+    def test_explore_filters_open_sellers_in_sql_and_paginates(self):
+        from unittest import mock
+        for n in range(30):
+            self.make_seller(f'extra{n}', '08:00', '17:00')
+        with mock.patch('warehouse.hours.timezone.now', return_value=self.at(2, 23)):
+            response = self.client.get(reverse('companies_explore'), {'open': 1})
+        self.assertEqual([s.company_name for s in response.context['all_sellers']], ['night'])
+        response = self.client.get(reverse('companies_explore'))
+        self.assertEqual(len(response.context['all_sellers']), 24)
+        self.assertEqual(response.context['page_obj'].paginator.count, 32)
+
+
+class FollowGraphTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from warehouse.models import SellerProfile
+        cache.clear()
+        self.buyer = User.objects.create(username='fan')
+        self.sellers = [
+            SellerProfile.objects.create(
+                user=User.objects.create(username=f'shop{n}'), company_name=f'Shop {n}',
+                description='d', contact_number='1', address='a',
+            )
+            for n in range(5)
+        ]
+
+    def test_follow_unfollow_keep_count_and_are_idempotent(self):
+        from warehouse import follows
+        seller = self.sellers[0]
+        self.assertTrue(follows.follow(self.buyer, seller))
+        self.assertFalse(follows.follow(self.buyer, seller))
+        self.assertEqual(follows.follower_count(seller), 1)
+        self.assertTrue(follows.is_following(self.buyer, seller))
+        # A full save from a stale instance must not overwrite the count.
+        seller.description = 'edited'
+        seller.save()
+        self.assertEqual(follows.follower_count(seller), 1)
+        self.assertTrue(follows.unfollow(self.buyer, seller))
+        self.assertFalse(follows.unfollow(self.buyer, seller))
+        self.assertEqual(follows.follower_count(seller), 0)
+        self.assertFalse(follows.is_following(self.buyer, seller))
+
+    def test_membership_of_many_sellers_is_one_query(self):
+        from warehouse import follows
+        follows.follow(self.buyer, self.sellers[1])
+        follows.follow(self.buyer, self.sellers[3])
+        with self.assertNumQueries(1):
+            self.assertEqual(follows.followed_seller_ids(self.buyer, self.sellers), {self.sellers[1].pk, self.sellers[3].pk})
+        with self.assertNumQueries(1):
+            self.assertEqual(follows.followed_seller_ids(self.buyer, self.sellers[:2]), {self.sellers[1].pk})
+
+    def test_related_manager_and_user_deletion_keep_counts(self):
+        from warehouse import follows
+        seller = self.sellers[2]
+        other = User.objects.create(username='other')
+        seller.followers.add(self.buyer, other)
+        self.assertEqual(follows.follower_count(seller), 2)
+        self.assertTrue(follows.is_following(self.buyer, seller))
+        self.buyer.following_sellers.clear()
+        self.assertEqual(follows.follower_count(seller), 1)
+        self.assertFalse(follows.is_following(self.buyer, seller))
+        other.delete()
+        self.assertEqual(follows.follower_count(seller), 0)
+
+    def test_toggle_endpoint(self):
+        seller = self.sellers[4]
+        self.client.force_login(self.buyer)
+        url = reverse('toggle_follow_seller', args=[seller.pk])
+        self.assertEqual(self.client.post(url).json(), {'followed': True, 'followers': 1})
+        self.assertEqual(self.client.post(url).json(), {'followed': False, 'followers': 0})
+
+
+class SellerRankingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from warehouse import follows
+        from warehouse.models import Order, Review, SellerProfile
+        cache.clear()
+        self.category = Category.objects.create(name='Rank', slug='rank')
+        self.sellers = {}
+        for name in ['Quiet', 'Popular', 'Busy']:
+            self.sellers[name] = SellerProfile.objects.create(
+                user=User.objects.create(username=name.lower()), company_name=name,
+                description='d', contact_number='1', address='a',
+            )
+        fans = [User.objects.create(username=f'fan{n}') for n in range(4)]
+        for fan in fans:
+            follows.follow(fan, self.sellers['Popular'])
+        product = Product.objects.create(title='Coffee', price=10, category=self.category, is_active=True, seller=self.sellers['Busy'])
+        for fan in fans[:2]:
+            Order.objects.create(user=fan, seller=self.sellers['Busy'], total_price=10, status='C')
+        Review.objects.create(product=product, user=fans[0], rating=5)
+
+    def test_refresh_ranks_by_blended_score(self):
+        from warehouse import rankings
+        from warehouse.models import SellerRanking
+        self.assertEqual(rankings.refresh(), 3)
+        ranked = list(SellerRanking.objects.values_list('seller__company_name', 'rank'))
+        self.assertEqual(ranked, [('Popular', 1), ('Busy', 2), ('Quiet', 3)])
+        busy = SellerRanking.objects.get(seller=self.sellers['Busy'])
+        self.assertEqual((busy.active_products, busy.sales, busy.review_count, busy.avg_rating), (1, 2, 1, 5.0))
+
+    def test_explore_serves_rank_slices_and_new_sellers_are_appended(self):
+        from warehouse import rankings
+        from warehouse.models import SellerProfile
+        rankings.refresh()
+        late = SellerProfile.objects.create(
+            user=User.objects.create(username='late'), company_name='Late', description='d', contact_number='1', address='a',
+        )
+        with self.settings(COMPANIES_PAGE_SIZE=2):
+            first = self.client.get(reverse('companies_explore'))
+            second = self.client.get(reverse('companies_explore'), {'page': 2})
+        self.assertEqual([s.company_name for s in first.context['all_sellers']], ['Popular', 'Busy'])
+        self.assertEqual([s.company_name for s in second.context['all_sellers']], ['Quiet', 'Late'])
+        self.assertEqual(second.context['page_obj'].paginator.count, 4)
+        self.assertEqual(rankings.top(1)[0].followers_count, 4)
+        self.assertEqual(late.ranking.rank, 4)
+
+    def test_deleting_a_seller_leaves_no_gap_in_the_pages(self):
+        from warehouse import rankings
+        from warehouse.models import SellerProfile
+        rankings.refresh()
+        SellerProfile.objects.create(
+            user=User.objects.create(username='late'), company_name='Late', description='d', contact_number='1', address='a',
+        )
+        self.sellers['Busy'].delete()
+        with self.settings(COMPANIES_PAGE_SIZE=2):
+            first = self.client.get(reverse('companies_explore'))
+            second = self.client.get(reverse('companies_explore'), {'page': 2})
+        self.assertEqual([s.company_name for s in first.context['all_sellers']], ['Popular', 'Quiet'])
+        self.assertEqual([s.company_name for s in second.context['all_sellers']], ['Late'])
+        self.assertEqual(second.context['page_obj'].paginator.count, 3)
+
+    def test_stale_snapshot_is_rebuilt_on_read_without_a_worker(self):
+        import datetime
+        from django.core.cache import cache
+        from warehouse import rankings
+        from warehouse.models import Job, SellerRanking
+        SellerRanking.objects.update(refreshed_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc))
+        cache.clear()
+        response = self.client.get(reverse('companies_explore'))
+        self.assertEqual([s.company_name for s in response.context['all_sellers']], ['Popular', 'Busy', 'Quiet'])
+        self.assertFalse(Job.objects.exists())
+        with self.assertNumQueries(0):
+            rankings.ensure_fresh()
+
+    def test_stale_snapshot_is_served_while_a_rebuild_is_queued(self):
+        import datetime
+        from django.core.cache import cache
+        from warehouse import jobs, rankings
+        from warehouse.models import Job, SellerRanking
+        stale = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        SellerRanking.objects.update(refreshed_at=stale)
+        cache.clear()
+        with self.settings(JOBS_WORKER=True):
+            response = self.client.get(reverse('companies_explore'))
+            self.assertEqual([s.company_name for s in response.context['all_sellers']], ['Quiet', 'Popular', 'Busy'])
+            self.assertEqual(SellerRanking.objects.filter(refreshed_at=stale).count(), 3)
+            with self.assertNumQueries(0):
+                rankings.ensure_fresh()
+        self.assertEqual(list(Job.objects.values_list('task', flat=True)), [rankings.REFRESH_TASK])
+        self.assertEqual(jobs.work(), (1, 0))
+        self.assertEqual(SellerRanking.objects.get(rank=1).seller, self.sellers['Popular'])
+        with self.assertNumQueries(0):
+            rankings.ensure_fresh()
+
+
+class SellerStatsTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        self.category = Category.objects.create(name='Stats', slug='stats')
+        self.seller = SellerProfile.objects.create(
+            user=User.objects.create(username='stats'), company_name='Stats Co', description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='stats-buyer')
+        self.product = Product.objects.create(title='Tea', price=5, category=self.category, is_active=True, seller=self.seller)
+        Product.objects.create(title='Hidden', price=5, category=self.category, is_active=False, seller=self.seller)
+
+    def current(self):
+        from warehouse.models import SellerStats
+        stats = SellerStats.objects.get(seller=self.seller)
+        return stats.active_products, stats.review_count, stats.avg_rating, stats.sold_orders
+
+    def test_rollup_follows_product_review_and_order_changes(self):
+        from warehouse.models import Order, Review
+        self.assertEqual(self.current(), (1, 0, None, 0))
+        review = Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        Review.objects.create(product=self.product, user=self.seller.user, rating=2)
+        self.assertEqual(self.current(), (1, 2, 3.0, 0))
+        review.rating = 5
+        review.save()
+        self.assertEqual(self.current()[2], 3.5)
+        order = Order.objects.create(user=self.buyer, seller=self.seller, total_price=5)
+        self.assertEqual(self.current()[3], 0)
+        order.status = 'W'
+        order.save()
+        order.status = 'C'
+        order.save()
+        self.assertEqual(self.current()[3], 1)
+        order.status = 'X'
+        order.save()
+        self.assertEqual(self.current()[3], 0)
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self.current()[0], 0)
+        self.product.delete()
+        self.assertEqual(self.current(), (0, 0, None, 0))
+
+    def test_reconcile_repairs_drift_and_profile_reads_one_row(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from warehouse.models import Order, Review, SellerStats
+        Review.objects.create(product=self.product, user=self.buyer, rating=4)
+        Order.objects.create(user=self.buyer, seller=self.seller, total_price=5, status='C')
+        SellerStats.objects.filter(seller=self.seller).update(active_products=9, review_count=0, rating_total=0, sold_orders=7)
+        call_command('reconcile_seller_stats', stdout=StringIO())
+        self.assertEqual(self.current(), (1, 1, 4.0, 1))
+        response = self.client.get(reverse('seller_profile', args=[self.seller.pk]))
+        self.assertEqual(response.context['stats']['sold'], 1)
+        self.assertEqual(response.context['stats']['rating'], 4.0)
+
+
+class OrderSellerTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        category = Category.objects.create(name='Orders', slug='orders')
+        self.sellers = [
+            SellerProfile.objects.create(
+                user=User.objects.create(username=f'order-seller{n}'), company_name=f'Seller {n}',
+                description='d', contact_number='1', address='a',
+            )
+            for n in range(2)
+        ]
+        self.products = [
+            Product.objects.create(title=f'Item {n}', price=5, category=category, seller=seller)
+            for n, seller in enumerate(self.sellers)
+        ]
+        self.buyer = User.objects.create(username='order-buyer')
+
+    def test_checkout_makes_one_order_per_seller(self):
+        from django.core import mail
+        from warehouse import orders, outbox
+        Product.objects.update(stock_quantity=10)
+        extra = Product.objects.create(title='Extra', price=2, category=self.products[0].category, seller=self.sellers[0], stock_quantity=10)
+        created = orders.place_orders(self.buyer, [(self.products[0].pk, 1), (self.products[1].pk, 2), (extra.pk, 3)])
+        self.assertEqual(sorted((o.seller_id, o.lines.count(), o.total_price) for o in created), sorted([
+            (self.sellers[0].pk, 2, 11), (self.sellers[1].pk, 1, 10),
+        ]))
+        first = next(o for o in created if o.seller_id == self.sellers[0].pk)
+        User.objects.filter(pk=self.buyer.pk).update(email='buyer@example.com')
+        self.sellers[0].user.profile.role = 'seller'
+        self.sellers[0].user.profile.save()
+        self.client.force_login(self.sellers[0].user)
+        self.client.post(reverse('request_order_complete', args=[first.pk]))
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'W')
+        outbox.drain()
+        self.assertIn('Item 0 (x1)', mail.outbox[0].body)
+        self.assertIn('Extra (x3)', mail.outbox[0].body)
+
+    def test_pending_poll_counts_without_joining_products(self):
+        from warehouse.models import Order
+        for seller in self.sellers + self.sellers[:1]:
+            Order.objects.create(user=self.buyer, seller=seller, total_price=5)
+        self.client.force_login(self.sellers[0].user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('seller_order_notifications'))
+        self.assertEqual(response.json(), {'count': 2})
+        count_sql = [q['sql'] for q in queries if 'warehouse_order' in q['sql']]
+        self.assertEqual(len(count_sql), 1)
+        self.assertNotIn('warehouse_product', count_sql[0])
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        category = Category.objects.create(name='Checkout', slug='checkout')
+        seller = SellerProfile.objects.create(
+            user=User.objects.create(username='checkout-seller'), company_name='Checkout Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='checkout-buyer')
+        self.plenty = Product.objects.create(title='Plenty', price=10, category=category, seller=seller, stock_quantity=5)
+        self.last_one = Product.objects.create(title='Last one', price=7, category=category, seller=seller, stock_quantity=1)
+        self.retired = Product.objects.create(
+            title='Retired', price=3, category=category, seller=seller, stock_quantity=9, is_active=False,
+        )
+
+    def test_orders_are_priced_from_the_database_and_take_stock(self):
+        from warehouse import orders
+        from warehouse.models import ProductCard
+        created = orders.place_orders(self.buyer, [(self.plenty.pk, 2), (self.last_one.pk, 1), (self.plenty.pk, 1)], phone='0911')
+        self.assertEqual([o.total_price for o in created], [37])
+        self.assertEqual(sorted(created[0].lines.values_list('product_id', 'quantity', 'unit_price', 'total_price')), sorted([
+            (self.plenty.pk, 3, 10, 30), (self.last_one.pk, 1, 7, 7),
+        ]))
+        self.plenty.refresh_from_db()
+        self.last_one.refresh_from_db()
+        self.assertEqual((self.plenty.stock_quantity, self.plenty.in_stock), (2, True))
+        self.assertEqual((self.last_one.stock_quantity, self.last_one.in_stock), (0, False))
+        self.assertFalse(ProductCard.objects.get(pk=self.last_one.pk).in_stock)
+
+    def test_failures_are_reported_per_line_without_partial_writes(self):
+        from warehouse import orders
+        from warehouse.models import Order
+        with self.assertRaises(orders.CheckoutError) as caught:
+            orders.place_orders(self.buyer, [(self.plenty.pk, 1), (self.last_one.pk, 2), (self.retired.pk, 1)])
+        self.assertEqual(caught.exception.failures, {
+            self.last_one.pk: (orders.OUT_OF_STOCK, 1),
+            self.retired.pk: (orders.INACTIVE, 0),
+        })
+        self.assertFalse(Order.objects.exists())
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.plenty.stock_quantity, 5)
+
+    def test_lost_race_rolls_back_every_line(self):
+        from unittest import mock
+        from warehouse import orders
+        from warehouse.models import Order
+        Product.objects.filter(pk=self.last_one.pk).update(stock_quantity=0)
+        # The up-front check passes, as if it read the row before another buyer took the last one.
+        checks = iter([lambda quantities, products: {}, orders._check])
+        with mock.patch.object(orders, '_check', side_effect=lambda *args: next(checks)(*args)):
+            with self.assertRaises(orders.CheckoutError) as caught:
+                orders.place_orders(self.buyer, [(self.plenty.pk, 1), (self.last_one.pk, 1)])
+        self.assertEqual(caught.exception.failures, {self.last_one.pk: (orders.OUT_OF_STOCK, 0)})
+        self.assertFalse(Order.objects.exists())
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.plenty.stock_quantity, 5)
+
+    def test_checkout_view_places_all_selected_lines(self):
+        from warehouse.models import Order
+        self.client.force_login(self.buyer)
+        session = self.client.session
+        session['cart'] = {
+            str(self.plenty.pk): {'quantity': 2, 'price': '10'},
+            str(self.last_one.pk): {'quantity': 1, 'price': '7'},
+        }
+        session.save()
+        response = self.client.post(reverse('checkout'), {
+            'address': 'Bole', 'phone': '0911000000',
+            f'select_{self.plenty.pk}': 'on', f'quantity_{self.plenty.pk}': 2,
+            f'select_{self.last_one.pk}': 'on', f'quantity_{self.last_one.pk}': 1,
+        })
+        self.assertRedirects(response, reverse('settings_orders_page'), fetch_redirect_response=False)
+        order = Order.objects.get(user=self.buyer)
+        self.assertEqual((order.lines.count(), order.total_price), (2, 27))
+        self.assertNotIn('cart', self.client.session)
+
+    def test_checkout_pushes_the_emptied_cart(self):
+        from unittest import mock
+        from warehouse import push
+        self.client.force_login(self.buyer)
+        session = self.client.session
+        session['cart'] = {str(self.plenty.pk): {'quantity': 3, 'price': '10'}}
+        session.save()
+        with mock.patch('warehouse.push.publish') as publish:
+            self.client.post(reverse('checkout'), {
+                'address': 'Bole', 'phone': '0911000000',
+                f'select_{self.plenty.pk}': 'on', f'quantity_{self.plenty.pk}': 3,
+            })
+        publish.assert_called_with(push.cart_channel(session.session_key), {'cart_count': 0})
+
+
+class StockHoldTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        category = Category.objects.create(name='Holds', slug='holds')
+        seller = SellerProfile.objects.create(
+            user=User.objects.create(username='hold-seller'), company_name='Hold Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='hold-buyer')
+        self.product = Product.objects.create(title='Scarce', price=10, category=category, seller=seller, stock_quantity=3)
+
+    def card_available(self):
+        from warehouse.models import ProductCard
+        return ProductCard.objects.get(pk=self.product.pk).available_quantity
+
+    def test_holds_reduce_what_other_carts_can_take(self):
+        from warehouse import holds
+        holds.place(self.product, 'cart-a', 2)
+        self.assertEqual(self.card_available(), 1)
+        self.assertEqual(holds.available([self.product.pk], 'cart-b'), {self.product.pk: 1})
+        with self.assertRaises(holds.InsufficientStock) as caught:
+            holds.place(self.product, 'cart-b', 2)
+        self.assertEqual(caught.exception.available, 1)
+        holds.place(self.product, 'cart-a', 3)  # replacing your own hold is not blocked by it
+        self.assertEqual(self.card_available(), 0)
+
+    def test_checkout_consumes_own_hold_but_not_others(self):
+        from warehouse import holds, orders
+        from warehouse.models import StockHold
+        holds.place(self.product, 'cart-a', 2)
+        with self.assertRaises(orders.CheckoutError) as caught:
+            orders.place_orders(self.buyer, [(self.product.pk, 2)], hold_owner='cart-b')
+        self.assertEqual(caught.exception.failures, {self.product.pk: (orders.OUT_OF_STOCK, 1)})
+        orders.place_orders(self.buyer, [(self.product.pk, 2)], hold_owner='cart-a')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 1)
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(self.card_available(), 1)
+
+    def test_expired_holds_stop_counting_and_are_swept(self):
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from warehouse import holds
+        from warehouse.models import StockHold
+        holds.place(self.product, 'cart-a', 3)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(holds.available([self.product.pk]), {self.product.pk: 3})
+        self.assertEqual(self.card_available(), 0)
+        call_command('expire_stock_holds', batch_size=1, stdout=StringIO())
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(self.card_available(), 3)
+
+    def test_product_grids_sweep_expired_holds_until_a_sweeper_is_scheduled(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+        from warehouse import holds
+        from warehouse.models import StockHold
+        cache.clear()
+        holds.place(self.product, 'abandoned', 3)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.settings(CART_HOLD_SWEEPER=True):
+            self.client.get(reverse('product_list'))
+        self.assertEqual(self.card_available(), 0)
+        response = self.client.get(reverse('product_list'))
+        self.assertEqual([card.available_quantity for card in response.context['products']], [3])
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_cart_add_refuses_stock_held_elsewhere(self):
+        from warehouse import holds
+        holds.place(self.product, 'someone-else', 3)
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        self.assertNotIn(str(self.product.pk), self.client.session.get('cart', {}))
+        holds.release('someone-else')
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        self.assertEqual(self.client.session['cart'][str(self.product.pk)]['quantity'], 1)
+        self.assertEqual(self.card_available(), 2)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from warehouse.models import SellerProfile
+        cache.clear()
+        category = Category.objects.create(name='Retries', slug='retries')
+        self.seller = SellerProfile.objects.create(
+            user=User.objects.create(username='retry-seller'), company_name='Retry Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='retry-buyer')
+        self.product = Product.objects.create(title='Retry', price=10, category=category, seller=self.seller, stock_quantity=5)
+        self.client.force_login(self.buyer)
+
+    def checkout(self, key, quantity=1):
+        session = self.client.session
+        session['cart'] = {str(self.product.pk): {'quantity': quantity, 'price': '10'}}
+        session.save()
+        return self.client.post(reverse('checkout'), {
+            'address': 'Bole', 'phone': '0911000000',
+            f'select_{self.product.pk}': 'on', f'quantity_{self.product.pk}': quantity,
+        }, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_checkout_replays_without_ordering_twice(self):
+        from django.core.cache import cache
+        from warehouse.models import Order
+        first = self.checkout('attempt-1')
+        retry = self.checkout('attempt-1')
+        self.assertEqual((retry.status_code, retry['Location']), (first.status_code, first['Location']))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        cache.clear()
+        self.assertEqual(self.checkout('attempt-1')['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 4)
+        self.assertEqual(self.checkout('attempt-1', quantity=2).status_code, 422)
+        self.checkout('attempt-2')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_retried_status_change_sends_one_email(self):
+        from django.core import mail
+        from warehouse import outbox
+        from warehouse.models import Order
+        order = Order.objects.create(user=self.buyer, seller=self.seller, total_price=10)
+        User.objects.filter(pk=self.buyer.pk).update(email='buyer@example.com')
+        self.seller.user.profile.role = 'seller'
+        self.seller.user.profile.save()
+        self.client.force_login(self.seller.user)
+        url = reverse('request_order_complete', args=[order.pk])
+        responses = [self.client.post(url, HTTP_IDEMPOTENCY_KEY='complete-1') for _ in range(2)]
+        self.assertEqual([r.json()['success'] for r in responses], [True, True])
+        outbox.drain()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_concurrent_duplicate_conflicts_until_abandoned_and_keys_expire(self):
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from warehouse import idempotency
+        from warehouse.models import IdempotencyKey, Order
+        # Another worker has claimed the key and is still running the view.
+        key = idempotency._digest(f'user:{self.buyer.pk}', 'in-flight')
+        idempotency._claim(key, 'other')
+        response = self.checkout('in-flight')
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertFalse(Order.objects.exists())
+        IdempotencyKey.objects.filter(pk=key).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.checkout('in-flight').status_code, 302)
+        self.assertEqual(Order.objects.count(), 1)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys', batch_size=1, stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        category = Category.objects.create(name='Bulk', slug='bulk')
+        self.seller, self.other = [
+            SellerProfile.objects.create(
+                user=User.objects.create(username=f'bulk-seller{n}'), company_name=f'Bulk {n}',
+                description='d', contact_number='1', address='a',
+            )
+            for n in range(2)
+        ]
+        self.seller.user.profile.role = 'seller'
+        self.seller.user.profile.save()
+        self.buyers = [User.objects.create(username=f'bulk-buyer{n}', email=f'buyer{n}@example.com') for n in range(2)]
+        self.product = Product.objects.create(title='Bulk item', price=4, category=category, seller=self.seller, stock_quantity=20)
+        self.client.force_login(self.seller.user)
+
+    def post(self, action, order_ids):
+        import json
+        return self.client.post(
+            reverse('bulk_order_transition'), json.dumps({'action': action, 'order_ids': order_ids}),
+            content_type='application/json',
+        )
+
+    def test_complete_moves_pending_orders_and_mails_each_buyer_once(self):
+        from django.core import mail
+        from warehouse import orders, outbox
+        from warehouse.models import Order, SellerStats
+        pending = [orders.place_orders(buyer, [(self.product.pk, 1)])[0] for buyer in self.buyers + self.buyers[:1] * 2]
+        waiting = Order.objects.create(user=self.buyers[0], seller=self.seller, total_price=4, status='W')
+        foreign = Order.objects.create(user=self.buyers[0], seller=self.other, total_price=4)
+        ids = [o.pk for o in pending] + [waiting.pk, foreign.pk]
+        response = self.post('complete', ids)
+        self.assertEqual(response.json()['updated'], 4)
+        self.assertEqual(response.json()['results'], {
+            **{str(o.pk): orders.MOVED for o in pending},
+            str(waiting.pk): orders.WRONG_STATUS,
+            str(foreign.pk): orders.NOT_FOUND,
+        })
+        self.assertEqual(Order.objects.filter(pk__in=[o.pk for o in pending], status='W').count(), 4)
+        self.assertEqual(Order.objects.get(pk=foreign.pk).status, 'P')
+        self.assertEqual(SellerStats.objects.get(seller=self.seller).sold_orders, 5)
+        outbox.drain()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['buyer0@example.com', 'buyer1@example.com'])
+        self.assertEqual(next(m for m in mail.outbox if m.to == ['buyer0@example.com']).body.count('- Order #'), 3)
+
+    def test_cancel_returns_stock_and_rejects_bad_input(self):
+        from warehouse import orders
+        from warehouse.models import ProductCard
+        order = orders.place_orders(self.buyers[0], [(self.product.pk, 5)])[0]
+        self.assertEqual(self.post('cancel', [order.pk]).json()['results'], {str(order.pk): orders.MOVED})
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 20)
+        self.assertEqual(ProductCard.objects.get(pk=self.product.pk).available_quantity, 20)
+        self.assertEqual(self.post('cancel', [order.pk]).json()['results'], {str(order.pk): orders.WRONG_STATUS})
+        self.assertEqual(self.post('archive', [order.pk]).status_code, 400)
+        self.assertEqual(self.post('cancel', ['x']).status_code, 400)
+
+    def test_orders_moved_by_someone_else_after_the_read_are_not_counted(self):
+        from unittest import mock
+        from warehouse import orders
+        from warehouse.models import Order, OrderEvent, SellerStats
+        first, second = (orders.place_orders(buyer, [(self.product.pk, 1)])[0] for buyer in self.buyers)
+        read = Order.objects.select_for_update
+
+        def stale_read(*args, **kwargs):
+            # Another request completes the first order between this one's read and its UPDATE.
+            rows = list(read(*args, **kwargs).filter(seller=self.seller).values_list('pk', 'status'))
+            Order.objects.filter(pk=first.pk).update(status='W')
+            return mock.Mock(filter=lambda **kwargs: mock.Mock(values_list=lambda *fields: rows))
+
+        with mock.patch.object(Order.objects, 'select_for_update', stale_read):
+            results, moved = orders.transition(self.seller, [first.pk, second.pk], orders.COMPLETE)
+        self.assertEqual(results, {first.pk: orders.WRONG_STATUS, second.pk: orders.MOVED})
+        self.assertEqual([order.pk for order in moved], [second.pk])
+        self.assertEqual(SellerStats.objects.get(seller=self.seller).sold_orders, 1)
+        self.assertFalse(OrderEvent.objects.filter(order=first, to_status='W').exists())
+        self.assertEqual(Order.objects.get(pk=second.pk).status, 'W')
+
+
+class OrderLifecycleTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        category = Category.objects.create(name='Lifecycle', slug='lifecycle')
+        self.seller = SellerProfile.objects.create(
+            user=User.objects.create(username='life-seller'), company_name='Life Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='life-buyer')
+        self.product = Product.objects.create(title='Life', price=3, category=category, seller=self.seller, stock_quantity=50)
+
+    def place(self, count, hours_ago):
+        from datetime import timedelta
+        from django.utils import timezone
+        from warehouse import orders
+        from warehouse.models import Order
+        placed = [orders.place_orders(self.buyer, [(self.product.pk, 1)])[0] for _ in range(count)]
+        Order.objects.filter(pk__in=[o.pk for o in placed]).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        return placed
+
+    def test_transitions_are_logged_and_feed_percentiles(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from warehouse import lifecycle, orders
+        from warehouse.models import OrderEvent
+        fast, slow = self.place(9, hours_ago=1), self.place(1, hours_ago=48)
+        orders.transition(self.seller, [o.pk for o in fast + slow], orders.COMPLETE)
+        order = fast[0]
+        order.refresh_from_db()
+        OrderEvent.objects.filter(order=order, to_status='W').update(created_at=timezone.now() - timedelta(minutes=30))
+        self.client.force_login(self.buyer)
+        self.client.post(reverse('confirm_order_complete', args=[order.pk]))
+        self.assertEqual(
+            list(OrderEvent.objects.filter(order=order).order_by('pk').values_list('from_status', 'to_status')),
+            [('', 'P'), ('P', 'W'), ('W', 'C')],
+        )
+        with self.assertNumQueries(1):
+            count, values = lifecycle.percentiles(self.seller, lifecycle.FULFIL)
+        self.assertEqual(count, 10)
+        self.assertAlmostEqual(values[0.5] / 3600, 1, delta=lifecycle.BUCKET_RATIO - 1)
+        self.assertAlmostEqual(values[0.95] / 3600, 48, delta=48 * (lifecycle.BUCKET_RATIO - 1))
+        self.client.force_login(self.seller.user)
+        metrics = self.client.get(reverse('seller_fulfilment_metrics')).json()
+        self.assertEqual((metrics['fulfil']['count'], metrics['confirm']['count']), (10, 1))
+        self.assertAlmostEqual(metrics['confirm']['p50'] / 60, 30, delta=30 * (lifecycle.BUCKET_RATIO - 1))
+
+    def test_rebuild_reproduces_incremental_histograms(self):
+        from django.core.management import call_command
+        from warehouse import orders
+        from warehouse.models import LatencyBucket
+        placed = self.place(3, hours_ago=2) + self.place(2, hours_ago=30)
+        orders.transition(self.seller, [o.pk for o in placed], orders.COMPLETE)
+        incremental = sorted(LatencyBucket.objects.values_list('seller_id', 'metric', 'bucket', 'count'))
+        LatencyBucket.objects.update(count=0)
+        call_command('rebuild_latency_histograms', stdout=StringIO())
+        self.assertEqual(sorted(LatencyBucket.objects.values_list('seller_id', 'metric', 'bucket', 'count')), incremental)
+
+
+class FlakyEmailBackend:
+    """Email backend for OutboxTests: refuses mail to addresses starting with "bounce"."""
+    opened = 0
+
+    def __init__(self, fail_silently=False, **kwargs):
+        pass
+
+    def open(self):
+        FlakyEmailBackend.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        from django.core import mail
+        for message in messages:
+            if message.to[0].startswith('bounce'):
+                raise ConnectionError('mailbox unavailable')
+            mail.outbox.append(message)
+        return len(messages)
+
+
+class OutboxTests(TestCase):
+    def test_views_queue_mail_that_drain_sends_over_one_connection(self):
+        from django.core import mail
+        from django.core.management import call_command
+        from django.test import override_settings
+        from warehouse import outbox
+        from warehouse.models import OutboxEmail
+        self.client.post(reverse('sign-up'), {
+            'username': 'newcomer', 'email': 'newcomer@gmail.com', 'password1': 'Str0ng-pass!', 'password2': 'Str0ng-pass!',
+        })
+        for n in range(3):
+            outbox.enqueue(f'Note {n}', 'body', [f'reader{n}@example.com'])
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxEmail.objects.filter(status='P').count(), 4)
+        FlakyEmailBackend.opened = 0
+        with override_settings(EMAIL_BACKEND='warehouse.tests.FlakyEmailBackend'):
+            call_command('drain_outbox', stdout=StringIO())
+        self.assertEqual(FlakyEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        activation = next(m for m in mail.outbox if m.to == ['newcomer@gmail.com'])
+        self.assertEqual(activation.alternatives[0][1], 'text/html')
+        self.assertFalse(OutboxEmail.objects.exclude(status='S').exists())
+
+    def test_failures_back_off_then_give_up(self):
+        from datetime import timedelta
+        from django.core import mail
+        from django.test import override_settings
+        from django.utils import timezone
+        from warehouse import outbox
+        from warehouse.models import OutboxEmail
+        outbox.enqueue('Hello', 'body', ['bounce@example.com'])
+        outbox.enqueue('Hello', 'body', ['reader@example.com'])
+        now = timezone.now()
+        with override_settings(EMAIL_BACKEND='warehouse.tests.FlakyEmailBackend', OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=60):
+            self.assertEqual(outbox.drain(now=now), (1, 1))
+            bounced = OutboxEmail.objects.get(to=['bounce@example.com'])
+            self.assertEqual((bounced.status, bounced.attempts, bounced.next_attempt_at), ('P', 1, now + timedelta(seconds=60)))
+            self.assertEqual(outbox.drain(now=now + timedelta(seconds=59)), (0, 0))
+            self.assertEqual(outbox.drain(now=now + timedelta(seconds=60)), (0, 1))
+            bounced.refresh_from_db()
+            self.assertEqual(bounced.next_attempt_at, now + timedelta(seconds=180))
+            self.assertEqual(outbox.drain(now=now + timedelta(seconds=180)), (0, 1))
+        bounced.refresh_from_db()
+        self.assertEqual((bounced.status, bounced.attempts), ('F', 3))
+        self.assertIn('mailbox unavailable', bounced.last_error)
+        self.assertEqual([m.to for m in mail.outbox], [['reader@example.com']])
+
+    def test_sends_after_commit_until_a_drain_worker_is_configured(self):
+        from django.core import mail
+        from warehouse import outbox
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('sign-up'), {
+                'username': 'newcomer', 'email': 'newcomer@gmail.com', 'password1': 'Str0ng-pass!', 'password2': 'Str0ng-pass!',
+            })
+        self.assertEqual([m.to for m in mail.outbox], [['newcomer@gmail.com']])
+        with self.settings(OUTBOX_WORKER=True), self.captureOnCommitCallbacks(execute=True):
+            outbox.enqueue('Later', 'body', ['queued@example.com'])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claims_do_not_overlap(self):
+        from django.utils import timezone
+        from warehouse import outbox
+        for n in range(3):
+            outbox.enqueue('Hello', 'body', [f'reader{n}@example.com'])
+        now = timezone.now()
+        first = outbox._claim(2, now)
+        second = outbox._claim(2, now)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertFalse({row.pk for row in first} & {row.pk for row in second})
+        self.assertEqual(len({row.locked_by for row in first + second}), 2)
+        self.assertEqual(outbox._claim(2, now), [])
+
+
+job_calls = []
+
+
+def _register_test_tasks():
+    from warehouse.jobs import task
+
+    @task(name='tests.record')
+    def record(label):
+        job_calls.append(label)
+
+    @task(name='tests.explode', max_attempts=3)
+    def explode():
+        raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        _register_test_tasks()
+        job_calls.clear()
+
+    def test_due_jobs_run_by_priority_then_schedule(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from warehouse import jobs
+        from warehouse.models import Job
+        now = timezone.now()
+        jobs.enqueue('tests.record', 'low', priority=-1, run_at=now - timedelta(minutes=5))
+        jobs.enqueue('tests.record', 'first', run_at=now - timedelta(minutes=2))
+        jobs.enqueue('tests.record', 'urgent', priority=5, run_at=now)
+        later = jobs.enqueue('tests.record', 'later', priority=9, run_at=now + timedelta(hours=1))
+        self.assertEqual(jobs.work(now=now), (3, 0))
+        self.assertEqual(job_calls, ['urgent', 'first', 'low'])
+        self.assertEqual(Job.objects.filter(status='D').count(), 3)
+        later.refresh_from_db()
+        self.assertEqual((later.status, later.attempts), ('P', 0))
+        with self.assertRaises(ValueError):
+            jobs.enqueue('tests.missing')
+
+    def test_claims_do_not_overlap(self):
+        from warehouse import jobs
+        for n in range(5):
+            jobs.enqueue('tests.record', n)
+        first = jobs.claim(3)
+        second = jobs.claim(3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({job.pk for job in first} & {job.pk for job in second})
+        self.assertEqual(jobs.claim(3), [])
+
+    def test_failures_back_off_then_give_up(self):
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from warehouse import jobs
+        job = jobs.enqueue('tests.explode')
+        now = timezone.now()
+        with override_settings(JOBS_RETRY_BASE_SECONDS=30):
+            self.assertEqual(jobs.work(now=now), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.run_at), ('P', 1, now + timedelta(seconds=30)))
+            self.assertEqual(jobs.work(now=now + timedelta(seconds=29)), (0, 0))
+            self.assertEqual(jobs.work(now=now + timedelta(seconds=30)), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual(job.run_at, now + timedelta(seconds=90))
+            self.assertEqual(jobs.work(now=now + timedelta(seconds=90)), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('F', 3))
+        self.assertIn('RuntimeError: boom', job.last_error)
+
+    def test_expired_lease_is_claimed_again(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from warehouse import jobs
+        job = jobs.enqueue('tests.record', 'retried')
+        now = timezone.now()
+        abandoned = jobs.claim(1, now=now)[0]
+        self.assertEqual(jobs.claim(1, now=now), [])
+        later = now + timedelta(seconds=jobs.lease_seconds())
+        self.assertEqual(jobs.work(now=later), (1, 0))
+        # The first worker finishing late must not overwrite the second one's result.
+        jobs.run(abandoned)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('D', 2))
+        self.assertEqual(job_calls, ['retried', 'retried'])
+
+    def test_profile_backfill_runs_as_a_job(self):
+        from django.core.management import call_command
+        from warehouse import jobs
+        from warehouse.models import UserProfile
+        users = [User.objects.create_user(username=f'noprofile{n}') for n in range(3)]
+        UserProfile.objects.filter(user__in=users).delete()
+        call_command('create_missing_profiles', '--enqueue', stdout=StringIO())
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 0)
+        self.assertEqual(jobs.work(), (1, 0))
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 3)
+
+
+class CountersEndpointTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        from warehouse.models import SellerProfile
+        cache.clear()
+        self.seller = SellerProfile.objects.create(
+            user=User.objects.create(username='counter-seller'), company_name='Counter Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.seller.user.profile.role = 'seller'
+        self.seller.user.profile.save()
+        self.buyer = User.objects.create(username='counter-buyer')
+        self.product = Product.objects.create(title='Counted', price=3, seller=self.seller, stock_quantity=10)
+
+    def poll(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse('counters'), **headers)
+
+    def test_unchanged_state_is_a_304_without_counting(self):
+        from warehouse import orders
+        self.client.force_login(self.buyer)
+        first = self.poll()
+        self.assertEqual(first.json(), {'role': 'buyer', 'waiting_orders': 0, 'cart_count': 0})
+        self.assertIn('no-cache', first['Cache-Control'])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.poll(first['ETag']).status_code, 304)
+        self.assertFalse([q for q in queries if 'warehouse_order"' in q['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            order, = orders.place_orders(self.buyer, [(self.product.pk, 2)])
+        with self.captureOnCommitCallbacks(execute=True):
+            orders.transition(self.seller, [order.pk], orders.COMPLETE)
+        second = self.poll(first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['waiting_orders'], 1)
+        self.client.post(reverse('cart_add', args=[self.product.pk]))
+        self.assertEqual(self.poll(second['ETag']).json()['cart_count'], 1)
+
+    def test_seller_etag_follows_their_orders(self):
+        from warehouse.models import Order
+        self.client.force_login(self.seller.user)
+        first = self.poll()
+        self.assertEqual(first.json(), {'role': 'seller', 'new_orders': 0, 'total_sales': 0})
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.buyer, seller=self.seller, total_price=3)
+        second = self.poll(first['ETag'])
+        self.assertEqual(second.json()['new_orders'], 1)
+        self.assertEqual(self.poll(second['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'C'
+            order.save()
+        self.assertEqual(self.poll(second['ETag']).json(), {'role': 'seller', 'new_orders': 0, 'total_sales': 1})
+
+
+    def test_etag_follows_the_counter_rows_not_a_cache(self):
+        from warehouse.models import Order
+        self.client.force_login(self.seller.user)
+        first = self.poll()
+        # As if another worker placed the order: no on_commit hook runs in this process.
+        Order.objects.create(user=self.buyer, seller=self.seller, total_price=3)
+        self.assertEqual(self.poll(first['ETag']).json()['new_orders'], 1)
+
+
+class OrderCounterTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        self.sellers = [
+            SellerProfile.objects.create(
+                user=User.objects.create(username=f'tally-seller{n}'), company_name=f'Tally {n}',
+                description='d', contact_number='1', address='a',
+            )
+            for n in range(2)
+        ]
+        self.buyer = User.objects.create(username='tally-buyer')
+        self.products = [Product.objects.create(title=f'Tally {n}', price=2, seller=seller, stock_quantity=10) for n, seller in enumerate(self.sellers)]
+
+    def assertCounts(self, buyer, *sellers):
+        from warehouse import counters
+        self.assertEqual(counters.counts(counters.BUYER, self.buyer.pk), buyer)
+        for seller, expected in zip(self.sellers, sellers):
+            self.assertEqual(counters.counts(counters.SELLER, seller.pk), expected)
+
+    def test_counters_follow_every_write_path(self):
+        from warehouse import orders
+        first, second = orders.place_orders(self.buyer, [(p.pk, 1) for p in self.products])
+        self.assertCounts({'P': 2}, {'P': 1}, {'P': 1})
+        orders.transition(self.sellers[0], [first.pk], orders.COMPLETE)
+        self.assertCounts({'P': 1, 'W': 1}, {'W': 1}, {'P': 1})
+        first.refresh_from_db()
+        first.status = 'C'
+        first.save()
+        second.seller = self.sellers[0]
+        second.save()
+        self.assertCounts({'P': 1, 'C': 1}, {'P': 1, 'C': 1}, {})
+        second.delete()
+        self.assertCounts({'C': 1}, {'C': 1}, {})
+
+    def test_polling_reads_counters_not_orders(self):
+        from warehouse.models import Order
+        for _ in range(3):
+            Order.objects.create(user=self.buyer, seller=self.sellers[0], total_price=2, status='W')
+        self.client.force_login(self.buyer)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('buyer_order_notifications'))
+        self.assertEqual(response.json(), {'count': 3})
+        self.assertFalse([q for q in queries if 'warehouse_order"' in q['sql']])
+
+    def test_reconcile_repairs_drift(self):
+        from django.core.management import call_command
+        from warehouse.models import Order, OrderCounter
+        order = Order.objects.create(user=self.buyer, seller=self.sellers[1], total_price=2)
+        Order.objects.filter(pk=order.pk).update(status='X')
+        OrderCounter.objects.create(kind='seller', owner_id=self.sellers[0].pk, status='C', count=4)
+        out = StringIO()
+        call_command('reconcile_order_counters', stdout=out)
+        self.assertIn('Corrected 5', out.getvalue())
+        self.assertCounts({'X': 1}, {}, {'X': 1})
+
+    def test_save_without_loaded_values_skips_the_unknown_status(self):
+        from warehouse import counters
+        from warehouse.models import Order, OrderCounter
+        order = Order.objects.create(user=self.buyer, seller=self.sellers[0], total_price=2)
+        # An Order built by hand for an existing row has no loaded status to count it out of.
+        with self.assertNumQueries(3):  # insert the missing rows, one UPDATE per kind for 'W'
+            counters.order_saved(Order, Order(pk=order.pk, user=self.buyer, seller=self.sellers[0], status='W'), created=False)
+        self.assertFalse(OrderCounter.objects.filter(status__isnull=True).exists())
+        self.assertCounts({'P': 1, 'W': 1}, {'P': 1, 'W': 1}, {})
+
+
+class CounterStreamTests(TestCase):
+    def setUp(self):
+        from warehouse.models import SellerProfile
+        self.seller = SellerProfile.objects.create(
+            user=User.objects.create(username='stream-seller'), company_name='Stream Co',
+            description='d', contact_number='1', address='a',
+        )
+        self.buyer = User.objects.create(username='stream-buyer')
+        self.product = Product.objects.create(title='Streamed', price=3, seller=self.seller, stock_quantity=10)
+        self.async_client.cookies = self.client.cookies
+        self.client.force_login(self.buyer)
+
+    def wait_for_order(self):
+        from warehouse.models import Order
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(user=self.buyer, seller=self.seller, total_price=3, status='W')
+
+    async def next_event(self, events):
+        import asyncio
+        import json
+        while True:
+            chunk = await asyncio.wait_for(anext(events), 5)
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not chunk.startswith(':'):
+                return json.loads(chunk.split('data: ', 1)[1])
+
+    async def test_stream_pushes_order_and_cart_changes(self):
+        from asgiref.sync import sync_to_async
+        from django.test import override_settings
+        from warehouse import push
+        with override_settings(PUSH_STREAM_SECONDS=1.5, PUSH_KEEPALIVE_SECONDS=0.2):
+            response = await self.async_client.get(reverse('counter_events'))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = aiter(response.streaming_content)
+            self.assertEqual(await self.next_event(events), {'role': 'buyer', 'waiting_orders': 0, 'cart_count': 0})
+            await sync_to_async(self.wait_for_order)()
+            self.assertEqual((await self.next_event(events))['waiting_orders'], 1)
+            await self.async_client.post(reverse('cart_add', args=[self.product.pk]))
+            self.assertEqual(await self.next_event(events), {'role': 'buyer', 'waiting_orders': 1, 'cart_count': 1})
+            rest = [chunk async for chunk in events]
+        self.assertTrue(rest)
+        self.assertTrue(all(chunk.startswith(b': keepalive') for chunk in rest))
+        self.assertEqual(push.backend()._subscribers, {})
+
+    def test_non_streaming_servers_get_204_so_pages_poll(self):
+        self.assertEqual(self.client.get(reverse('counter_events')).status_code, 204)
@@ -1,7 +1,7 @@
 from django.urls import path
 from warehouse import views
 from warehouse.views import product_detail
-from . import api_counters
+from . import api_counters, api_views
 
 
 urlpatterns = [
@@ -26,14 +26,21 @@ urlpatterns = [
     path('wishlist/remove/', views.remove_from_wishlist, name='remove_from_wishlist'),
     path('settings-orders/', views.settings_orders_page, name='settings_orders_page'),
     path('order/<int:order_id>/request-complete/', views.request_order_complete, name='request_order_complete'),
+    path('orders/bulk-transition/', views.bulk_order_transition, name='bulk_order_transition'),
     path('order/<int:order_id>/confirm-complete/', views.confirm_order_complete, name='confirm_order_complete'),
     path('dashboard/order_counts/', views.dashboard_order_counts, name='dashboard_order_counts'),
     path('dashboard/buyer_order_counts/', views.dashboard_buyer_order_counts, name='dashboard_buyer_order_counts'),
     path('dashboard/buyer_cart_count/', views.dashboard_buyer_cart_count, name='dashboard_buyer_cart_count'),
 
+    path('api/counters/', api_counters.counters, name='counters'),
+    path('api/counters/stream/', api_counters.counter_events, name='counter_events'),
     path('api/seller/order-notifications/', api_counters.seller_order_notifications, name='seller_order_notifications'),
     path('api/buyer/cart-count/', api_counters.buyer_cart_count, name='buyer_cart_count'),
     path('api/buyer/order-notifications/', api_counters.buyer_order_notifications, name='buyer_order_notifications'),
+    path('api/seller/fulfilment-metrics/', api_views.seller_fulfilment_metrics, name='seller_fulfilment_metrics'),
+    path('api/suggest/', api_views.suggest, name='suggest'),
+    path('api/sellers/nearby/', api_views.nearby_sellers, name='nearby_sellers'),
+    path('api/products/nearby/', api_views.nearby_products, name='nearby_products'),
 
     # Public seller profile
     path('store/<int:seller_id>/', views.seller_profile, name='seller_profile'),
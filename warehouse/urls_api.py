@@ -3,4 +3,5 @@ from warehouse import api_views
 
 urlpatterns = [
     path('seller/pending-orders-count/', api_views.seller_pending_orders_count, name='seller_pending_orders_count'),
+    path('sellers/clusters/', api_views.seller_clusters, name='seller_clusters'),
 ]
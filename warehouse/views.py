@@ -15,9 +15,8 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.db import models
 from django.core.exceptions import PermissionDenied
-from django.core.mail import send_mail
 
-from warehouse.models import Image, Product, User, Order, CustomerInteraction, Category, Wishlist, SellerProfile, Review
+from warehouse.models import Image, Product, ProductCard, User, Order, CustomerInteraction, Category, Wishlist, SellerProfile, Review
 
 from . import forms
 
@@ -27,10 +26,63 @@ from django.contrib.auth import update_session_auth_hash
 from warehouse.forms import BasicUserForm, BasicSellerForm, AddProductForm, EditProductForm
 from cart.views import Cart
 from warehouse.decorators import seller_required, buyer_required
+from warehouse.idempotency import idempotent
 from .forms_wishlist import WishlistAddForm, WishlistRemoveForm
 from .forms_search import ProductSearchForm
+from warehouse import cards, counters as order_counters, facets, follows, holds, lifecycle, orders as order_actions, outbox, search, stats
+from warehouse.pagination import KeysetPaginator, InvalidCursor, page_size_from_request
 from django.db import transaction
 
+
+def _product_page(request, queryset, ordering=('-created_at', '-pk')):
+    """Return the keyset page selected by ``?cursor=`` (first page if absent or invalid)."""
+    holds.sweep_if_due()
+    paginator = KeysetPaginator(queryset, ordering=ordering, page_size=page_size_from_request(request))
+    try:
+        return paginator.page(request.GET.get('cursor'))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def _render_product_page(request, template_name, partial_template, context, page):
+    """Render a product grid page in full, as partial HTML (``?format=partial``)
+    or as JSON (``?format=json``) so infinite scroll can fetch the next slice.
+    """
+    next_url = page.next_url(request)
+    context.update({
+        'products': page.items,
+        'next_page_url': next_url,
+        'previous_page_url': page.previous_url(request),
+    })
+    response_format = request.GET.get('format')
+    if response_format == 'json':
+        return JsonResponse({
+            'results': [
+                {
+                    'id': str(product.pk),
+                    'title': product.title,
+                    'price': str(product.price),
+                    'image': product.image_url,
+                    'avg_rating': product.avg_rating,
+                    'review_count': product.review_count,
+                    'seller': product.seller_name,
+                    'in_stock': product.in_stock,
+                    'url': reverse('product_detail', args=[product.pk]),
+                }
+                for product in page.items
+            ],
+            'next': next_url,
+            'previous': context['previous_page_url'],
+        })
+    if response_format == 'partial':
+        response = render(request, partial_template, context)
+    else:
+        response = render(request, template_name, context)
+    if next_url:
+        response['X-Next-Page'] = next_url
+    return response
+
+
 @login_required
 def dashboard(request):
     user = request.user
@@ -42,17 +94,17 @@ def dashboard(request):
         seller_profile = getattr(user, 'sellerprofile', None)
         if seller_profile:
             total_products = Product.objects.filter(seller=seller_profile).count()
-            seller_orders = Order.objects.filter(product__seller=seller_profile)
+            seller_orders = Order.objects.filter(seller=seller_profile)
             total_sales = seller_orders.filter(status__in=['C', 'W']).count()
             new_orders = seller_orders.filter(status='P').count()
             # Recent activity: last 5 orders
-            recent_activity = seller_orders.order_by('-created_at')[:5]
+            recent_activity = seller_orders.prefetch_related('lines__product').order_by('-created_at')[:5]
             context.update({
                 'total_products': total_products,
                 'total_sales': total_sales,
                 'new_orders': new_orders,
                 'recent_activity': [
-                    {'date': o.created_at.strftime('%Y-%m-%d'), 'description': f"Order for {o.product.title} ({o.get_status_display()})"}
+                    {'date': o.created_at.strftime('%Y-%m-%d'), 'description': f"Order for {o.summary()} ({o.get_status_display()})"}
                     for o in recent_activity
                 ],
             })
@@ -66,12 +118,12 @@ def dashboard(request):
         cart = Cart(request)
         cart_count = len(cart)
         # Recent orders: last 5
-        recent_orders_qs = Order.objects.filter(user=user).order_by('-created_at')[:5]
+        recent_orders_qs = Order.objects.filter(user=user).prefetch_related('lines__product').order_by('-created_at')[:5]
         recent_orders = [
             {
                 'date': o.created_at.strftime('%Y-%m-%d'),
                 'status': o.get_status_display(),
-                'product': o.product.title  # Use only the product title, not the object
+                'product': o.summary()  # Use only the product titles, not the objects
             } for o in recent_orders_qs
         ]
         waiting_orders = Order.objects.filter(user=user, status='W')
@@ -89,29 +141,32 @@ def seller_profile(request, seller_id: int):
     """Public company/store profile page.
     Shows seller info, product grid, about, simple location text and recent product reviews.
     """
-    seller = get_object_or_404(SellerProfile, id=seller_id)
-    products = Product.objects.filter(seller=seller, is_active=True).select_related('category').prefetch_related('images', 'reviews')
-    # Basic stats
-    seller_reviews_qs = Review.objects.filter(product__seller=seller)
-    stats = {
-        'products': products.count(),
-        'followers': seller.followers.count() if hasattr(seller, 'followers') else 0,
-        'rating': seller_reviews_qs.aggregate(avg=Avg('rating'))['avg'] or 0,
-        'rating_count': seller_reviews_qs.count(),
-        'sold': Order.objects.filter(product__seller=seller, status__in=['C','W']).count(),
+    seller = get_object_or_404(SellerProfile.objects.select_related('stats'), id=seller_id)
+    products = ProductCard.objects.filter(seller=seller, is_active=True)
+    page = _product_page(request, products)
+    if request.GET.get('format') in ('json', 'partial'):
+        return _render_product_page(request, 'warehouse/seller_profile.html', 'warehouse/partials/seller_product_cards.html', {'seller': seller}, page)
+    # Basic stats, from the rollup row fetched with the seller
+    seller_stats = stats.for_seller(seller)
+    stats_context = {
+        'products': seller_stats.active_products,
+        'followers': seller.follower_count,
+        'rating': seller_stats.avg_rating or 0,
+        'rating_count': seller_stats.review_count,
+        'sold': seller_stats.sold_orders,
     }
     # Simple recent reviews (limit 5)
     recent_reviews = Review.objects.filter(product__seller=seller).select_related('user', 'product').order_by('-created_at')[:5]
     is_own_store = request.user.is_authenticated and hasattr(request.user, 'sellerprofile') and getattr(request.user, 'sellerprofile', None) and request.user.sellerprofile.id == seller.id
 
-    return render(request, 'warehouse/seller_profile.html', {
+    return _render_product_page(request, 'warehouse/seller_profile.html', 'warehouse/partials/seller_product_cards.html', {
         'seller': seller,
-        'products': products,
-        'stats': stats,
+        'stats': stats_context,
         'recent_reviews': recent_reviews,
         'is_own_store': is_own_store,
+        'is_following': follows.is_following(request.user, seller),
         'maptiler_key': os.environ.get('MAPTILER_KEY')
-    })
+    }, page)
 
 @login_required
 def toggle_follow_seller(request, seller_id: int):
@@ -126,14 +181,8 @@ def toggle_follow_seller(request, seller_id: int):
     # Prevent sellers from following themselves
     if hasattr(user, 'sellerprofile') and user.sellerprofile.id == seller.id:
         return JsonResponse({'error': "You can't follow your own store."}, status=400)
-    followed = False
-    if seller.followers.filter(id=user.id).exists():
-        seller.followers.remove(user)
-    else:
-        seller.followers.add(user)
-        followed = True
-    followers = seller.followers.count()
-    return JsonResponse({'followed': followed, 'followers': followers})
+    followed = follows.toggle(user, seller)
+    return JsonResponse({'followed': followed, 'followers': follows.follower_count(seller)})
 
 @login_required  
 def setting_page(request):
@@ -236,8 +285,10 @@ def add_product(request):
             # Save images
             images = request.FILES.getlist('images')
             from .models import ProductImage
-            for image in images:
-                ProductImage.objects.create(product=product, image=image)
+            # One insert for all images; bulk_create sends no post_save, so the card is refreshed once here.
+            ProductImage.objects.bulk_create([ProductImage(product=product, image=image) for image in images])
+            if images:
+                cards.refresh_image(product.pk)
             from django.contrib import messages
             messages.success(request, "Product uploaded successfully!")
             # Stay on the add product page, do not redirect to product detail
@@ -340,7 +391,7 @@ def customer_page(request):
         .annotate(
             orders_count=Count(
                 'orders_as_user',
-                filter=Q(orders_as_user__product__seller=user.sellerprofile)
+                filter=Q(orders_as_user__seller=user.sellerprofile)
                 & ~Q(orders_as_user__status='X'),
             )
         )
@@ -407,7 +458,7 @@ def analytics_page(request):
     
     # Sales metrics
     orders = Order.objects.filter(
-        product__seller=seller,
+        seller=seller,
         created_at__range=(start_date, end_date)
     ).exclude(status='X')  # Exclude cancelled orders
     
@@ -444,11 +495,11 @@ def analytics_page(request):
     # Top products
     top_products = Product.objects.filter(
         seller=seller,
-        orders_as_product__created_at__range=(start_date, end_date)
+        order_lines__order__created_at__range=(start_date, end_date)
     ).annotate(
-        sales_count=Count('orders_as_product'),
-        revenue=Sum('orders_as_product__total_price'),
-        avg_price=Avg('orders_as_product__total_price')
+        sales_count=Count('order_lines'),
+        revenue=Sum('order_lines__total_price'),
+        avg_price=Avg('order_lines__total_price')
     ).order_by('-revenue')[:5]
     
     # Customer interactions
@@ -481,6 +532,7 @@ def analytics_page(request):
         'top_products': top_products,
         'interaction_labels': json.dumps(interaction_labels),
         'interaction_counts': json.dumps(interaction_counts),
+        'fulfilment': lifecycle.summary(seller),
     }
     
     return render(request, 'show/analytics.html', context)
@@ -527,33 +579,48 @@ def category_list(request):
 
 def category_detail(request, slug):
     category = get_object_or_404(Category, slug=slug)
-    products = category.products.all()
-    return render(request, 'warehouse/category_detail.html', {'category': category, 'products': products})
+    products = ProductCard.objects.filter(category=category, is_active=True)
+    page = _product_page(request, products)
+    return _render_product_page(request, 'warehouse/category_detail.html', 'warehouse/partials/category_product_cards.html', {'category': category}, page)
 
 def product_list(request):
-    form = ProductSearchForm(request.GET or None)
-    products = Product.objects.filter(is_active=True)
-    if form.is_valid():
-        q = form.cleaned_data.get('q')
-        category = form.cleaned_data.get('category')
-        min_price = form.cleaned_data.get('min_price')
-        max_price = form.cleaned_data.get('max_price')
-        in_stock = form.cleaned_data.get('in_stock')
-        if q:
-            products = products.filter(
-                Q(title__icontains=q) | Q(description__icontains=q)
-            )
-        if category:
-            products = products.filter(category=category)
-        if min_price is not None:
-            products = products.filter(price__gte=min_price)
-        if max_price is not None:
-            products = products.filter(price__lte=max_price)
-        if in_stock:
-            products = products.filter(in_stock=True)
-    else:
+    # Pagination parameters must not turn an unfiltered listing into a bound form.
+    params = request.GET.copy()
+    for key in ('cursor', 'page_size', 'format'):
+        params.pop(key, None)
+    form = ProductSearchForm(params or None)
+    products = ProductCard.objects.filter(is_active=True)
+    ordering = ('-created_at', '-pk')
+    filters = form.cleaned_data if form.is_valid() else {'in_stock': True}
+    q = filters.get('q')
+    if q:
+        products = search.search_products(products, q)
+        if search.is_supported():
+            ordering = ('-search_rank', '-created_at', '-pk')
+    if filters.get('category'):
+        products = products.filter(category=filters['category'])
+    if filters.get('min_price') is not None:
+        products = products.filter(price__gte=filters['min_price'])
+    if filters.get('max_price') is not None:
+        products = products.filter(price__lte=filters['max_price'])
+    if filters.get('in_stock'):
         products = products.filter(in_stock=True)
-    return render(request, 'warehouse/product_list.html', {'products': products, 'form': form})
+    if filters.get('free_delivery'):
+        products = products.filter(free_delivery=True)
+    if filters.get('pricing_type'):
+        products = products.filter(pricing_type=filters['pricing_type'])
+    if filters.get('brand'):
+        products = products.filter(brand__iexact=filters['brand'])
+    page = _product_page(request, products, ordering)
+    wishlist_ids = set()
+    if request.user.is_authenticated:
+        wishlist_ids = set(
+            Wishlist.products.through.objects.filter(wishlist__user=request.user).values_list('product_id', flat=True)
+        )
+    context = {'form': form, 'wishlist_ids': wishlist_ids}
+    if request.GET.get('format') not in ('json', 'partial'):
+        context['facets'] = facets.with_links(facets.facet_counts(products, filters), request)
+    return _render_product_page(request, 'warehouse/product_list.html', 'warehouse/partials/product_list_cards.html', context, page)
 
 @login_required(login_url='/sign-in/')
 def remove_product_image(request, product_id, image_id):
@@ -580,7 +647,7 @@ def settings_orders_page(request):
         seller_completed_orders = []
         seller_pending_orders_count = 0
         if seller_profile:
-            all_orders = Order.objects.filter(product__seller=seller_profile).select_related('user', 'product').order_by('-created_at')
+            all_orders = Order.objects.filter(seller=seller_profile).select_related('user').prefetch_related('lines__product').order_by('-created_at')
             seller_orders = all_orders
             seller_pending_orders = all_orders.filter(status='P')
             seller_waiting_orders = all_orders.filter(status='W')
@@ -595,7 +662,7 @@ def settings_orders_page(request):
     else:
         # Buyer: show cart and their orders
         cart = Cart(request)
-        buyer_orders = Order.objects.filter(user=user).select_related('product').order_by('-created_at')
+        buyer_orders = Order.objects.filter(user=user).prefetch_related('lines__product').order_by('-created_at')
         waiting_orders = [o for o in buyer_orders if o.status == 'W']
         completed_orders = [o for o in buyer_orders if o.status == 'C']
         pending_orders = [o for o in buyer_orders if o.status == 'P']
@@ -645,45 +712,84 @@ from django.views.decorators.http import require_POST
 @login_required
 @seller_required
 @require_POST
+@idempotent
 def request_order_complete(request, order_id):
     try:
-        order = Order.objects.get(id=order_id)
+        order = Order.objects.select_related('user').prefetch_related('lines__product').get(id=order_id)
         if order.status != 'P':
             return JsonResponse({'success': False, 'error': 'Order is not pending.'})
-        order.status = 'W'  # Waiting for buyer confirmation
-        order.save()
-        # Send email to buyer (advanced: include order details)
-        send_mail(
-            subject='Order Completion Confirmation Needed',
-            message=f'''Dear {order.user.username},\n\nThe seller has marked your order for {order.product.title} as completed.\n\nOrder Details:\n- Product: {order.product.title}\n- Quantity: {order.quantity}\n- Total Price: ${order.total_price}\n- Your Phone: {order.phone or 'N/A'}\n- Your Address: {order.address or 'N/A'}\n\nPlease log in to your account and confirm the order completion.\n\nThank you!''',
-            from_email=None,
-            recipient_list=[order.user.email],
-            fail_silently=True,
-        )
+        with transaction.atomic():
+            order.status = 'W'  # Waiting for buyer confirmation
+            order.save()
+            # Queue email to buyer (advanced: include order details)
+            outbox.enqueue(
+                subject='Order Completion Confirmation Needed',
+                body=f'''Dear {order.user.username},\n\nThe seller has marked your order #{order.id} as completed.\n\nOrder Details:\n- Products: {order.summary()}\n- Total Price: ${order.total_price}\n- Your Phone: {order.phone or 'N/A'}\n- Your Address: {order.address or 'N/A'}\n\nPlease log in to your account and confirm the order completion.\n\nThank you!''',
+                to=[order.user.email],
+            )
         return JsonResponse({'success': True, 'message': 'Order marked as completed. Waiting for buyer confirmation.'})
     except Order.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Order not found.'})
 
+@login_required
+@seller_required
+@require_POST
+@idempotent
+def bulk_order_transition(request):
+    """Request completion of, or cancel, many pending orders at once.
+
+    Takes ``action`` ("complete" or "cancel") and ``order_ids`` as JSON or
+    form fields; answers with a result per order id.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'error': 'Invalid JSON body.'}, status=400)
+        action, raw_ids = data.get('action'), data.get('order_ids')
+    else:
+        action, raw_ids = request.POST.get('action'), request.POST.getlist('order_ids')
+    if action not in order_actions.TRANSITIONS:
+        return JsonResponse({'success': False, 'error': 'Unknown action.'}, status=400)
+    try:
+        order_ids = [int(pk) for pk in raw_ids or []]
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'error': 'order_ids must be a list of order ids.'}, status=400)
+    if not order_ids or len(order_ids) > order_actions.MAX_TRANSITION_ORDERS:
+        return JsonResponse(
+            {'success': False, 'error': f'Send between 1 and {order_actions.MAX_TRANSITION_ORDERS} order ids.'}, status=400,
+        )
+    with transaction.atomic():
+        results, moved = order_actions.transition(request.user.sellerprofile, order_ids, action)
+        order_actions.notify_buyers(moved, action)
+    return JsonResponse({
+        'success': True,
+        'updated': len(moved),
+        'results': {str(pk): result for pk, result in results.items()},
+    })
+
 @csrf_exempt
 @login_required
+@idempotent
 def confirm_order_complete(request, order_id):
     if request.method == 'POST':
         try:
-            order = Order.objects.get(id=order_id)
+            order = Order.objects.select_related('seller__user').prefetch_related('lines__product').get(id=order_id)
             if order.status != 'W':
                 return JsonResponse({'success': False, 'error': 'Order is not waiting for buyer confirmation.'})
             if order.user != request.user:
                 return JsonResponse({'success': False, 'error': 'You are not authorized to confirm this order.'})
-            order.status = 'C'
-            order.save()
-            # Send email to seller
-            send_mail(
-                subject='Order Completed',
-                message=f'Dear {order.product.seller.user.username},\n\nThe buyer has confirmed completion of the order for {order.product.title}.\n\nThank you!',
-                from_email=None,
-                recipient_list=[order.product.seller.user.email],
-                fail_silently=True,
-            )
+            with transaction.atomic():
+                order.status = 'C'
+                order.save()
+                # Queue email to seller
+                outbox.enqueue(
+                    subject='Order Completed',
+                    body=f'Dear {order.seller.user.username},\n\nThe buyer has confirmed completion of order #{order.id} ({order.summary()}).\n\nThank you!',
+                    to=[order.seller.user.email],
+                )
             return JsonResponse({'success': True})
         except Order.DoesNotExist:
             return JsonResponse({'success': False, 'error': 'Order not found.'})
@@ -697,18 +803,14 @@ def dashboard_order_counts(request):
     seller_profile = getattr(user, 'sellerprofile', None)
     if not seller_profile:
         return JsonResponse({'success': True, 'new_orders': 0, 'total_sales': 0})
-    seller_orders = Order.objects.filter(product__seller=seller_profile)
-    new_orders = seller_orders.filter(status='P').count()
-    total_sales = seller_orders.filter(status__in=['C', 'W']).count()
-    return JsonResponse({'success': True, 'new_orders': new_orders, 'total_sales': total_sales})
+    return JsonResponse({'success': True, **order_counters.for_seller(seller_profile.pk)})
 
 @login_required
 def dashboard_buyer_order_counts(request):
     user = request.user
     if not hasattr(user, 'profile') or user.profile.role != 'buyer':
         return JsonResponse({'success': False, 'error': 'Not a buyer'})
-    waiting_orders = Order.objects.filter(user=user, status='W').count()
-    return JsonResponse({'success': True, 'waiting_orders': waiting_orders})
+    return JsonResponse({'success': True, **order_counters.for_buyer(user.pk)})
 
 @login_required
 def dashboard_buyer_cart_count(request):